@@ -0,0 +1,118 @@
+"""Admission control for the check-in path.
+
+Blocking work runs in worker threads through a Gate: at most `limit` jobs of
+a kind run at once and at most `queue` more wait for a slot. Work that finds
+the queue full is refused straight away with 503 and a Retry-After header,
+so a client learns within milliseconds that it should come back later rather
+than hanging behind a pile of requests the server cannot finish in time.
+
+Three gates exist, each with its own threads:
+
+- checkin: badge scans. They never share capacity with anything else, so an
+  export or a login cannot take the threads a scan needs.
+- admin: heavy admin work (exports, imports, full lists, archiving, backups).
+  Only a couple run at once, and none is started while scans are queueing.
+- login: bcrypt password checks, which cost a few hundred milliseconds of CPU.
+
+Limits are per worker process. GET /admin/admission reports each gate's
+running and queued jobs and how many requests it refused.
+"""
+import os
+from typing import Optional
+
+from anyio import CapacityLimiter, to_thread
+
+
+class Overloaded(Exception):
+    """Raised when a gate refuses work; the app answers 503 with Retry-After"""
+
+    def __init__(self, gate: "Gate", message: str):
+        super().__init__(message)
+        self.gate = gate
+        self.message = message
+        self.retry_after = gate.retry_after
+
+
+class Gate:
+    """At most limit jobs in worker threads, at most queue more waiting"""
+
+    def __init__(self, name: str, limit: int, queue: int, retry_after: int, yields_to: Optional["Gate"] = None):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.retry_after = retry_after
+        # Work of this gate is refused while the other gate has jobs waiting
+        self.yields_to = yields_to
+        self._limiter = None
+        self.admitted = 0
+        self.shed = 0
+        self.peak_queued = 0
+
+    @property
+    def limiter(self) -> CapacityLimiter:
+        # anyio limiters can only be created inside the running event loop
+        if self._limiter is None:
+            self._limiter = CapacityLimiter(self.limit)
+        return self._limiter
+
+    @property
+    def running(self) -> int:
+        return self.limiter.borrowed_tokens
+
+    @property
+    def queued(self) -> int:
+        return self.limiter.statistics().tasks_waiting
+
+    def _refuse(self, message: str):
+        self.shed += 1
+        raise Overloaded(self, message)
+
+    async def run(self, func, *args):
+        """Run func(*args) in a worker thread once a slot is free; raises Overloaded instead of queueing too deep"""
+        if self.yields_to is not None and self.yields_to.queued:
+            self._refuse("The server is busy with check-ins, please retry shortly")
+        if not self.limiter.available_tokens:
+            if self.queued >= self.queue:
+                self._refuse("The server is busy, please retry shortly")
+            self.peak_queued = max(self.peak_queued, self.queued + 1)
+        self.admitted += 1
+        return await to_thread.run_sync(func, *args, limiter=self.limiter)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_limit": self.queue,
+            "running": self.running,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+checkin = Gate(
+    "checkin",
+    limit=int(os.getenv("ADMISSION_CHECKIN_LIMIT", "8")),
+    queue=int(os.getenv("ADMISSION_CHECKIN_QUEUE", "200")),
+    retry_after=1,
+)
+admin = Gate(
+    "admin",
+    limit=int(os.getenv("ADMISSION_ADMIN_LIMIT", "2")),
+    queue=int(os.getenv("ADMISSION_ADMIN_QUEUE", "4")),
+    retry_after=5,
+    yields_to=checkin,
+)
+login = Gate(
+    "login",
+    limit=int(os.getenv("ADMISSION_LOGIN_LIMIT", "2")),
+    queue=int(os.getenv("ADMISSION_LOGIN_QUEUE", "16")),
+    retry_after=2,
+)
+
+GATES = (checkin, admin, login)
+
+
+def stats() -> dict:
+    """Running and queued jobs and shed counts of every gate"""
+    return {gate.name: gate.stats() for gate in GATES}
@@ -1,22 +1,40 @@
-from fastapi import FastAPI, Request, Form, File, UploadFile, Response
-from fastapi.responses import HTMLResponse, StreamingResponse, RedirectResponse
+import time
+# Taken before the other imports so the startup log covers module loading
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, Request, Form, File, UploadFile, Response, Query
+from fastapi.responses import HTMLResponse, StreamingResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
+import asyncio
+import gzip
 import io
 import json
+import logging
 import os
-from datetime import datetime
-from openpyxl import load_workbook
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional, Union
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
-from models import CheckinResponse, ImportResponse, User, DeleteResponse, CreateUserResponse, Settings, SettingsUpdate, SettingsResponse
-from database import init_db, get_user_by_employee_id, create_checkin, get_checkin_history, create_users_batch, get_all_users, delete_all_users, create_single_user, search_users, get_tables_with_users, get_export_data, clear_checkin_history, checkout_user, get_settings, update_settings, has_admin_user, create_initial_admin_if_needed, create_auth_user, authenticate_user, get_auth_user, get_all_auth_users, delete_auth_user, create_session, delete_session, cleanup_expired_sessions
+from models import CheckinResponse, ImportResponse, User, DeleteResponse, CreateUserResponse, Settings, SettingsUpdate, SettingsResponse, Event, EventCreate, ArchiveRequest, CheckinRecord, TableGroup, UserRow, UserChanges, CheckinChanges, TableChanges, UserPage, CheckinPage, TablePage, BulkCheckinRequest, BulkCheckinResponse
+from database import SNAPSHOT_INTERVAL, init_db, close_db, is_in_memory, save_snapshot, check_ready, busy_stats, get_user_by_employee_id, get_roster, get_roster_changes, create_checkin, get_checkin_history_rows, get_checkin_history_page, get_history_changes, sync_users, delete_all_users, create_single_user, get_user_rows, get_user_page, get_user_changes, get_tables_with_users, get_table_page, get_table_changes, get_row_version, get_table_occupancy, get_export_data, to_epoch, clear_checkin_history, checkout_user, bulk_checkin, bulk_checkout, get_settings, update_settings, get_arrival_stats, get_events, get_active_event, create_event, set_active_event, has_admin_user, create_initial_admin_if_needed, create_auth_user, authenticate_user, get_auth_user, get_all_auth_users, delete_auth_user, create_session, delete_session, cleanup_expired_sessions
+from assets import AssetFiles
+from fastjson import FastJSONResponse, dumps
+import admission
+import backup
+import maintenance
+import media
+from archive import archive_checkins, get_archived_events, iter_archived_checkins
 from auth import AuthMiddleware
 
+logger = logging.getLogger(__name__)
+# uvicorn configures only its own loggers; without a handler here info records would be dropped
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(name)s: %(message)s")
+
 # Auth models
 class LoginRequest(BaseModel):
     username: str
@@ -27,23 +45,145 @@ class AuthUserRequest(BaseModel):
     password: str
     is_admin: bool = False
 
+# Seconds between sweeps for orphaned uploads
+MEDIA_SWEEP_INTERVAL = int(os.getenv("MEDIA_SWEEP_INTERVAL", "3600"))
+# Largest page the admin list endpoints return
+PAGE_LIMIT = 1000
+
+def epoch_range(start: Union[datetime, date, None], end: Union[datetime, date, None]) -> tuple:
+    """from/to query parameters as epoch seconds; times without a zone are UTC, like stored check-ins.
+    A bare date covers the whole day: from starts at its midnight and to ends at the next one."""
+    if start is not None and not isinstance(start, datetime):
+        start = datetime.combine(start, datetime.min.time())
+    if end is not None and not isinstance(end, datetime):
+        end = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    return (to_epoch(start) if start else None, to_epoch(end) if end else None)
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    # Every worker runs this; each step is safe to run concurrently
+    lifespan_started = time.perf_counter()
     init_db()
     # Create initial admin from environment variables if needed
     create_initial_admin_if_needed()
-    # Clean up expired sessions on startup
-    cleanup_expired_sessions()
+    ready = time.perf_counter()
+    logger.info("Ready in %.0f ms (loading %.0f ms, database %.0f ms)", (ready - STARTED_AT) * 1000,
+                (lifespan_started - STARTED_AT) * 1000, (ready - lifespan_started) * 1000)
+    # Work that is not needed to serve the first request runs after startup
+    deferred = asyncio.create_task(run_deferred_startup())
+    sweeper = asyncio.create_task(sweep_media_periodically())
+    backups = asyncio.create_task(back_up_periodically())
+    upkeep = asyncio.create_task(maintain_periodically())
+    snapshots = asyncio.create_task(snapshot_periodically())
     yield
+    deferred.cancel()
+    sweeper.cancel()
+    backups.cancel()
+    upkeep.cancel()
+    snapshots.cancel()
+    # Also writes the final snapshot of an in-memory database
+    close_db()
+
+async def run_deferred_startup():
+    """Clean up expired sessions and precompress static assets in the background"""
+    try:
+        await run_in_threadpool(cleanup_expired_sessions)
+        await run_in_threadpool(static_files.compress)
+    except Exception:
+        logger.exception("Deferred startup work failed")
+
+async def sweep_media_periodically():
+    """Delete uploaded files no setting refers to, at startup and then every MEDIA_SWEEP_INTERVAL seconds"""
+    while True:
+        try:
+            removed = await run_in_threadpool(media.sweep_orphans, media.referenced_files(get_settings()))
+            if removed:
+                logger.info("Removed %d unreferenced upload(s)", removed)
+        except Exception:
+            logger.exception("Media sweep failed")
+        await asyncio.sleep(MEDIA_SWEEP_INTERVAL)
+
+async def back_up_periodically():
+    """Back up the SQLite database every BACKUP_INTERVAL seconds; across workers, one takes each backup"""
+    if not backup.BACKUP_INTERVAL or not backup.is_supported():
+        return
+    while True:
+        await asyncio.sleep(min(backup.BACKUP_INTERVAL, 60))
+        try:
+            if backup.backup_due():
+                status = await run_in_threadpool(backup.run_backup)
+                logger.info("Backup %s: %s ms, %s bytes%s", status["file"], status["duration_ms"],
+                            status["backup_bytes"], " (unchanged)" if status["skipped_unchanged"] else "")
+        except backup.BackupError:
+            # Another worker is taking this backup
+            pass
+        except Exception:
+            logger.exception("Backup failed")
+
+async def snapshot_periodically():
+    """Save the in-memory database to disk every DATABASE_SNAPSHOT_INTERVAL seconds (memory durability profile)"""
+    if not is_in_memory() or not SNAPSHOT_INTERVAL:
+        return
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await run_in_threadpool(save_snapshot)
+        except Exception:
+            logger.exception("Snapshot failed")
+
+async def maintain_periodically():
+    """Run a database maintenance pass every MAINTENANCE_INTERVAL seconds; it holds back while scans are busy"""
+    if not maintenance.MAINTENANCE_INTERVAL or not maintenance.is_supported():
+        return
+    while True:
+        await asyncio.sleep(maintenance.MAINTENANCE_INTERVAL)
+        try:
+            summary = maintenance.describe(await run_in_threadpool(maintenance.run_maintenance))
+            if summary:
+                logger.info("%s", summary)
+        except maintenance.MaintenanceError:
+            # Another worker is running a pass
+            pass
+        except Exception:
+            logger.exception("Maintenance failed")
 
 app = FastAPI(title="RFID Checkin Station", lifespan=lifespan)
+# Oversized uploads are refused before Starlette spools the whole body
+app.add_middleware(media.UploadSizeLimit, limits={
+    "/admin/upload-background": media.MAX_BACKGROUND_BYTES,
+    "/admin/upload-sound": media.MAX_SOUND_BYTES,
+})
+
+# Mount static files; templates link to fingerprinted copies through asset()
+static_files = AssetFiles(directory="static").build()
+app.mount("/static", static_files, name="static")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    """Refused work gets an immediate 503 the client can retry"""
+    return JSONResponse({"success": False, "message": exc.message}, status_code=503,
+                        headers={"Retry-After": str(exc.retry_after)})
 
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset"] = static_files.url
+templates.env.globals["background_widths"] = media.variant_widths
+templates.env.globals["sound_type"] = media.sound_type
 
 # Authentication routes
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the database answers a trivial query"""
+    try:
+        await run_in_threadpool(check_ready)
+    except Exception as e:
+        return JSONResponse({"status": "unavailable", "detail": str(e)}, status_code=503)
+    return {"status": "ok"}
+
 @app.get("/auth/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     # If already logged in, redirect to home
@@ -57,8 +197,8 @@ async def login(http_request: Request, request: LoginRequest):
     if not request.username or not request.password:
         return {"success": False, "message": "Username and password required"}
     
-    # Authenticate user
-    user = authenticate_user(request.username, request.password)
+    # bcrypt takes a few hundred milliseconds; it runs in the login gate's threads, off the event loop
+    user = await admission.login.run(authenticate_user, request.username, request.password)
     if not user:
         return {"success": False, "message": "Invalid username or password"}
     
@@ -126,22 +266,58 @@ async def checkin_preview(request: Request, demo_result: bool = False):
 
 @app.post("/checkin", response_model=CheckinResponse)
 async def checkin(badge_id: str = Form(...)):
+    # Scans have threads of their own, so admin work and logins cannot hold them up
+    return await admission.checkin.run(process_checkin, badge_id)
+
+def process_checkin(badge_id: str) -> CheckinResponse:
     user = get_user_by_employee_id(badge_id)
     
     if user:
-        success = create_checkin(badge_id)
-        if success:
+        checkin_time = create_checkin(badge_id)
+        if checkin_time:
             return CheckinResponse(
                 success=True,
                 name=f"{user.first_name} {user.last_name}",
                 table_number=user.table_number,
-                time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                time=checkin_time
             )
         else:
             return CheckinResponse(success=False, message="Checkin failed")
     else:
         return CheckinResponse(success=False, message="Badge not found. Please see check-in attendant.")
 
+# Encoded kiosk roster of the last roster version this worker served: (roster version, {encoding: body})
+_roster_bodies = (None, {})
+
+def encode_roster(roster_version: int, roster: dict) -> dict:
+    """JSON and gzip bodies of the kiosk roster, built once per roster version"""
+    global _roster_bodies
+    cached_version, bodies = _roster_bodies
+    if cached_version != roster_version:
+        body = dumps(roster)
+        bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=6, mtime=0)}
+        _roster_bodies = (roster_version, bodies)
+    return bodies
+
+# Kiosks keep a copy of the roster to show a scan's name and table at once and confirm it with
+# /checkin in the background. The full roster carries the roster version to pass as since in
+# X-Data-Version; since requests return the rows of users changed after it, or reset.
+@app.get("/checkin/roster")
+async def get_checkin_roster(request: Request, since: Optional[int] = None):
+    AuthMiddleware.require_auth(request)
+    if since is not None:
+        return FastJSONResponse(await run_in_threadpool(get_roster_changes, since))
+    roster_version, roster = await run_in_threadpool(get_roster)
+    encoding = "gzip" if "gzip" in request.headers.get("accept-encoding", "") else "identity"
+    etag = f'"roster-{roster_version}-{encoding}"'
+    headers = {"ETag": etag, "X-Data-Version": str(roster_version), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    bodies = await run_in_threadpool(encode_roster, roster_version, roster)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(bodies[encoding], media_type="application/json", headers=headers)
+
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_page(request: Request):
     if not AuthMiddleware.is_authenticated(request):
@@ -184,29 +360,102 @@ async def delete_auth_user_endpoint(request: Request, username: str):
     else:
         return {"success": False, "message": "Cannot delete user (user not found or last admin)"}
 
-@app.get("/admin/history")
-async def get_history(request: Request, search: str = ""):
+# Events (Admin Only)
+@app.get("/admin/events", response_model=list[Event])
+async def get_events_endpoint(request: Request):
+    AuthMiddleware.require_admin(request)
+    return get_events()
+
+@app.post("/admin/events")
+async def create_event_endpoint(request: Request, event: EventCreate):
     AuthMiddleware.require_admin(request)
-    return get_checkin_history(search)
+    
+    name = event.name.strip()
+    if not name:
+        return {"success": False, "message": "Event name is required"}
+    
+    event_id = create_event(name, event.activate)
+    if event_id is None:
+        return {"success": False, "message": "Failed to create event"}
+    return {"success": True, "message": f"Event '{name}' created", "event_id": event_id}
 
-@app.get("/admin/users")
-async def get_users(request: Request, search: str = ""):
+@app.put("/admin/events/{event_id}/activate")
+async def activate_event_endpoint(request: Request, event_id: int):
     AuthMiddleware.require_admin(request)
-    if search:
-        return search_users(search)
-    return get_all_users()
+    
+    if set_active_event(event_id):
+        return {"success": True, "message": "Active event changed", "event": get_active_event()}
+    else:
+        return {"success": False, "message": "Event not found"}
+
+async def versioned_list(request: Request, load, full: bool = False) -> Response:
+    """Rows from load(version) tagged with the current row version; 304 if the client already has them.
+    Full lists count as heavy admin work."""
+    # Read the version first: rows fetched after it can only be newer, never missed
+    version = get_row_version()
+    etag = f'"rows-{version}"'
+    headers = {"ETag": etag, "X-Data-Version": str(version), "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    # Full lists of a large roster take a while to read; keep the event loop free for scans
+    run = admission.admin.run if full else run_in_threadpool
+    return FastJSONResponse(await run(load, version), headers=headers)
 
-@app.get("/admin/tables")
-async def get_tables(request: Request, search: str = ""):
+# List endpoints return plain rows through FastJSONResponse; the response models only document them.
+# With since=<X-Data-Version of an earlier response> they return only what changed after it.
+# With limit they return one page ({"version", "total", "offset", "rows"}) so the admin page
+# only fetches the rows it is showing.
+# from/to limit history and exports to check-ins in [from, to), e.g. ?from=2026-05-01T08:00&to=2026-05-01T12:00;
+# a date alone covers the whole day, so ?from=2026-05-01&to=2026-05-01 is all of May 1st
+@app.get("/admin/history", response_model=Union[list[CheckinRecord], CheckinPage, CheckinChanges], response_class=FastJSONResponse)
+async def get_history(request: Request, search: str = "", since: Optional[int] = None,
+                      offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=PAGE_LIMIT),
+                      start: Union[datetime, date, None] = Query(None, alias="from"),
+                      end: Union[datetime, date, None] = Query(None, alias="to")):
     AuthMiddleware.require_admin(request)
-    return get_tables_with_users(search)
+    start, end = epoch_range(start, end)
+    if since is not None:
+        return FastJSONResponse(get_history_changes(since, search, start, end))
+    if limit is not None:
+        return await versioned_list(request, lambda version: {"version": version, **get_checkin_history_page(search, offset, limit, start, end)})
+    return await versioned_list(request, lambda version: get_checkin_history_rows(search, start, end), full=True)
 
-@app.get("/admin/export")
-async def export_xlsx(request: Request):
+@app.get("/admin/users", response_model=Union[list[User], UserPage, UserChanges], response_class=FastJSONResponse)
+async def get_users(request: Request, search: str = "", since: Optional[int] = None,
+                    offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=PAGE_LIMIT)):
+    AuthMiddleware.require_admin(request)
+    if since is not None:
+        return FastJSONResponse(get_user_changes(since, search))
+    if limit is not None:
+        return await versioned_list(request, lambda version: {"version": version, **get_user_page(search, offset, limit)})
+    return await versioned_list(request, lambda version: get_user_rows(search), full=True)
+
+@app.get("/admin/tables", response_model=Union[list[TableGroup], TablePage, TableChanges], response_class=FastJSONResponse)
+async def get_tables(request: Request, search: str = "", since: Optional[int] = None,
+                     offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1, le=PAGE_LIMIT),
+                     sort: Literal["table_number", "user_count_asc", "user_count_desc"] = "table_number"):
+    AuthMiddleware.require_admin(request)
+    if since is not None:
+        return FastJSONResponse(get_table_changes(since, search))
+    if limit is not None:
+        return await versioned_list(request, lambda version: {"version": version, **get_table_page(search, offset, limit, sort)})
+    return await versioned_list(request, lambda version: get_tables_with_users(search), full=True)
+
+@app.get("/admin/tables/occupancy")
+async def get_tables_occupancy(request: Request):
+    AuthMiddleware.require_admin(request)
+    return get_table_occupancy()
+
+@app.get("/admin/stats")
+async def get_stats(request: Request, bucket: int = Query(5, ge=1, le=1440), event_id: Optional[int] = None):
     AuthMiddleware.require_admin(request)
+    return get_arrival_stats(bucket, event_id)
+
+def build_export_workbook(start: Optional[int] = None, end: Optional[int] = None) -> io.BytesIO:
+    """Export workbook of the active event, read from one snapshot; start/end limit it to a time range"""
     from openpyxl import Workbook
     
-    export_data = get_export_data()
+    export_data = get_export_data(start, end)
     
     # Create a new workbook and worksheet
     workbook = Workbook()
@@ -268,6 +517,14 @@ async def export_xlsx(request: Request):
     output = io.BytesIO()
     workbook.save(output)
     output.seek(0)
+    return output
+
+@app.get("/admin/export")
+async def export_xlsx(request: Request, start: Union[datetime, date, None] = Query(None, alias="from"),
+                      end: Union[datetime, date, None] = Query(None, alias="to")):
+    AuthMiddleware.require_admin(request)
+    # Reading and writing the workbook takes a while; scans keep being served meanwhile
+    output = await admission.admin.run(build_export_workbook, *epoch_range(start, end))
     
     def iter_xlsx():
         yield output.read()
@@ -278,8 +535,96 @@ async def export_xlsx(request: Request):
         headers={"Content-Disposition": "attachment; filename=checkin_data.xlsx"}
     )
 
+@app.get("/admin/archive")
+async def get_archive(request: Request):
+    AuthMiddleware.require_admin(request)
+    return get_archived_events()
+
+@app.post("/admin/archive")
+async def archive_checkins_endpoint(request: Request, archive_request: ArchiveRequest):
+    AuthMiddleware.require_admin(request)
+    try:
+        # Runs batch by batch for a while; admin jobs share a gate that yields to check-ins
+        result = await admission.admin.run(
+            archive_checkins, archive_request.before, archive_request.event_id, archive_request.closed_events
+        )
+        return {
+            "success": True,
+            "archived": result["archived"],
+            "message": f"Archived {result['archived']} checkin records"
+        }
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    except admission.Overloaded:
+        raise
+    except Exception as e:
+        return {"success": False, "message": f"Error archiving checkin history: {str(e)}"}
+
+@app.get("/admin/admission")
+async def get_admission(request: Request):
+    """Running and queued jobs per admission gate, and how many requests each refused"""
+    AuthMiddleware.require_admin(request)
+    return admission.stats()
+
+@app.get("/admin/storage")
+async def get_storage(request: Request):
+    """Busy errors this worker's database writes retried, and write transactions they failed"""
+    AuthMiddleware.require_admin(request)
+    return busy_stats()
+
+@app.get("/admin/backups")
+async def get_backups(request: Request):
+    """Stored backups and the duration and sizes of the last backup run"""
+    AuthMiddleware.require_admin(request)
+    if not backup.is_supported():
+        return {"supported": False, "last": None, "backups": []}
+    return {"supported": True, "last": backup.last_status(), "backups": backup.list_backups()}
+
+@app.post("/admin/backups")
+async def create_backup(request: Request):
+    AuthMiddleware.require_admin(request)
+    try:
+        status = await admission.admin.run(backup.run_backup)
+    except backup.BackupError as e:
+        return {"success": False, "message": str(e)}
+    except admission.Overloaded:
+        raise
+    except Exception as e:
+        return {"success": False, "message": f"Error creating backup: {str(e)}"}
+    return {
+        "success": True,
+        "message": f"Backup {status['file']} saved in {status['duration_ms']} ms",
+        "backup": status
+    }
+
+@app.get("/admin/export/archive")
+async def export_archive_xlsx(request: Request, event_id: Optional[int] = None):
+    AuthMiddleware.require_admin(request)
+    from openpyxl import Workbook
+    
+    def build():
+        # Write-only mode keeps memory flat however large the archive is
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Archived Checkins")
+        worksheet.append(["Event", "First Name", "Last Name", "Employee ID", "Table Number", "Checkin Time"])
+        for record in iter_archived_checkins(event_id):
+            worksheet.append([record.event_name, record.first_name, record.last_name,
+                              record.employee_id, record.table_number, record.checkin_time])
+        
+        output = io.BytesIO()
+        workbook.save(output)
+        output.seek(0)
+        return output
+    
+    output = await admission.admin.run(build)
+    return StreamingResponse(
+        output,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": "attachment; filename=checkin_archive.xlsx"}
+    )
+
 @app.post("/admin/import", response_model=ImportResponse)
-async def import_users(request: Request, file: UploadFile = File(...)):
+async def import_users(request: Request, file: UploadFile = File(...), delete_missing: bool = Form(False)):
     AuthMiddleware.require_admin(request)
     if not file.filename:
         return ImportResponse(success=False, message="Please upload a file")
@@ -290,11 +635,19 @@ async def import_users(request: Request, file: UploadFile = File(...)):
         return ImportResponse(success=False, message="Please upload an Excel (.xlsx) file")
     
     content = await file.read()
+    # Parsing and importing a large roster takes seconds; it runs as capped admin work
+    return await admission.admin.run(import_roster, content, delete_missing)
+
+def import_roster(content: bytes, delete_missing: bool = False) -> ImportResponse:
+    """Read users from an uploaded workbook and apply the differences to the roster"""
     users = []
     errors = []
+    # Employee ID of every data row, including rejected ones ("" when it is missing)
+    row_ids = set()
     
     try:
         # Load Excel file
+        from openpyxl import load_workbook
         workbook = load_workbook(io.BytesIO(content))
         worksheet = workbook.active
         
@@ -339,11 +692,12 @@ async def import_users(request: Request, file: UploadFile = File(...)):
             if not row or all(cell is None or str(cell).strip() == '' for cell in row):
                 continue
             
+            employee_id_val = row[column_indices['employee_id']] if column_indices['employee_id'] < len(row) else None
+            row_ids.add(str(employee_id_val or "").strip())
             try:
                 # Extract values using column mapping
                 first_name_val = row[column_indices['first_name']] if column_indices['first_name'] < len(row) else None
                 last_name_val = row[column_indices['last_name']] if column_indices['last_name'] < len(row) else None
-                employee_id_val = row[column_indices['employee_id']] if column_indices['employee_id'] < len(row) else None
                 table_number_val = row[column_indices['table_number']] if column_indices['table_number'] < len(row) else None
                 
                 # Validate required fields are not empty
@@ -359,15 +713,18 @@ async def import_users(request: Request, file: UploadFile = File(...)):
                 if not table_number_val:
                     errors.append(f"Row {row_num}: Missing table number")
                     continue
+                table_number = int(table_number_val)
+                if table_number <= 0:
+                    errors.append(f"Row {row_num}: Table number must be greater than 0")
+                    continue
                 
-                # Create user object
-                user = User(
+                # Rows are validated above; a plain tuple per row keeps large imports cheap
+                users.append(UserRow(
                     first_name=str(first_name_val).strip(),
                     last_name=str(last_name_val).strip(),
                     employee_id=str(employee_id_val).strip(),
-                    table_number=int(table_number_val)
-                )
-                users.append(user)
+                    table_number=table_number
+                ))
                 
             except (ValueError, TypeError) as e:
                 errors.append(f"Row {row_num}: {str(e)}")
@@ -377,10 +734,17 @@ async def import_users(request: Request, file: UploadFile = File(...)):
     except Exception as e:
         return ImportResponse(success=False, message=f"Error reading Excel file: {str(e)}")
     
+    # Users whose rows were rejected are still in the file, so delete_missing must keep them
+    rejected = row_ids - {user.employee_id for user in users}
+    if delete_missing and "" in rejected:
+        return ImportResponse(success=False, errors=errors,
+                              message="Some rows have no employee ID; fix them before removing users missing from the file")
+    
     if users:
-        imported, db_errors = create_users_batch(users)
-        errors.extend(db_errors)
-        return ImportResponse(success=True, imported=imported, errors=errors)
+        # Only new and changed users are written; delete_missing also removes users not in the file
+        counts = sync_users(users, delete_missing, keep=rejected)
+        imported = counts["inserted"] + counts["updated"] + counts["unchanged"]
+        return ImportResponse(success=True, imported=imported, errors=errors, **counts)
     else:
         return ImportResponse(success=False, message="No valid users found", errors=errors)
 
@@ -468,27 +832,20 @@ async def upload_background(request: Request, file: UploadFile = File(...)):
         if not file.content_type or not file.content_type.startswith('image/'):
             return {"success": False, "message": "Please upload an image file"}
         
-        # Create uploads directory if it doesn't exist
-        import os
-        uploads_dir = "static/uploads"
-        os.makedirs(uploads_dir, exist_ok=True)
-        
-        # Save file with unique name
-        import uuid
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-        filename = f"background_{uuid.uuid4().hex}.{file_extension}"
-        file_path = f"{uploads_dir}/{filename}"
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Streamed to disk and re-encoded at display sizes; identical uploads reuse the stored file
+        web_path = await media.store_background(file)
+        previous = get_settings().get('background_image', '')
         
         # Update settings with new background image path
-        web_path = f"/static/uploads/{filename}"
         update_settings({"background_image": web_path})
         
+        # The replaced image is deleted unless another setting still uses it
+        media.release_media(previous, get_settings())
+        
         return {"success": True, "message": "Background image uploaded successfully", "path": web_path}
     
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
     except Exception as e:
         return {"success": False, "message": f"Error uploading image: {str(e)}"}
 
@@ -506,18 +863,12 @@ async def remove_background(request: Request):
         if not success:
             return {"success": False, "message": "Failed to update settings"}
         
-        # Delete the physical file if it exists and is in uploads folder
-        if current_bg and current_bg.startswith('/static/uploads/'):
-            import os
-            # Convert web path to file path
-            file_path = current_bg.replace('/static/', 'static/')
-            
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except OSError as e:
-                    # File deletion failed but settings were updated
-                    return {"success": True, "message": "Background removed but file deletion failed", "warning": str(e)}
+        # Delete the uploaded file and its size variants unless still referenced
+        try:
+            media.release_media(current_bg, get_settings())
+        except OSError as e:
+            # File deletion failed but settings were updated
+            return {"success": True, "message": "Background removed but file deletion failed", "warning": str(e)}
         
         return {"success": True, "message": "Background image removed successfully"}
     
@@ -534,28 +885,21 @@ async def upload_sound(request: Request, sound_type: str = Form(...), file: Uplo
         if not file.content_type or not file.content_type.startswith('audio/'):
             return {"success": False, "message": "Please upload an audio file"}
         
-        # Create uploads directory if it doesn't exist
-        import os
-        uploads_dir = "static/uploads"
-        os.makedirs(uploads_dir, exist_ok=True)
-        
-        # Save file with unique name
-        import uuid
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'mp3'
-        filename = f"{sound_type}_sound_{uuid.uuid4().hex}.{file_extension}"
-        file_path = f"{uploads_dir}/{filename}"
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Streamed to disk and normalised to a compact MP3 when ffmpeg is available
+        web_path = await media.store_sound(file)
+        setting_key = f"{sound_type}_sound"
+        previous = get_settings().get(setting_key, '')
         
         # Update settings with new sound path
-        web_path = f"/static/uploads/{filename}"
-        setting_key = f"{sound_type}_sound"
         update_settings({setting_key: web_path})
         
+        # The replaced sound is deleted unless the other sound setting uses it
+        media.release_media(previous, get_settings())
+        
         return {"success": True, "message": f"{sound_type.title()} sound uploaded successfully", "path": web_path}
     
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
     except Exception as e:
         return {"success": False, "message": f"Error uploading sound: {str(e)}"}
 
@@ -577,18 +921,12 @@ async def remove_sound(request: Request, sound_type: str = Form(...)):
         if not success:
             return {"success": False, "message": "Failed to update settings"}
         
-        # Delete the physical file if it exists and is in uploads folder
-        if current_sound and current_sound.startswith('/static/uploads/'):
-            import os
-            # Convert web path to file path
-            file_path = current_sound.replace('/static/', 'static/')
-            
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except OSError as e:
-                    # File deletion failed but settings were updated
-                    return {"success": True, "message": f"{sound_type.title()} sound removed but file deletion failed", "warning": str(e)}
+        # Delete the uploaded file unless the other sound setting uses it
+        try:
+            media.release_media(current_sound, get_settings())
+        except OSError as e:
+            # File deletion failed but settings were updated
+            return {"success": True, "message": f"{sound_type.title()} sound removed but file deletion failed", "warning": str(e)}
         
         return {"success": True, "message": f"{sound_type.title()} sound removed successfully"}
     
@@ -611,6 +949,30 @@ async def clear_checkin_history_endpoint(request: Request):
             "message": f"Error clearing checkin history: {str(e)}"
         }
 
+@app.post("/admin/checkin/bulk", response_model=BulkCheckinResponse)
+async def bulk_manual_checkin(request: Request, bulk: BulkCheckinRequest):
+    """Check in or out a list of users, or a whole table, in one transaction"""
+    AuthMiddleware.require_admin(request)
+    if (bulk.employee_ids is None) == (bulk.table_number is None):
+        return {"success": False, "message": "Provide either employee_ids or table_number"}
+    
+    apply = bulk_checkin if bulk.action == "checkin" else bulk_checkout
+    try:
+        # A whole table is one long write; it waits its turn with the other admin jobs
+        results = await admission.admin.run(apply, bulk.employee_ids, bulk.table_number)
+    except admission.Overloaded:
+        raise
+    except Exception as e:
+        return {"success": False, "message": f"Error during bulk {bulk.action}: {str(e)}"}
+    
+    done = sum(result["success"] for result in results)
+    verb = "Checked in" if bulk.action == "checkin" else "Checked out"
+    return {
+        "success": done > 0,
+        "message": f"{verb} {done} of {len(results)}",
+        "results": results
+    }
+
 @app.post("/admin/checkin/{employee_id}")
 async def manual_checkin(request: Request, employee_id: str):
     AuthMiddleware.require_admin(request)
@@ -0,0 +1,243 @@
+"""Cold storage for old check-in history.
+
+archive_checkins() moves check-ins older than a cutoff, or belonging to events
+that are no longer active, out of the live database into a separate SQLite
+archive file. Rows are written as zlib-compressed JSON batches of a single
+event, together with the attendee's name and table at the time of archiving,
+so the archive stays readable after the roster changes.
+
+The move happens in small batches: each batch is written and committed to the
+archive first, then deleted from the live database in a short write
+transaction, so kiosks only ever wait for one small DELETE. A batch stays
+marked as pending until its delete commits; an interrupted run is completed
+by the next one, so no check-in is lost or archived twice.
+
+Select the archive file with ARCHIVE_PATH (default: next to the SQLite
+database, or checkin-archive.db when running on PostgreSQL).
+
+Usage:
+    python archive.py --closed-events
+    python archive.py --before "2026-01-01 00:00:00"
+    python archive.py --event 3
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Iterator, List, Optional
+
+import database
+import storage
+from models import ArchivedCheckinRow
+
+# Check-ins moved per batch; each batch holds the live write lock only for its DELETE
+BATCH_SIZE = 500
+
+
+def archive_path() -> str:
+    path = os.getenv("ARCHIVE_PATH", "")
+    if path:
+        return path
+    if isinstance(database.backend, storage.SQLiteBackend) and database.backend.path != ":memory:":
+        return os.path.splitext(database.backend.path)[0] + "-archive.db"
+    return "checkin-archive.db"
+
+
+def _connect(read_only: bool = False) -> sqlite3.Connection:
+    path = archive_path()
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(path)
+        _create_schema(conn)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,
+            event_name TEXT,
+            first_time TEXT NOT NULL,
+            last_time TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            pending INTEGER NOT NULL DEFAULT 1,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            rows BLOB NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_batches_event ON archive_batches (event_id, first_time)")
+    conn.commit()
+
+
+def _pack(rows: list) -> bytes:
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def _unpack(blob: bytes) -> list:
+    return json.loads(zlib.decompress(blob))
+
+
+def _delete_live(ids: List[int]):
+    with database.write_transaction() as cursor:
+        cursor.execute(f"DELETE FROM checkins WHERE id IN ({', '.join('?' * len(ids))})", tuple(ids))
+        database.reset_row_changes(cursor)
+
+
+def _finish_pending(archive: sqlite3.Connection) -> int:
+    """Delete the live copies of batches an interrupted run archived but never removed"""
+    finished = 0
+    for batch in archive.execute("SELECT id, rows FROM archive_batches WHERE pending = 1").fetchall():
+        ids = [row[0] for row in _unpack(batch["rows"])]
+        _delete_live(ids)
+        archive.execute("UPDATE archive_batches SET pending = 0 WHERE id = ?", (batch["id"],))
+        archive.commit()
+        finished += 1
+    return finished
+
+
+def _select_batch(before: Optional[int], event_ids: Optional[List[int]], limit: int) -> list:
+    conditions, params = [], []
+    if before is not None:
+        conditions.append("c.checkin_at < ?")
+        params.append(before)
+    if event_ids is not None:
+        conditions.append(f"c.event_id IN ({', '.join('?' * len(event_ids))})")
+        params.extend(event_ids)
+
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT c.id, c.employee_id, {database.backend.epoch_text('c.checkin_at')} AS checkin_time,
+               c.event_id, e.name AS event_name,
+               u.first_name, u.last_name, u.table_number
+        FROM checkins c
+        LEFT JOIN events e ON e.id = c.event_id
+        LEFT JOIN users u ON u.employee_id = c.employee_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY c.event_id, c.id
+        LIMIT ?
+    """, (*params, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def archive_checkins(before: Optional[str] = None, event_id: Optional[int] = None,
+                     closed_events: bool = False, batch_size: int = BATCH_SIZE, pause: float = 0.05) -> dict:
+    """Move matching check-ins into the archive; returns counts of archived rows and batches.
+
+    before is a 'YYYY-MM-DD HH:MM:SS' cutoff in UTC, event_id selects one inactive event and
+    closed_events selects every event except the active one. Criteria combine with AND.
+    """
+    if not before and event_id is None and not closed_events:
+        raise ValueError("Choose a cutoff time or the events to archive")
+    cutoff = database.to_epoch(before) if before else None
+
+    active_event_id = database.get_active_event()["id"]
+    event_ids = None
+    if event_id is not None:
+        if event_id == active_event_id:
+            raise ValueError("The active event cannot be archived")
+        event_ids = [event_id]
+    elif closed_events:
+        event_ids = [event["id"] for event in database.get_events() if event["id"] != active_event_id]
+        if not event_ids:
+            return {"archived": 0, "batches": 0}
+
+    archive = _connect()
+    try:
+        _finish_pending(archive)
+        archived = batches = 0
+        while True:
+            rows = _select_batch(cutoff, event_ids, batch_size)
+            if not rows:
+                break
+
+            # One archive batch per event keeps per-event exports to a range scan
+            groups = {}
+            for row in rows:
+                groups.setdefault(row["event_id"], []).append(row)
+            for group in groups.values():
+                archive.execute(
+                    "INSERT INTO archive_batches (event_id, event_name, first_time, last_time, row_count, rows) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (group[0]["event_id"], group[0]["event_name"],
+                     min(str(row["checkin_time"]) for row in group), max(str(row["checkin_time"]) for row in group),
+                     len(group), _pack([[row[key] for key in row.keys()] for row in group]))
+                )
+            archive.commit()
+
+            _delete_live([row["id"] for row in rows])
+            archive.execute("UPDATE archive_batches SET pending = 0 WHERE pending = 1")
+            archive.commit()
+
+            archived += len(rows)
+            batches += len(groups)
+            # Give kiosk writes a chance to take the lock between batches
+            time.sleep(pause)
+        if archived:
+            # A cutoff can reach into the active event, whose table counters then change
+            database.rebuild_table_occupancy()
+        return {"archived": archived, "batches": batches}
+    finally:
+        archive.close()
+
+
+def get_archived_events() -> List[dict]:
+    """Summarise the archive per event"""
+    if not os.path.exists(archive_path()):
+        return []
+    archive = _connect(read_only=True)
+    rows = archive.execute("""
+        SELECT event_id, MAX(event_name) AS event_name, SUM(row_count) AS checkin_count,
+               MIN(first_time) AS first_time, MAX(last_time) AS last_time
+        FROM archive_batches
+        WHERE pending = 0
+        GROUP BY event_id
+        ORDER BY MIN(first_time)
+    """).fetchall()
+    archive.close()
+    return [dict(row) for row in rows]
+
+
+def iter_archived_checkins(event_id: Optional[int] = None) -> Iterator[ArchivedCheckinRow]:
+    """Stream archived check-ins, one decompressed batch at a time"""
+    if not os.path.exists(archive_path()):
+        return
+    archive = _connect(read_only=True)
+    try:
+        if event_id is None:
+            batches = archive.execute("SELECT rows FROM archive_batches WHERE pending = 0 ORDER BY event_id, first_time")
+        else:
+            batches = archive.execute(
+                "SELECT rows FROM archive_batches WHERE event_id = ? AND pending = 0 ORDER BY first_time", (event_id,)
+            )
+        for batch in batches:
+            for _, employee_id, checkin_time, batch_event_id, event_name, first_name, last_name, table_number \
+                    in _unpack(batch["rows"]):
+                yield ArchivedCheckinRow(first_name or "", last_name or "", employee_id, table_number or 0,
+                                         str(checkin_time), batch_event_id, event_name or "")
+    finally:
+        archive.close()
+
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--before", help="archive check-ins older than this 'YYYY-MM-DD HH:MM:SS' time")
+    parser.add_argument("--event", type=int, help="archive every check-in of this (inactive) event")
+    parser.add_argument("--closed-events", action="store_true", help="archive every event except the active one")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to wait between batches")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    database.init_db()
+    result = archive_checkins(args.before, args.event, args.closed_events, args.batch_size, args.pause)
+    print(f"Archived {result['archived']} check-ins in {result['batches']} batches to {archive_path()}")
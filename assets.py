@@ -0,0 +1,154 @@
+"""Fingerprinted, precompressed static assets.
+
+At startup every file under static/ (except runtime uploads) is read once
+and content-hashed. Compression with gzip and, when the brotli package is
+installed, brotli happens off the startup path: compress() is run in the
+background once the app is up, and a file requested before that is
+compressed on its first request, in a worker thread so the event loop keeps
+serving check-ins. Templates link to the hashed URL through the asset()
+helper, e.g. /static/css/admin.3f2a9c1d0b4e.css, which is served from memory
+with an immutable Cache-Control header: a kiosk downloads each version of a
+file once and never revalidates it. Editing a file changes its URL on the
+next start.
+
+Plain /static paths keep working for anything that is not linked through
+asset(). Uploaded files get unique names, so they are cached as immutable
+too; everything else is revalidated on each use.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip alone still works everywhere
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+BROTLI_MAX_QUALITY_SIZE = 64 * 1024
+
+# Subdirectory written at runtime; its files are not fingerprinted
+UPLOADS_DIR = "uploads"
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "image/svg+xml", "audio/wav", "audio/x-wav",
+}
+
+
+class Asset:
+    """One fingerprinted file and its precompressed variants"""
+
+    def __init__(self, content: bytes, media_type: str, digest: str):
+        self.media_type = media_type
+        self.digest = digest
+        self.variants = {"identity": content}
+        self.compressed = not (media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES)
+        # The background pass and a first request may both get here; one compresses
+        self._compress_lock = threading.Lock()
+
+    def compress(self):
+        """Add the gzip and brotli variants (once)"""
+        if self.compressed:
+            return
+        with self._compress_lock:
+            if not self.compressed:
+                self._compress()
+
+    def _compress(self):
+        content = self.variants["identity"]
+        self._add_variant("gzip", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            # Top quality pays off on text; on audio it is slow and gains little
+            quality = 11 if len(content) <= BROTLI_MAX_QUALITY_SIZE and not self.media_type.startswith("audio/") else 5
+            self._add_variant("br", brotli.compress(content, quality=quality))
+        self.compressed = True
+
+    def _add_variant(self, encoding: str, body: bytes):
+        # Not worth a Content-Encoding when it barely shrinks
+        if len(body) < len(self.variants["identity"]) * 0.9:
+            self.variants[encoding] = body
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            token, _, params = part.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(token.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def response(self, headers: Headers) -> Response:
+        """Response with the best variant the client accepts; compress() must have run"""
+        encoding = self.choose_encoding(headers.get("accept-encoding", ""))
+        etag = f'"{self.digest}-{encoding}"'
+        response_headers = {"Cache-Control": IMMUTABLE, "ETag": etag, "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        if etag in headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=response_headers)
+        return Response(self.variants[encoding], media_type=self.media_type, headers=response_headers)
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles that also serves fingerprinted copies of the files it was built with"""
+
+    def __init__(self, directory: str):
+        super().__init__(directory=directory)
+        self.assets: Dict[str, Asset] = {}
+        self.urls: Dict[str, str] = {}
+
+    def build(self, url_prefix: str = "/static"):
+        """Hash every file under the directory"""
+        self.assets.clear()
+        self.urls.clear()
+        for root, dirs, files in os.walk(self.directory):
+            rel_root = os.path.relpath(root, self.directory)
+            if rel_root == ".":
+                dirs[:] = [d for d in dirs if d != UPLOADS_DIR]
+            for name in files:
+                rel_path = os.path.normpath(os.path.join(rel_root, name))
+                with open(os.path.join(root, name), "rb") as fh:
+                    content = fh.read()
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                stem, ext = os.path.splitext(rel_path)
+                hashed_path = f"{stem}.{digest}{ext}"
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                self.assets[hashed_path] = Asset(content, media_type, digest)
+                self.urls[rel_path.replace(os.sep, "/")] = f"{url_prefix}/{hashed_path.replace(os.sep, '/')}"
+        return self
+
+    def compress(self):
+        """Precompress every asset; run in the background after startup"""
+        for asset in list(self.assets.values()):
+            asset.compress()
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL of a static file, e.g. asset('css/admin.css')"""
+        path = path.lstrip("/")
+        return self.urls.get(path, f"/static/{path}")
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset: Optional[Asset] = self.assets.get(path)
+        if asset is not None:
+            if not asset.compressed:
+                # Brotli over a large file takes a while; never on the event loop
+                await run_in_threadpool(asset.compress)
+            return asset.response(Headers(scope=scope))
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            uploaded = path.split(os.sep, 1)[0] == UPLOADS_DIR
+            response.headers["Cache-Control"] = IMMUTABLE if uploaded else REVALIDATE
+        return response
@@ -0,0 +1,262 @@
+"""Online backups of the SQLite check-in database.
+
+A backup copies the live database with the SQLite backup API a few pages at a
+time and sleeps between steps, so its disk reads never crowd out kiosk writes.
+In WAL mode the copy reads one pinned snapshot while check-ins keep committing
+to the log. The copy is checked with PRAGMA quick_check, gzip-compressed and kept in BACKUP_DIR as
+checkin-YYYYMMDD-HHMMSS.db.gz; only the newest BACKUP_KEEP files are kept.
+When nothing changed since the newest backup, no new file is written.
+
+The server runs a backup every BACKUP_INTERVAL seconds (0 disables it). With
+several workers only one of them backs up per interval. The duration and sizes
+of the last run are written to backup-status.json and shown by GET
+/admin/backups. PostgreSQL deployments should use pg_dump instead.
+
+Usage:
+    python backup.py                                       take a backup now
+    python backup.py --list
+    python backup.py --restore checkin-20260101-120000.db.gz   (stop the server first)
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import database
+import storage
+
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", "3600"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "24"))
+# Pages copied per step and the pause after each step
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.02"))
+
+PREFIX = "checkin-"
+SUFFIX = ".db.gz"
+STATUS_FILE = "backup-status.json"
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+def backup_dir() -> str:
+    path = os.getenv("BACKUP_DIR", "")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(_database_path())), "backups")
+
+
+def _database_path() -> str:
+    if not isinstance(database.backend, storage.SQLiteBackend) or database.backend.path == ":memory:":
+        raise BackupError("Backups are only available for a SQLite database file; use pg_dump for PostgreSQL")
+    return database.backend.path
+
+
+def is_supported() -> bool:
+    """Whether the configured database can be backed up by this module"""
+    try:
+        _database_path()
+        return True
+    except BackupError:
+        return False
+
+
+def list_backups() -> List[dict]:
+    """Stored backups, newest first"""
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.startswith(PREFIX) and entry.name.endswith(SUFFIX):
+            stat = entry.stat()
+            backups.append({"name": entry.name, "bytes": stat.st_size,
+                            "created": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")})
+    return sorted(backups, key=lambda backup: backup["name"], reverse=True)
+
+
+def last_status() -> Optional[dict]:
+    """Metrics of the last backup run, or None if none ran yet"""
+    try:
+        with open(os.path.join(backup_dir(), STATUS_FILE)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _copy(source_path: str, target_path: str, pages: int, pause: float) -> int:
+    """Copy the live database step by step; returns the page count"""
+    source = sqlite3.connect(source_path, timeout=database.BUSY_TIMEOUT)
+    target = sqlite3.connect(target_path)
+    total = 0
+
+    def throttle(status, remaining, page_count):
+        nonlocal total
+        total = page_count
+        if remaining:
+            time.sleep(pause)
+
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # Pin one WAL snapshot for the whole copy. Without it every commit between two
+            # steps would make SQLite restart the backup, which never finishes during an event.
+            source.isolation_level = None
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=throttle)
+        result = target.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise BackupError(f"Backup copy failed its integrity check: {result}")
+    finally:
+        target.close()
+        source.close()
+    return total
+
+
+def _digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _rotate(directory: str, keep: int) -> int:
+    removed = 0
+    for backup in list_backups()[keep:]:
+        os.remove(os.path.join(directory, backup["name"]))
+        removed += 1
+    return removed
+
+
+def run_backup(keep: int = BACKUP_KEEP, pages: int = BACKUP_STEP_PAGES, pause: float = BACKUP_STEP_SLEEP) -> dict:
+    """Take one backup and rotate old ones; returns the run's metrics.
+    Raises BackupError if another process is already backing up."""
+    source_path = _database_path()
+    directory = backup_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise BackupError("Another backup is running")
+
+        started = time.perf_counter()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        temp = os.path.join(directory, f".{PREFIX}{stamp}.db")
+        try:
+            page_count = _copy(source_path, temp, pages, pause)
+            copied = time.perf_counter()
+            database_bytes = os.path.getsize(temp)
+            digest = _digest(temp)
+
+            previous = last_status() or {}
+            newest = list_backups()[:1]
+            if newest and previous.get("sha256") == digest and previous.get("file") == newest[0]["name"]:
+                name, backup_bytes, skipped = newest[0]["name"], newest[0]["bytes"], True
+            else:
+                name, skipped = f"{PREFIX}{stamp}{SUFFIX}", False
+                with open(temp, "rb") as raw, gzip.open(temp + ".gz", "wb", compresslevel=6) as out:
+                    shutil.copyfileobj(raw, out, 1024 * 1024)
+                os.replace(temp + ".gz", os.path.join(directory, name))
+                backup_bytes = os.path.getsize(os.path.join(directory, name))
+        finally:
+            for leftover in (temp, temp + ".gz"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        status = {
+            "file": name,
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "skipped_unchanged": skipped,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+            "copy_ms": round((copied - started) * 1000),
+            "pages": page_count,
+            "database_bytes": database_bytes,
+            "backup_bytes": backup_bytes,
+            "removed": _rotate(directory, keep),
+            "sha256": digest,
+        }
+        with open(os.path.join(directory, STATUS_FILE + ".tmp"), "w") as fh:
+            json.dump(status, fh, indent=2)
+        os.replace(os.path.join(directory, STATUS_FILE + ".tmp"), os.path.join(directory, STATUS_FILE))
+        return status
+
+
+def backup_due(interval: int = BACKUP_INTERVAL) -> bool:
+    """Whether the newest backup is older than interval (checked across workers)"""
+    status = last_status()
+    if not status:
+        return True
+    finished = datetime.strptime(status["finished_at"], "%Y-%m-%d %H:%M:%S")
+    return (datetime.now() - finished).total_seconds() >= interval
+
+
+def restore_backup(name: str, pages: int = 1024):
+    """Replace the live database with a stored backup. Run with the server stopped."""
+    target_path = _database_path()
+    path = name if os.path.exists(name) else os.path.join(backup_dir(), name)
+    if not os.path.exists(path):
+        raise BackupError(f"Backup not found: {name}")
+
+    temp = target_path + ".restore"
+    try:
+        with gzip.open(path, "rb") as packed, open(temp, "wb") as out:
+            shutil.copyfileobj(packed, out, 1024 * 1024)
+        source = sqlite3.connect(temp)
+        try:
+            result = source.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise BackupError(f"Backup failed its integrity check: {result}")
+            # Writing through the backup API keeps the live file's WAL consistent
+            target = sqlite3.connect(target_path, timeout=database.BUSY_TIMEOUT)
+            try:
+                source.backup(target, pages=pages)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--list", action="store_true", help="list stored backups")
+    parser.add_argument("--restore", metavar="BACKUP", help="replace the database with this backup")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="backups to keep")
+    parser.add_argument("--step-pages", type=int, default=BACKUP_STEP_PAGES)
+    parser.add_argument("--step-sleep", type=float, default=BACKUP_STEP_SLEEP, help="seconds to wait between steps")
+    return parser.parse_args(argv)
+
+
+def main(args):
+    if args.list:
+        for backup in list_backups():
+            print(f"{backup['name']}  {backup['bytes'] / 1024 / 1024:.1f} MB  {backup['created']}")
+    elif args.restore:
+        restore_backup(args.restore)
+        print(f"Restored {args.restore} into {_database_path()}")
+    else:
+        database.init_db()
+        status = run_backup(args.keep, args.step_pages, args.step_sleep)
+        state = "unchanged, kept" if status["skipped_unchanged"] else "wrote"
+        print(f"Backup {state} {status['file']}: {status['database_bytes'] / 1024 / 1024:.1f} MB database, "
+              f"{status['backup_bytes'] / 1024 / 1024:.1f} MB compressed, {status['duration_ms']} ms")
+
+
+if __name__ == "__main__":
+    try:
+        main(parse_args())
+    except BackupError as e:
+        raise SystemExit(str(e))
@@ -0,0 +1,163 @@
+"""Synthetic data generator for benchmarking database.py.
+
+Builds a check-in database of a configurable size using the application's own
+schema (database.init_db), so results stay comparable as the schema evolves.
+
+Usage:
+    python bench/datagen.py --users 100000 --checkins 2000000 --tables 1000 --days 30 -o big.db
+    python bench/datagen.py --users 100000 -o postgresql://localhost/checkin_bench
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Chen", "Priya", "Mohammed", "Sofia", "Hiroshi", "Amara", "Lucas", "Olga", "Mateo", "Aisha",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Nguyen", "Kim", "Patel", "Okafor", "Tanaka", "Ivanova", "Rossi", "Dubois", "Schmidt", "O'Brien",
+]
+
+BATCH_SIZE = 50_000
+
+
+def employee_id(n: int) -> str:
+    return f"E{n:08d}"
+
+
+def generate_users(count: int, tables: int, rng: random.Random) -> Iterator[tuple]:
+    for n in range(1, count + 1):
+        yield (
+            rng.choice(FIRST_NAMES),
+            f"{rng.choice(LAST_NAMES)}{'-' + rng.choice(LAST_NAMES) if rng.random() < 0.05 else ''}",
+            employee_id(n),
+            rng.randint(1, tables),
+        )
+
+
+def generate_checkins(count: int, users: int, days: int, rng: random.Random, end: datetime,
+                      event_ids: list) -> Iterator[tuple]:
+    start = end - timedelta(days=days)
+    for _ in range(count):
+        day_index = rng.randrange(days)
+        day = start + timedelta(days=day_index)
+        # Arrivals cluster around a morning doors-open time
+        seconds = int(min(max(rng.gauss(9.5 * 3600, 1.5 * 3600), 0), 86399))
+        when = day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(seconds=seconds)
+        # Events run back to back over the period, the last one is the active event
+        event_id = event_ids[day_index * len(event_ids) // days]
+        yield (employee_id(rng.randint(1, users)), int(when.replace(tzinfo=timezone.utc).timestamp()), event_id)
+
+
+def generate_sessions(count: int, now: datetime, rng: random.Random) -> Iterator[tuple]:
+    for n in range(count):
+        # Roughly a quarter of the sessions are already expired
+        expires = now + timedelta(days=rng.uniform(-10, 30))
+        yield (f"bench-session-{n:08d}", "admin", expires)
+
+
+def batched(rows: Iterator[tuple], size: int = BATCH_SIZE) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reset_database(database):
+    """Drop every table so a PostgreSQL database starts empty"""
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DROP SCHEMA public CASCADE")
+    cursor.execute("CREATE SCHEMA public")
+    conn.commit()
+    conn.close()
+
+
+def build_database(path: str, users: int, checkins: int, tables: int, days: int,
+                   sessions: int = 1000, seed: int = 1, quiet: bool = False, events: int = 1) -> str:
+    """Create (or replace) a database filled with synthetic data.
+
+    path is a SQLite file or a postgresql:// URL; an existing PostgreSQL
+    database has its application tables dropped first. Checkins are spread
+    over `events` consecutive events, the most recent of which is active.
+    """
+    import database
+    is_postgres = path.startswith(("postgresql://", "postgres://"))
+    if not is_postgres:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    database.configure(path)
+    if is_postgres:
+        reset_database(database)
+    database.init_db()
+    event_ids = [database.get_active_event()["id"]]
+    for n in range(2, events + 1):
+        event_ids.append(database.create_event(f"Bench Event {n}"))
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    started = time.perf_counter()
+
+    conn = database.get_db_connection()
+    if not is_postgres:
+        conn.execute("PRAGMA synchronous = OFF")
+    cursor = conn.cursor()
+    for batch in batched(generate_users(users, tables, rng)):
+        cursor.executemany(
+            "INSERT INTO users (first_name, last_name, employee_id, table_number) VALUES (?, ?, ?, ?)", batch
+        )
+    for batch in batched(generate_checkins(checkins, users, days, rng, now, event_ids)):
+        cursor.executemany("INSERT INTO checkins (employee_id, checkin_at, event_id) VALUES (?, ?, ?)", batch)
+    cursor.execute(
+        "INSERT INTO auth_users (username, password_hash, is_admin) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+        ("admin", database.hash_password("admin"), 1)
+    )
+    for batch in batched(generate_sessions(sessions, now, rng)):
+        cursor.executemany("INSERT INTO sessions (id, username, expires_at) VALUES (?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    # Rows were inserted directly, so the incremental rollups never saw them
+    database.rebuild_arrival_rollups()
+    database.rebuild_table_occupancy()
+
+    if not quiet:
+        size = "" if is_postgres else f"{os.path.getsize(path) / 1_048_576:.1f} MB "
+        print(f"Built {path}: {users} users, {checkins} checkins, {events} events, {tables} tables, {days} days, "
+              f"{sessions} sessions ({size}in {time.perf_counter() - started:.1f}s)")
+    return path
+
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", default="bench.db", help="SQLite file or postgresql:// URL to fill")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--checkins", type=int, default=2_000_000)
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=1, help="spread checkins over this many events")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    build_database(args.output, args.users, args.checkins, args.tables, args.days, args.sessions, args.seed,
+                   events=args.events)
@@ -0,0 +1,414 @@
+"""Event-scale load test for the check-in path.
+
+Starts the app with uvicorn against a temporary database, seeds a synthetic
+roster, then replays a realistic arrival curve from N simulated kiosks while
+admin dashboards poll the list endpoints. Prints latency percentiles,
+throughput, database write failures and lost check-ins.
+
+Usage:
+    python bench/loadtest.py --kiosks 8 --attendees 2000 --duration 60
+    python bench/loadtest.py --database-url postgresql://localhost/checkin_load
+
+With --database-url the server runs against that PostgreSQL database, which is
+emptied first, so point it at a throwaway database.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_USERNAME = "loadtest"
+ADMIN_PASSWORD = "loadtest-password"
+
+
+@dataclass
+class Scan:
+    at: float
+    badge_id: str
+    kind: str  # "first", "duplicate" or "unknown"
+
+
+@dataclass
+class Stats:
+    latencies: List[float] = field(default_factory=list)
+    ok: int = 0
+    not_found: int = 0
+    db_failures: int = 0
+    http_errors: int = 0
+    exceptions: int = 0
+    late: List[float] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def arrival_offsets(count: int, duration: float, curve: str, rng: random.Random) -> List[float]:
+    """Sample arrival times (seconds from start) following the given curve.
+
+    flat:  uniform arrivals across the window
+    peak:  doors-open surge, most people arrive in the first third
+    waves: two sessions, a large opening wave and a smaller after-lunch wave
+    """
+    offsets = []
+    for _ in range(count):
+        if curve == "flat":
+            t = rng.uniform(0, duration)
+        elif curve == "waves":
+            centre, spread = (0.2, 0.08) if rng.random() < 0.7 else (0.7, 0.06)
+            t = rng.gauss(centre * duration, spread * duration)
+        else:
+            t = rng.gammavariate(2.0, duration / 8.0)
+        offsets.append(min(max(t, 0.0), duration))
+    return offsets
+
+
+def build_schedule(args, roster: List[str], rng: random.Random) -> List[Scan]:
+    arrivals = rng.sample(roster, min(args.arrivals or len(roster), len(roster)))
+    scans = [
+        Scan(at, badge, "first")
+        for at, badge in zip(arrival_offsets(len(arrivals), args.duration, args.curve, rng), arrivals)
+    ]
+
+    # Badge re-taps a few seconds after the first scan
+    for scan in list(scans):
+        if rng.random() < args.duplicate_rate:
+            scans.append(Scan(min(scan.at + rng.uniform(0.5, 8.0), args.duration), scan.badge_id, "duplicate"))
+
+    # Visitors whose badge was never imported
+    unknown_count = int(len(arrivals) * args.unknown_rate)
+    for at in arrival_offsets(unknown_count, args.duration, args.curve, rng):
+        scans.append(Scan(at, f"UNKNOWN-{rng.randrange(10**8):08d}", "unknown"))
+
+    scans.sort(key=lambda s: s.at)
+    return scans
+
+
+def seed_database(db_url: str, attendees: int, tables: int, rng: random.Random) -> List[str]:
+    import database
+    from models import UserRow
+
+    # Seeding writes straight to the file; only the server runs with the profile under test
+    database.configure(db_url, durability="full")
+    if db_url.startswith(("postgresql://", "postgres://")):
+        import datagen
+        datagen.reset_database(database)
+    database.init_db()
+    roster = [f"E{i:07d}" for i in range(1, attendees + 1)]
+    users = [
+        UserRow(
+            employee_id=badge,
+            first_name=f"First{i}",
+            last_name=f"Last{rng.randrange(attendees)}",
+            table_number=rng.randint(1, tables),
+        )
+        for i, badge in enumerate(roster, 1)
+    ]
+    imported, errors = database.create_users_batch(users)
+    if errors:
+        raise RuntimeError(f"Seeding failed: {errors[:3]}")
+    return roster
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_url: str, port: int, workers: int, durability: str, log_file) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": db_url,
+        "DATABASE_DURABILITY": durability,
+        "ADMIN_USERNAME": ADMIN_USERNAME,
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+        "ENVIRONMENT": "development",
+    })
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--no-access-log",
+    ]
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def login(port: int) -> str:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    body = json.dumps({"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    conn.request("POST", "/auth/login", body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader("set-cookie") or ""
+    if "session_id=" not in cookie:
+        raise RuntimeError("Admin login failed")
+    return cookie.split(";", 1)[0]
+
+
+def run_kiosk(port: int, scans: List[Scan], start: float, stats: Stats, timeout: float):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    for scan in scans:
+        delay = start + scan.at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        lateness = max(0.0, -delay)
+        body = f"badge_id={scan.badge_id}"
+        sent = time.monotonic()
+        try:
+            conn.request("POST", "/checkin", body=body,
+                         headers={"Content-Type": "application/x-www-form-urlencoded"})
+            response = conn.getresponse()
+            payload = response.read()
+            elapsed = time.monotonic() - sent
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            with stats.lock:
+                stats.exceptions += 1
+            continue
+
+        with stats.lock:
+            stats.latencies.append(elapsed)
+            stats.late.append(lateness)
+            if response.status != 200:
+                stats.http_errors += 1
+                continue
+            data = json.loads(payload)
+            if data.get("success"):
+                stats.ok += 1
+            elif data.get("message") == "Checkin failed":
+                stats.db_failures += 1
+            else:
+                stats.not_found += 1
+
+
+def run_admin_poller(port: int, cookie: str, interval: float, stop: threading.Event, stats: Stats):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    paths = ["/admin/users", "/admin/history", "/admin/tables"]
+    while not stop.is_set():
+        for path in paths:
+            sent = time.monotonic()
+            try:
+                conn.request("GET", path, headers={"Cookie": cookie})
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                with stats.lock:
+                    stats.exceptions += 1
+                continue
+            with stats.lock:
+                stats.latencies.append(time.monotonic() - sent)
+                if response.status == 200:
+                    stats.ok += 1
+                else:
+                    stats.http_errors += 1
+        stop.wait(interval)
+
+
+def count_stored_checkins() -> int:
+    import database
+    conn = database.get_db_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM checkins").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def fetch_busy_stats(port: int, cookie: str) -> dict:
+    """Busy retries and failures counted by the storage layer of the worker that answers"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request("GET", "/admin/storage", headers={"Cookie": cookie})
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"/admin/storage answered {response.status}")
+    return json.loads(payload)
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f} ms"
+
+
+def report(args, scans: List[Scan], kiosk: Stats, admin: Stats, wall: float, stored: int, busy: dict) -> dict:
+    expected_unknown = sum(1 for s in scans if s.kind == "unknown")
+    lost = kiosk.ok - stored
+    result = {
+        "kiosks": args.kiosks,
+        "workers": args.workers,
+        "durability": args.durability,
+        "attendees": args.attendees,
+        "scans_planned": len(scans),
+        "scans_sent": len(kiosk.latencies),
+        "wall_seconds": round(wall, 2),
+        "checkin": {
+            "p50_ms": round(percentile(kiosk.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(kiosk.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(kiosk.latencies, 99) * 1000, 2),
+            "max_ms": round(max(kiosk.latencies, default=0.0) * 1000, 2),
+            "throughput_rps": round(len(kiosk.latencies) / wall, 2) if wall else 0.0,
+            "succeeded": kiosk.ok,
+            "not_found": kiosk.not_found,
+            "not_found_expected": expected_unknown,
+            "db_write_failures": kiosk.db_failures,
+            "http_errors": kiosk.http_errors,
+            "connection_errors": kiosk.exceptions,
+            "p95_schedule_lag_ms": round(percentile(kiosk.late, 95) * 1000, 2),
+        },
+        "admin": {
+            "requests": len(admin.latencies),
+            "p50_ms": round(percentile(admin.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(admin.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(admin.latencies, 99) * 1000, 2),
+            "http_errors": admin.http_errors,
+            "connection_errors": admin.exceptions,
+        },
+        "busy_retries": busy["busy_retries"],
+        "busy_failures": busy["busy_failures"],
+        "stored_checkins": stored,
+        "lost_checkins": max(lost, 0),
+    }
+
+    c, a = result["checkin"], result["admin"]
+    print()
+    print(f"Kiosks: {args.kiosks}   workers: {args.workers}   durability: {args.durability}   attendees: {args.attendees}   wall: {wall:.1f}s")
+    print(f"/checkin  requests {result['scans_sent']}/{len(scans)}   throughput {c['throughput_rps']} req/s")
+    print(f"  p50 {format_ms(c['p50_ms'] / 1000)}   p95 {format_ms(c['p95_ms'] / 1000)}   "
+          f"p99 {format_ms(c['p99_ms'] / 1000)}   max {format_ms(c['max_ms'] / 1000)}")
+    print(f"  succeeded {c['succeeded']}   not found {c['not_found']} (expected {expected_unknown})   "
+          f"db write failures {c['db_write_failures']}   http errors {c['http_errors']}   "
+          f"connection errors {c['connection_errors']}")
+    print(f"  p95 lag behind arrival schedule {format_ms(c['p95_schedule_lag_ms'] / 1000)}")
+    print(f"admin polling  requests {a['requests']}   p50 {format_ms(a['p50_ms'] / 1000)}   "
+          f"p95 {format_ms(a['p95_ms'] / 1000)}   p99 {format_ms(a['p99_ms'] / 1000)}")
+    # Counters are per process; with several workers only the one that answered is shown
+    scope = " (one worker)" if args.workers > 1 else ""
+    print(f"Busy database writes{scope}: {busy['busy_retries']} retried, {busy['busy_failures']} failed")
+    print(f"Stored checkins: {stored}   lost checkins: {result['lost_checkins']}")
+    return result
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--kiosks", type=int, default=8, help="number of simulated kiosks")
+    parser.add_argument("--attendees", type=int, default=2000, help="synthetic roster size")
+    parser.add_argument("--arrivals", type=int, default=0, help="attendees who show up (default: all)")
+    parser.add_argument("--tables", type=int, default=200, help="number of tables in the roster")
+    parser.add_argument("--duration", type=float, default=60.0, help="length of the arrival window in seconds")
+    parser.add_argument("--curve", choices=["peak", "flat", "waves"], default="peak", help="arrival curve shape")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="fraction of badges scanned twice")
+    parser.add_argument("--unknown-rate", type=float, default=0.02, help="unknown badges per arrival")
+    parser.add_argument("--admin-pollers", type=int, default=2, help="concurrent admin dashboards")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds between dashboard refreshes")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="run against this PostgreSQL database (emptied first)")
+    parser.add_argument("--durability", choices=["full", "normal", "fast", "memory"], default="full",
+                        help="DATABASE_DURABILITY of the server (memory needs --workers 1)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for a reproducible run")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary database and server log")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="checkin-loadtest-")
+    db_path = os.path.join(workdir, "checkin.db")
+    log_path = os.path.join(workdir, "server.log")
+
+    db_url = args.database_url or f"sqlite:///{db_path}"
+
+    print(f"Seeding {args.attendees} attendees into {args.database_url or db_path}")
+    roster = seed_database(db_url, args.attendees, args.tables, rng)
+    scans = build_schedule(args, roster, rng)
+
+    port = free_port()
+    with open(log_path, "w") as log_file:
+        server = start_server(db_url, port, args.workers, args.durability, log_file)
+        try:
+            wait_until_ready(port)
+            cookie = login(port)
+
+            queues = [[] for _ in range(args.kiosks)]
+            for i, scan in enumerate(scans):
+                queues[i % args.kiosks].append(scan)
+
+            kiosk_stats, admin_stats = Stats(), Stats()
+            stop = threading.Event()
+            pollers = [
+                threading.Thread(target=run_admin_poller, args=(port, cookie, args.poll_interval, stop, admin_stats))
+                for _ in range(args.admin_pollers)
+            ]
+            start = time.monotonic() + 0.5
+            kiosks = [
+                threading.Thread(target=run_kiosk, args=(port, queue, start, kiosk_stats, args.timeout))
+                for queue in queues
+            ]
+            print(f"Replaying {len(scans)} scans from {args.kiosks} kiosks over {args.duration:.0f}s "
+                  f"({args.curve} curve) with {args.admin_pollers} admin pollers")
+            for thread in pollers + kiosks:
+                thread.start()
+            for thread in kiosks:
+                thread.join()
+            wall = time.monotonic() - start
+            stop.set()
+            for thread in pollers:
+                thread.join()
+            busy = fetch_busy_stats(port, cookie)
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+
+    result = report(args, scans, kiosk_stats, admin_stats, wall,
+                    count_stored_checkins(), busy)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(result, fh, indent=2)
+    if args.keep:
+        print(f"Kept database and server log in {workdir}")
+    else:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""Microbenchmarks for database.py.
+
+Times each public database function against a synthetic database (see
+datagen.py), recording wall time and tracemalloc peak memory, and compares
+the results with a stored baseline.
+
+Usage:
+    python bench/microbench.py                        # build a default-sized database and run
+    python bench/microbench.py --db big.db            # run against an existing database
+    python bench/microbench.py --save-baseline        # record the current numbers as the baseline
+    python bench/microbench.py --only search_users    # run a subset
+    python bench/microbench.py --database-url postgresql://localhost/checkin_bench
+
+With --database-url the benchmarks run against PostgreSQL. The database is
+rebuilt from scratch and modified in place, so point it at a throwaway database.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import datagen  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class Benchmark:
+    """A named call against database.py with optional per-run setup.
+
+    setup() runs outside the timed region and returns the arguments for fn.
+    Mutating benchmarks run against a scratch copy of the database.
+    """
+
+    def __init__(self, name: str, fn: Callable, setup: Optional[Callable] = None,
+                 mutates: bool = False, repeat: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.setup = setup or (lambda: ())
+        self.mutates = mutates
+        self.repeat = repeat
+
+
+def build_benchmarks(users: int) -> List[Benchmark]:
+    import database
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastjson import FastJSONResponse
+    from models import CheckinRecord, UserRow
+
+    state = {"checkout": 0, "batch": 0}
+
+    def next_checkout():
+        state["checkout"] += 1
+        return (datagen.employee_id((state["checkout"] * 7919) % users + 1),)
+
+    def new_batch():
+        state["batch"] += 1
+        base = users + state["batch"] * 1000
+        return ([
+            UserRow(employee_id=datagen.employee_id(base + i), first_name="Bench", last_name=f"User{i}",
+                 table_number=i % 50 + 1)
+            for i in range(1000)
+        ],)
+
+    def current_roster():
+        # Re-importing the roster as it stands
+        return ([UserRow(row["first_name"], row["last_name"], row["employee_id"], row["table_number"])
+                 for row in database.get_user_rows()],)
+
+    def after_checkin():
+        # One check-in since the version a client last saw
+        since = database.get_row_version()
+        state["checkout"] += 1
+        database.create_checkin(datagen.employee_id((state["checkout"] * 7919) % users + 1))
+        return (since,)
+
+    def existing_session():
+        return ("bench-session-00000001",)
+
+    def fresh_session():
+        return (database.create_session("admin"),)
+
+    # Response bodies of the list endpoints: FastAPI's default encoding of pydantic objects vs the fast path
+    def default_body(load):
+        return lambda: JSONResponse(jsonable_encoder(load())).body
+
+    def fast_body(load):
+        return lambda: FastJSONResponse(load()).body
+
+    def last_day():
+        # Check-ins of the last 24 hours, the window a morning report covers
+        now = int(time.time())
+        return ("", now - 86400, now)
+
+    middle_id = datagen.employee_id(users // 2 or 1)
+    return [
+        Benchmark("get_user_by_employee_id", database.get_user_by_employee_id, lambda: (middle_id,)),
+        Benchmark("create_checkin", database.create_checkin, lambda: (middle_id,), mutates=True),
+        Benchmark("get_all_users", database.get_all_users),
+        Benchmark("search_users", database.search_users, lambda: ("smith",)),
+        Benchmark("search_users_badge", database.search_users, lambda: (middle_id,)),
+        Benchmark("get_checkin_history", database.get_checkin_history),
+        Benchmark("get_checkin_history_search", database.get_checkin_history, lambda: ("garcia",)),
+        Benchmark("get_tables_with_users", database.get_tables_with_users),
+        Benchmark("get_tables_with_users_search", database.get_tables_with_users, lambda: ("patel",)),
+        Benchmark("get_table_occupancy", database.get_table_occupancy),
+        Benchmark("users_response_default", default_body(database.get_all_users)),
+        Benchmark("users_response_fast", fast_body(database.get_user_rows)),
+        Benchmark("history_response_default", default_body(
+            lambda: [CheckinRecord(**row._asdict()) for row in database.get_checkin_history()])),
+        Benchmark("history_response_fast", fast_body(database.get_checkin_history_rows)),
+        Benchmark("tables_response_default", default_body(database.get_tables_with_users)),
+        Benchmark("tables_response_fast", fast_body(database.get_tables_with_users)),
+        Benchmark("get_user_changes", database.get_user_changes, after_checkin, mutates=True),
+        Benchmark("get_history_changes", database.get_history_changes, after_checkin, mutates=True),
+        Benchmark("get_table_changes", database.get_table_changes, after_checkin, mutates=True),
+        Benchmark("get_user_page", database.get_user_page, lambda: ("", users // 2, 200)),
+        Benchmark("get_checkin_history_page", database.get_checkin_history_page, lambda: ("", 0, 200)),
+        Benchmark("get_checkin_history_range", database.get_checkin_history_rows, last_day),
+        Benchmark("get_table_page", database.get_table_page, lambda: ("", 0, 200, "user_count_desc")),
+        Benchmark("get_export_data", database.get_export_data),
+        Benchmark("get_arrival_stats", database.get_arrival_stats),
+        Benchmark("checkout_user", database.checkout_user, next_checkout, mutates=True),
+        Benchmark("create_users_batch_1000", database.create_users_batch, new_batch, mutates=True),
+        Benchmark("sync_users_unchanged", database.sync_users, current_roster, mutates=True),
+        Benchmark("create_session", database.create_session, lambda: ("admin",), mutates=True),
+        Benchmark("get_session_user", database.get_session_user, existing_session),
+        Benchmark("delete_session", database.delete_session, fresh_session, mutates=True),
+        Benchmark("cleanup_expired_sessions", database.cleanup_expired_sessions, mutates=True),
+    ]
+
+
+def run_benchmark(bench: Benchmark, repeat: int) -> dict:
+    times = []
+    for _ in range(bench.repeat or repeat):
+        args = bench.setup()
+        started = time.perf_counter()
+        bench.fn(*args)
+        times.append(time.perf_counter() - started)
+
+    # Peak memory is measured on a separate run; tracemalloc distorts timings
+    args = bench.setup()
+    tracemalloc.start()
+    bench.fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "runs": len(times),
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print a comparison table and return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':32} {'median':>11} {'baseline':>11} {'ratio':>7} {'peak KiB':>11} {'baseline':>11}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base:
+            ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            mem_ratio = result["peak_kib"] / base["peak_kib"] if base["peak_kib"] else 1.0
+            flag = ""
+            if ratio > threshold or mem_ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            elif ratio < 1 / threshold:
+                flag = "  faster"
+            print(f"{name:32} {result['median_ms']:9.2f}ms {base['median_ms']:9.2f}ms {ratio:6.2f}x "
+                  f"{result['peak_kib']:11.1f} {base['peak_kib']:11.1f}{flag}")
+        else:
+            print(f"{name:32} {result['median_ms']:9.2f}ms {'-':>11} {'-':>7} {result['peak_kib']:11.1f} {'-':>11}")
+    return regressions
+
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", help="existing database to benchmark (default: build one)")
+    parser.add_argument("--database-url", help="benchmark a PostgreSQL database instead (rebuilt in place)")
+    parser.add_argument("--users", type=int, default=20_000, help="users when building a database")
+    parser.add_argument("--checkins", type=int, default=200_000, help="checkins when building a database")
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if anything regressed")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="checkin-microbench-")
+    try:
+        import database
+        if args.database_url:
+            users = args.users
+            datagen.build_database(args.database_url, args.users, args.checkins, args.tables, args.days)
+        else:
+            if args.db:
+                source = args.db
+                import sqlite3
+                users = sqlite3.connect(source).execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            else:
+                source = os.path.join(workdir, "source.db")
+                users = args.users
+                datagen.build_database(source, args.users, args.checkins, args.tables, args.days)
+
+            # Every run works on a scratch copy so mutating benchmarks never touch the source
+            scratch = os.path.join(workdir, "scratch.db")
+            shutil.copyfile(source, scratch)
+            database.configure(scratch)
+
+        results = {}
+        for bench in build_benchmarks(users):
+            if args.only and bench.name not in args.only:
+                continue
+            results[bench.name] = run_benchmark(bench, args.repeat)
+            r = results[bench.name]
+            print(f"{bench.name:32} median {r['median_ms']:9.2f}ms  min {r['min_ms']:9.2f}ms  "
+                  f"peak {r['peak_kib']:10.1f} KiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = {"users": users, "source": args.db or f"generated {args.users}u/{args.checkins}c",
+            "backend": "postgresql" if args.database_url else "sqlite"}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            stored = json.load(fh)
+        baseline = stored.get("results", {})
+        if stored.get("meta", {}).get("backend", "sqlite") != meta["backend"]:
+            print(f"\nNote: baseline was recorded on {stored['meta'].get('backend', 'sqlite')}, "
+                  f"use --baseline to compare like with like")
+        if stored.get("meta", {}).get("users") != users:
+            print(f"\nNote: baseline was recorded with {stored.get('meta', {}).get('users')} users")
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        with open(args.baseline, "w") as fh:
+            json.dump({"meta": meta, "results": merged}, fh, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"\nRegressed: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
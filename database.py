@@ -1,26 +1,240 @@
-import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Optional
-from models import User, Checkin, CheckinRecord
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from models import User, Checkin, UserRow, CheckinRow
 import secrets
+import threading
 import hashlib
-import bcrypt
+import storage
 
 import os
 DATABASE = os.getenv("DATABASE_PATH", "checkin.db")
+# DATABASE_URL selects the backend (sqlite:///path or postgresql://...); see storage.py
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+# Seconds a connection waits on a locked database before raising SQLITE_BUSY
+BUSY_TIMEOUT = float(os.getenv("DATABASE_BUSY_TIMEOUT", "5"))
+# Extra attempts to take the write lock after the busy timeout has expired
+WRITE_RETRIES = int(os.getenv("DATABASE_WRITE_RETRIES", "5"))
+# Connection pool bounds per worker process (PostgreSQL only)
+POOL_MIN = int(os.getenv("DATABASE_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DATABASE_POOL_MAX", "10"))
+# Durability profile: full, normal, fast or memory (see storage.DURABILITY_PROFILES)
+DURABILITY = os.getenv("DATABASE_DURABILITY", "full")
+# Seconds between snapshots of an in-memory database to its file (memory profile only)
+SNAPSHOT_INTERVAL = int(os.getenv("DATABASE_SNAPSHOT_INTERVAL", "30"))
+
+backend: storage.StorageBackend = None
+# Exception classes of the active backend, used in except clauses below
+DatabaseError = Exception
+IntegrityError = Exception
+
+def configure(url: str = "", durability: str = ""):
+    """Select the storage backend; defaults to DATABASE_URL, then DATABASE_PATH, and DATABASE_DURABILITY"""
+    global backend, DatabaseError, IntegrityError
+    if backend is not None:
+        backend.close()
+    backend = storage.backend_from_url(
+        url or DATABASE_URL or DATABASE,
+        busy_timeout=BUSY_TIMEOUT, write_retries=WRITE_RETRIES,
+        pool_min=POOL_MIN, pool_max=POOL_MAX, durability=durability or DURABILITY,
+    )
+    DatabaseError = backend.Error
+    IntegrityError = backend.IntegrityError
+    _settings_cache.clear()
+    _roster_cache.clear()
+    return backend
+
+def close_db():
+    """Release pooled connections and save an in-memory database (called at shutdown)"""
+    if backend is not None:
+        backend.close()
+
+def is_in_memory() -> bool:
+    """Whether the database lives in memory (DATABASE_DURABILITY=memory)"""
+    return backend.in_memory
+
+def save_snapshot() -> bool:
+    """Write an in-memory database to its file if it changed since the last snapshot"""
+    return backend.save_snapshot()
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return backend.connect()
 
-def init_db():
+def busy_stats() -> dict:
+    """Busy errors retried and write transactions failed by them in this process"""
+    return backend.busy_stats()
+
+def is_busy_error(error: Exception) -> bool:
+    """Check whether an error means another writer holds the lock (SQLITE_BUSY and friends)"""
+    return backend.is_busy_error(error)
+
+@contextmanager
+def write_transaction():
+    """Yield a cursor inside a write transaction that commits on success.
+
+    On SQLite the write lock is taken up front with BEGIN IMMEDIATE, so SQLITE_BUSY
+    can only occur at the start of the transaction where it is safe to retry. Any
+    exception rolls the transaction back and propagates to the caller.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    try:
+        backend.begin_write(conn)
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    except backend.Error as e:
+        # Retries are counted by begin_write; this counts the transactions that still failed
+        if is_busy_error(e):
+            backend.count_busy(failed=True)
+        raise
+    finally:
+        conn.close()
+
+@contextmanager
+def read_snapshot(long_read: bool = False):
+    """Yield a connection for reports built from several queries (export, full lists, pages).
+
+    Every query on it sees the database as of one moment, so a page and its total, or
+    the two halves of an export, agree with each other. Pass long_read for exports and
+    unpaged lists, which must never delay a check-in: see StorageBackend.connect_snapshot.
+    """
+    conn = backend.connect_snapshot(long_read)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def get_data_version(cursor, name: str) -> int:
+    """Current value of a data-version counter (0 if it was never bumped)"""
+    cursor.execute("SELECT version FROM data_versions WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def bump_data_version(cursor, name: str):
+    """Increment a data-version counter inside the caller's write transaction"""
     cursor.execute("""
+        INSERT INTO data_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = data_versions.version + 1
+    """, (name,))
+
+def next_row_version(cursor) -> int:
+    """Bump the row-change counter and return the version to stamp this transaction's
+    users and checkins changes with. The counter row stays locked until commit, so
+    versions become visible in increasing order."""
+    cursor.execute("""
+        INSERT INTO data_versions (name, version) VALUES ('rows', 1)
+        ON CONFLICT(name) DO UPDATE SET version = data_versions.version + 1
+        RETURNING version
+    """)
+    return cursor.fetchone()[0]
+
+def lock_row_version(cursor):
+    """Lock the row-change counter without bumping it, for writers that first read who is
+    checked in and may end up changing nothing. Concurrent check-ins wait here as they do
+    in next_row_version, which then returns the next version without waiting again."""
+    cursor.execute("""
+        INSERT INTO data_versions (name, version) VALUES ('rows', 0)
+        ON CONFLICT(name) DO UPDATE SET version = data_versions.version
+    """)
+
+def next_roster_version(cursor, removed: bool = False) -> int:
+    """Bump the roster counter and return the version to stamp this transaction's added
+    and changed users with; the kiosk roster delta is keyed on it. With removed, users
+    were deleted: kiosks holding an older version reload the whole roster."""
+    cursor.execute("""
+        INSERT INTO data_versions (name, version) VALUES ('roster', 1)
+        ON CONFLICT(name) DO UPDATE SET version = data_versions.version + 1
+        RETURNING version
+    """)
+    version = cursor.fetchone()[0]
+    if removed:
+        cursor.execute("""
+            INSERT INTO data_versions (name, version) VALUES ('roster_reset', ?)
+            ON CONFLICT(name) DO UPDATE SET version = excluded.version
+        """, (version,))
+    return version
+
+def reset_row_changes(cursor) -> int:
+    """Record a bulk change (clearing, archiving, switching events) that deltas do not
+    describe; clients holding an older version reload in full. Returns the new version."""
+    version = next_row_version(cursor)
+    bump_data_version(cursor, "bulk_changes")
+    cursor.execute("""
+        INSERT INTO data_versions (name, version) VALUES ('rows_reset', ?)
+        ON CONFLICT(name) DO UPDATE SET version = excluded.version
+    """, (version,))
+    # No delta reaches back past a reset, so older tombstones are not needed any more
+    cursor.execute("DELETE FROM removed_rows")
+    return version
+
+class VersionedCache:
+    """Per-process cache invalidated through a counter in the data_versions table.
+
+    Each uvicorn worker keeps its own copy. Writers bump the counter in the same
+    transaction as the change, so every worker reloads on its next read.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # (version, value), replaced in one assignment so readers never pair a value with another version
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self, cursor, loader):
+        version = get_data_version(cursor, self.name)
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader(cursor)
+        # Loads on different threads can finish out of order; an older one never replaces a newer one
+        with self._lock:
+            if self._entry is None or self._entry[0] < version:
+                self._entry = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entry = None
+
+_settings_cache = VersionedCache("settings")
+_roster_cache = VersionedCache("roster")
+
+DEFAULT_SETTINGS = {
+    "welcome_banner": "RFID Checkin Station",
+    "secondary_banner": "Scan your badge to check in",
+    "text_color": "#333333",
+    "foreground_color": "#ffffff",
+    "background_color": "#f5f5f5",
+    "background_image": "",
+    "success_sound": "",
+    "error_sound": "",
+}
+configure()
+
+def init_db():
+    """Create the schema and default settings.
+
+    Safe to run from several workers or nodes at once: engine setup (WAL on SQLite)
+    runs before the schema transaction, which holds the write lock (BEGIN IMMEDIATE on
+    SQLite, an advisory lock on PostgreSQL) from its first statement, so concurrent
+    starters run it one after another and later ones find the schema in place.
+    """
+    backend.prepare()
+
+    with write_transaction() as cursor:
+        backend.lock_schema(cursor)
+        _create_schema(cursor)
+
+def _create_schema(cursor):
+    b = backend
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {b.serial_pk},
             employee_id TEXT UNIQUE NOT NULL,
             first_name TEXT NOT NULL,
             last_name TEXT NOT NULL,
@@ -28,11 +242,11 @@ def init_db():
         )
     """)
     
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS checkins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {b.serial_pk},
             employee_id TEXT NOT NULL,
-            checkin_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            checkin_at {b.epoch_integer} NOT NULL,
             FOREIGN KEY (employee_id) REFERENCES users (employee_id)
         )
     """)
@@ -45,39 +259,150 @@ def init_db():
     """)
     
     # Authentication tables
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS auth_users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {b.serial_pk},
             username TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL,
-            is_admin BOOLEAN NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
+            is_admin {b.boolean} NOT NULL DEFAULT 0,
+            created_at {b.timestamp_text} DEFAULT {b.now_text},
+            last_login {b.timestamp_text}
         )
     """)
     
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS sessions (
             id TEXT PRIMARY KEY,
             username TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at {b.timestamp_text} DEFAULT {b.now_text},
             expires_at TIMESTAMP NOT NULL,
             FOREIGN KEY (username) REFERENCES auth_users (username)
         )
     """)
     
-    # Initialize default settings if they don't exist
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("welcome_banner", "RFID Checkin Station"))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("secondary_banner", "Scan your badge to check in"))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("text_color", "#333333"))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("foreground_color", "#ffffff"))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("background_color", "#f5f5f5"))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("background_image", ""))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("success_sound", ""))
-    cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("error_sound", ""))
-    
-    conn.commit()
-    conn.close()
+    # Change counters used to invalidate per-worker caches
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Events partition check-in data; the active one is kept in settings
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS events (
+            id {b.serial_pk},
+            name TEXT NOT NULL,
+            created_at {b.timestamp_text} DEFAULT {b.now_text}
+        )
+    """)
+    
+    # Check-then-insert is safe only because init_db holds the schema lock: a starter
+    # waiting on it sees the event (and active_event_id) the first one committed
+    cursor.execute("SELECT id FROM events ORDER BY id LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        default_event_id = row[0]
+    else:
+        cursor.execute("INSERT INTO events (name) VALUES (?) RETURNING id", ("Default Event",))
+        default_event_id = cursor.fetchone()[0]
+    
+    if b.name == "postgresql":
+        # SQLite never enforced this key; check-ins outlive the roster entries they refer to
+        cursor.execute("ALTER TABLE checkins DROP CONSTRAINT IF EXISTS checkins_employee_id_fkey")
+    
+    if "event_id" not in b.column_names(cursor, "checkins"):
+        # Check-ins recorded before events existed belong to the first event
+        cursor.execute("ALTER TABLE checkins ADD COLUMN event_id INTEGER REFERENCES events (id)")
+        cursor.execute("UPDATE checkins SET event_id = ? WHERE event_id IS NULL", (default_event_id,))
+    
+    if "checkin_at" not in b.column_names(cursor, "checkins"):
+        # Check-in times used to be 'YYYY-MM-DD HH:MM:SS' text; epoch seconds compare and index as integers
+        cursor.execute(f"ALTER TABLE checkins ADD COLUMN checkin_at {b.epoch_integer} NOT NULL DEFAULT 0")
+        cursor.execute(f"UPDATE checkins SET checkin_at = COALESCE({b.text_to_epoch('checkin_time')}, 0)")
+        cursor.execute("DROP INDEX IF EXISTS idx_checkins_event_employee")
+        cursor.execute("DROP INDEX IF EXISTS idx_checkins_event_time")
+        cursor.execute("ALTER TABLE checkins DROP COLUMN checkin_time")
+    
+    # Row versions let the admin lists fetch only what changed since their last load
+    for table in ("users", "checkins"):
+        if "row_version" not in b.column_names(cursor, table):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    # Tombstones for deleted check-ins and users that left a table, kept until the next reset
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS removed_rows (
+            row_version INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            table_number INTEGER
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_removed_rows_version ON removed_rows (row_version, kind)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_row_version ON users (row_version)")
+    # Roster versions change only with names and tables, so check-ins never reach kiosk roster deltas
+    if "roster_version" not in b.column_names(cursor, "users"):
+        cursor.execute("ALTER TABLE users ADD COLUMN roster_version INTEGER NOT NULL DEFAULT 0")
+        # Kiosks still holding a row version from before start over from the full roster
+        next_roster_version(cursor, removed=True)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_roster_version ON users (roster_version)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkins_event_version ON checkins (event_id, row_version)")
+    
+    # Per-minute arrival counters kept up to date by create_checkin and checkout_user
+    rollups_exist = bool(b.column_names(cursor, "arrival_rollups"))
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS arrival_rollups (
+            event_id INTEGER NOT NULL,
+            minute TEXT NOT NULL,
+            arrivals INTEGER NOT NULL DEFAULT 0,
+            departures INTEGER NOT NULL DEFAULT 0,
+            scans INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (event_id, minute)
+        )
+    """)
+    if not rollups_exist:
+        _rebuild_arrival_rollups(cursor)
+    
+    # Assigned and checked-in counts per table for the active event
+    occupancy_exists = bool(b.column_names(cursor, "table_occupancy"))
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_occupancy (
+            table_number INTEGER PRIMARY KEY,
+            assigned INTEGER NOT NULL DEFAULT 0,
+            checked_in INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Every check-in query filters on the active event first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkins_event_employee ON checkins (event_id, employee_id, checkin_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkins_event_time ON checkins (event_id, checkin_at)")
+    if not b.column_names(cursor, "checkins_readable"):
+        # Check-ins with readable UTC times, for reports and ad-hoc SQL
+        cursor.execute(f"""
+            CREATE VIEW checkins_readable AS
+            SELECT id, employee_id, event_id, checkin_at, {b.epoch_text('checkin_at')} AS checkin_time, row_version
+            FROM checkins
+        """)
+    # Admin pages walk users in name order and stop after one page
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name ON users (first_name, last_name, id)")
+    
+    cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT DO NOTHING", ("active_event_id", str(default_event_id)))
+    if not occupancy_exists:
+        cursor.execute("SELECT value FROM settings WHERE key = ?", ("active_event_id",))
+        _rebuild_table_occupancy(cursor, int(cursor.fetchone()[0]))
+    
+    # Initialize default settings if they don't exist, in one statement
+    cursor.execute(
+        f"INSERT INTO settings (key, value) VALUES {', '.join(['(?, ?)'] * len(DEFAULT_SETTINGS))} ON CONFLICT DO NOTHING",
+        tuple(item for pair in DEFAULT_SETTINGS.items() for item in pair)
+    )
+
+def check_ready():
+    """Cheap probe that the database is reachable and initialised; raises on failure"""
+    conn = get_db_connection()
+    try:
+        conn.cursor().execute("SELECT 1 FROM settings WHERE key = ?", ("active_event_id",)).fetchone()
+    finally:
+        conn.close()
 
 def get_user_by_employee_id(employee_id: str) -> Optional[User]:
     conn = get_db_connection()
@@ -96,182 +421,523 @@ def get_user_by_employee_id(employee_id: str) -> Optional[User]:
         )
     return None
 
-def create_checkin(employee_id: str) -> bool:
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _active_event_id(cursor) -> int:
+    return int(_settings_cache.get(cursor, _load_settings)["active_event_id"])
+
+def _add_to_rollup(cursor, event_id: int, minute: str, arrivals: int = 0, departures: int = 0, scans: int = 0):
+    cursor.execute("""
+        INSERT INTO arrival_rollups (event_id, minute, arrivals, departures, scans) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(event_id, minute) DO UPDATE SET
+            arrivals = arrival_rollups.arrivals + excluded.arrivals,
+            departures = arrival_rollups.departures + excluded.departures,
+            scans = arrival_rollups.scans + excluded.scans
+    """, (event_id, minute, arrivals, departures, scans))
+
+def _is_checked_in(cursor, event_id: int, employee_id: str) -> bool:
+    cursor.execute("SELECT 1 FROM checkins WHERE event_id = ? AND employee_id = ? LIMIT 1", (event_id, employee_id))
+    return cursor.fetchone() is not None
+
+def _touch_user(cursor, employee_id: str, version: int):
+    # A user's check-in state is part of their row in the admin lists
+    cursor.execute("UPDATE users SET row_version = ? WHERE employee_id = ?", (version, employee_id))
+
+def _add_to_table(cursor, table_number: int, assigned: int = 0, checked_in: int = 0):
+    cursor.execute("""
+        INSERT INTO table_occupancy (table_number, assigned, checked_in) VALUES (?, ?, ?)
+        ON CONFLICT(table_number) DO UPDATE SET
+            assigned = table_occupancy.assigned + excluded.assigned,
+            checked_in = table_occupancy.checked_in + excluded.checked_in
+    """, (table_number, assigned, checked_in))
+    if assigned < 0:
+        cursor.execute("DELETE FROM table_occupancy WHERE table_number = ? AND assigned <= 0", (table_number,))
+
+def _add_checked_in(cursor, employee_id: str, delta: int):
+    cursor.execute("""
+        UPDATE table_occupancy SET checked_in = checked_in + ?
+        WHERE table_number = (SELECT table_number FROM users WHERE employee_id = ?)
+    """, (delta, employee_id))
+
+def _add_checked_in_by_table(cursor, deltas: dict):
+    cursor.executemany("UPDATE table_occupancy SET checked_in = checked_in + ? WHERE table_number = ?",
+                       [(delta, table_number) for table_number, delta in deltas.items()])
+
+def _rebuild_table_occupancy(cursor, event_id: int):
+    cursor.execute("DELETE FROM table_occupancy")
+    cursor.execute("""
+        INSERT INTO table_occupancy (table_number, assigned, checked_in)
+        SELECT u.table_number, COUNT(*),
+               SUM(CASE WHEN EXISTS (
+                   SELECT 1 FROM checkins c WHERE c.event_id = ? AND c.employee_id = u.employee_id
+               ) THEN 1 ELSE 0 END)
+        FROM users u
+        GROUP BY u.table_number
+    """, (event_id,))
+
+def rebuild_table_occupancy():
+    """Recompute the per-table counters from users and checkins (after bulk changes)"""
+    with write_transaction() as cursor:
+        _rebuild_table_occupancy(cursor, _active_event_id(cursor))
+
+def to_epoch(value) -> int:
+    """Epoch seconds of a datetime or 'YYYY-MM-DD HH:MM:SS' text; times without a zone are UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def format_epoch(epoch: int) -> str:
+    """A stored check-in time as 'YYYY-MM-DD HH:MM:SS' text in UTC"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def create_checkin(employee_id: str) -> Optional[str]:
+    """Record a check-in; returns its stored time as text, or None if it failed"""
     try:
-        cursor.execute("INSERT INTO checkins (employee_id) VALUES (?)", (employee_id,))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.Error:
-        conn.close()
-        return False
+        with write_transaction() as cursor:
+            # Taking the version first locks the counter row, so on PostgreSQL a concurrent
+            # scan of the same badge waits here instead of also counting a first arrival
+            version = next_row_version(cursor)
+            event_id = _active_event_id(cursor)
+            first_arrival = not _is_checked_in(cursor, event_id, employee_id)
+            cursor.execute(
+                f"INSERT INTO checkins (employee_id, event_id, checkin_at, row_version) VALUES (?, ?, {backend.now_epoch}, ?) RETURNING checkin_at",
+                (employee_id, event_id, version)
+            )
+            checkin_time = format_epoch(cursor.fetchone()[0])
+            _touch_user(cursor, employee_id, version)
+            _add_to_rollup(cursor, event_id, checkin_time[:16], arrivals=int(first_arrival), scans=1)
+            if first_arrival:
+                _add_checked_in(cursor, employee_id, 1)
+        return checkin_time
+    except DatabaseError:
+        return None
 
-def get_checkin_history(search: str = "") -> List[CheckinRecord]:
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def _checkin_range(start: Optional[int], end: Optional[int]) -> tuple:
+    """WHERE conditions and parameters keeping check-ins (c) with start <= time < end (epoch seconds)"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("c.checkin_at >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("c.checkin_at < ?")
+        params.append(end)
+    return conditions, params
+
+def _query_checkin_history(cursor, search: str, since: Optional[int] = None, offset: int = 0,
+                           limit: Optional[int] = None, start: Optional[int] = None, end: Optional[int] = None):
+    event_id = _active_event_id(cursor)
+    source = "checkins c"
+    params = []
+    if since is not None:
+        # New check-ins, plus every check-in of a user whose row changed. CROSS JOIN fixes
+        # SQLite's join order so it starts from the few changed rows instead of scanning the event
+        source = """(
+            SELECT id FROM checkins WHERE event_id = ? AND row_version > ?
+            UNION
+            SELECT c2.id FROM users u2 CROSS JOIN checkins c2
+            WHERE c2.event_id = ? AND c2.employee_id = u2.employee_id AND u2.row_version > ?
+        ) changed
+        CROSS JOIN checkins c"""
+        params += [event_id, since, event_id, since]
+    conditions = ["c.event_id = ?"]
+    params.append(event_id)
+    if since is not None:
+        conditions.append("c.id = changed.id")
+    # A time range is an index range scan on (event_id, checkin_at)
+    range_conditions, range_params = _checkin_range(start, end)
+    conditions += range_conditions
+    params += range_params
     if search.strip():
-        search_pattern = f"%{search}%"
-        cursor.execute("""
-            SELECT u.first_name, u.last_name, u.employee_id, u.table_number, c.checkin_time
-            FROM checkins c
-            JOIN users u ON c.employee_id = u.employee_id
-            WHERE u.first_name LIKE ? COLLATE NOCASE
-            OR u.last_name LIKE ? COLLATE NOCASE
-            OR u.employee_id LIKE ? COLLATE NOCASE
-            OR CAST(u.table_number AS TEXT) LIKE ?
-            OR c.checkin_time LIKE ?
-            ORDER BY c.checkin_time DESC
-        """, (search_pattern, search_pattern, search_pattern, search_pattern, search_pattern))
-    else:
-        cursor.execute("""
-            SELECT u.first_name, u.last_name, u.employee_id, u.table_number, c.checkin_time
-            FROM checkins c
-            JOIN users u ON c.employee_id = u.employee_id
-            ORDER BY c.checkin_time DESC
-        """)
+        condition, search_params = _user_search(search)
+        conditions.append(condition)
+        params += search_params
+    page = ""
+    if limit is not None:
+        page = "LIMIT ? OFFSET ?"
+        params += [limit, offset]
     
-    rows = cursor.fetchall()
+    # The id tie-break gives check-ins in the same second a stable order across pages
+    cursor.execute(f"""
+        SELECT c.id, u.first_name, u.last_name, u.employee_id, u.table_number,
+               {backend.epoch_text('c.checkin_at')} AS checkin_time
+        FROM {source}
+        JOIN users u ON c.employee_id = u.employee_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY c.checkin_at DESC, c.id DESC
+        {page}
+    """, tuple(params))
+    return cursor.fetchall()
+
+def get_checkin_history(search: str = "", start: Optional[int] = None, end: Optional[int] = None) -> List[CheckinRow]:
+    conn = get_db_connection()
+    rows = _query_checkin_history(conn.cursor(), search, start=start, end=end)
     conn.close()
     
+    return [CheckinRow._make(row[1:]) for row in rows]
+
+def _checkin_dicts(rows) -> List[dict]:
     return [
-        CheckinRecord(
-            first_name=row["first_name"],
-            last_name=row["last_name"],
-            employee_id=row["employee_id"],
-            table_number=row["table_number"],
-            checkin_time=row["checkin_time"]
-        )
-        for row in rows
+        {"id": checkin_id, "first_name": first_name, "last_name": last_name, "employee_id": employee_id,
+         "table_number": table_number, "checkin_time": checkin_time}
+        for checkin_id, first_name, last_name, employee_id, table_number, checkin_time in rows
     ]
 
-def create_user(user: User) -> bool:
+def get_checkin_history_rows(search: str = "", start: Optional[int] = None, end: Optional[int] = None) -> List[dict]:
+    """Same records as get_checkin_history as plain dicts, for the JSON fast path"""
+    with read_snapshot(long_read=True) as conn:
+        rows = _query_checkin_history(conn.cursor(), search, start=start, end=end)
+    
+    return _checkin_dicts(rows)
+
+def get_checkin_history_page(search: str, offset: int, limit: int,
+                             start: Optional[int] = None, end: Optional[int] = None) -> dict:
+    """One page of get_checkin_history_rows plus the number of matching check-ins"""
+    with read_snapshot() as conn:
+        cursor = conn.cursor()
+        conditions, params = _checkin_range(start, end)
+        if search.strip():
+            condition, search_params = _user_search(search)
+            conditions.append(condition)
+            params += search_params
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM checkins c
+            JOIN users u ON c.employee_id = u.employee_id
+            WHERE {' AND '.join(["c.event_id = ?"] + conditions)}
+        """, (_active_event_id(cursor), *params))
+        total = cursor.fetchone()[0]
+        rows = _query_checkin_history(cursor, search, offset=offset, limit=limit, start=start, end=end)
+    
+    return {"total": total, "offset": offset, "rows": _checkin_dicts(rows)}
+
+def get_row_version() -> int:
+    """Current value of the users/checkins change counter"""
+    conn = get_db_connection()
+    version = get_data_version(conn.cursor(), "rows")
+    conn.close()
+    return version
+
+def _start_delta(cursor, since: int) -> dict:
+    version = get_data_version(cursor, "rows")
+    # A bulk change after `since`, or a version from a different database, means starting over
+    reset = since < get_data_version(cursor, "rows_reset") or since > version
+    return {"version": version, "reset": reset, "changed": [], "removed": []}
+
+def get_history_changes(since: int, search: str = "", start: Optional[int] = None, end: Optional[int] = None) -> dict:
+    """Check-ins added or changed since a row version, and ids of removed ones.
+
+    With reset set the caller must reload the whole list instead."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    try:
+    delta = _start_delta(cursor, since)
+    if not delta["reset"] and delta["version"] > since:
+        delta["changed"] = _checkin_dicts(_query_checkin_history(cursor, search, since, start=start, end=end))
         cursor.execute(
-            "INSERT OR REPLACE INTO users (first_name, last_name, employee_id, table_number) VALUES (?, ?, ?, ?)",
-            (user.first_name, user.last_name, user.employee_id, user.table_number)
+            "SELECT row_key FROM removed_rows WHERE row_version > ? AND kind = 'checkin'", (since,)
         )
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.Error:
-        conn.close()
-        return False
+        delta["removed"] = [int(row[0]) for row in cursor.fetchall()]
+        if search.strip():
+            # Changed check-ins that no longer match the search leave the list
+            matched = {row["id"] for row in delta["changed"]}
+            delta["removed"] += [row[0] for row in _query_checkin_history(cursor, "", since, start=start, end=end)
+                                 if row[0] not in matched]
+    conn.close()
+    return delta
 
-def create_users_batch(users: List[User]) -> tuple[int, List[str]]:
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    imported = 0
-    errors = []
-    
-    for i, user in enumerate(users):
-        try:
-            cursor.execute(
-                "INSERT OR REPLACE INTO users (first_name, last_name, employee_id, table_number) VALUES (?, ?, ?, ?)",
-                (user.first_name, user.last_name, user.employee_id, user.table_number)
+# Insert a badge user, or overwrite the existing row with the same employee_id
+# Unchanged rows are left alone, so re-importing a roster does not mark every user as changed
+_UPSERT_USER = """
+    INSERT INTO users (first_name, last_name, employee_id, table_number, row_version, roster_version)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(employee_id) DO UPDATE SET
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        table_number = excluded.table_number,
+        row_version = excluded.row_version,
+        roster_version = excluded.roster_version
+    WHERE users.first_name <> excluded.first_name
+       OR users.last_name <> excluded.last_name
+       OR users.table_number <> excluded.table_number
+"""
+
+def _assign_table(cursor, employee_id: str, old_table: Optional[int], new_table: int, version: int):
+    """Move a user's counts between tables after an insert or a table change"""
+    if old_table == new_table:
+        return
+    checked_in = int(_is_checked_in(cursor, _active_event_id(cursor), employee_id))
+    if old_table is not None:
+        _add_to_table(cursor, old_table, assigned=-1, checked_in=-checked_in)
+        cursor.execute(
+            "INSERT INTO removed_rows (row_version, kind, row_key, table_number) VALUES (?, 'table_member', ?, ?)",
+            (version, employee_id, old_table)
+        )
+    _add_to_table(cursor, new_table, assigned=1, checked_in=checked_in)
+
+def create_users_batch(users: List[UserRow]) -> tuple[int, List[str]]:
+    """Import users, adding new ones and updating changed ones; returns (rows processed, errors)"""
+    counts = sync_users(users)
+    return counts["inserted"] + counts["updated"] + counts["unchanged"], []
+
+# Keys per IN (...) lookup, well below every engine's bound on query parameters
+LOOKUP_CHUNK = 500
+
+def _lookup(cursor, sql: str, keys: list, params: tuple = ()) -> list:
+    """Rows of sql, whose last condition is "IN ({keys})", for any number of keys"""
+    rows = []
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        cursor.execute(sql.format(keys=", ".join("?" * len(chunk))), (*params, *chunk))
+        rows.extend(cursor.fetchall())
+    return rows
+
+def sync_users(users: List[UserRow], delete_missing: bool = False, keep: Iterable[str] = ()) -> dict:
+    """Bring the users table in line with an imported roster in one transaction.
+
+    The roster is compared with the current table in one pass: new employee IDs are
+    inserted, changed rows updated and identical rows left untouched, so re-importing
+    an unchanged roster writes nothing. With delete_missing, users absent from the
+    roster are deleted as well, which makes clients reload their lists; employee IDs in
+    keep (rows of the file that failed validation) are never deleted. A later row for
+    the same employee ID wins. Returns the count of each kind of change.
+    """
+    roster = {user.employee_id: user for user in users}
+    keep = set(keep)
+    with write_transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if delete_missing or len(roster) * 4 >= cursor.fetchone()[0]:
+            # Most of the table is compared anyway: one scan beats thousands of lookups
+            cursor.execute("SELECT employee_id, first_name, last_name, table_number FROM users")
+            rows = cursor.fetchall()
+        else:
+            # A small import into a large table reads only the rows it names
+            rows = _lookup(cursor, "SELECT employee_id, first_name, last_name, table_number FROM users "
+                                   "WHERE employee_id IN ({keys})", list(roster))
+        current = {row[0]: (row[1], row[2], row[3]) for row in rows}
+        inserted, updated = [], []
+        for employee_id, user in roster.items():
+            old = current.get(employee_id)
+            if old is None:
+                inserted.append(user)
+            elif old != (user.first_name, user.last_name, user.table_number):
+                updated.append(user)
+        deleted = [employee_id for employee_id in current
+                   if employee_id not in roster and employee_id not in keep] if delete_missing else []
+        counts = {
+            "inserted": len(inserted),
+            "updated": len(updated),
+            "unchanged": len(roster) - len(inserted) - len(updated),
+            "deleted": len(deleted),
+        }
+        if not (inserted or updated or deleted):
+            return counts
+        
+        version = next_row_version(cursor)
+        # Lets the maintenance task refresh planner statistics after an import
+        bump_data_version(cursor, "bulk_changes")
+        roster_version = next_roster_version(cursor, removed=bool(deleted))
+        cursor.executemany(_UPSERT_USER, [
+            (user.first_name, user.last_name, user.employee_id, user.table_number, version, roster_version)
+            for user in inserted + updated
+        ])
+        if deleted:
+            cursor.executemany("DELETE FROM users WHERE employee_id = ?", [(employee_id,) for employee_id in deleted])
+        
+        # Table counters: (old table, new table) of every user who joined, moved or left one
+        moves = [(None, user.table_number, user.employee_id) for user in inserted]
+        moves += [(current[user.employee_id][2], user.table_number, user.employee_id)
+                  for user in updated if current[user.employee_id][2] != user.table_number]
+        moves += [(current[employee_id][2], None, employee_id) for employee_id in deleted]
+        if moves:
+            present = {row[0] for row in _lookup(
+                cursor, "SELECT DISTINCT employee_id FROM checkins WHERE event_id = ? AND employee_id IN ({keys})",
+                [employee_id for old_table, new_table, employee_id in moves], (_active_event_id(cursor),)
+            )}
+            assigned, checked_in = Counter(), Counter()
+            for old_table, new_table, employee_id in moves:
+                if old_table is not None:
+                    assigned[old_table] -= 1
+                    checked_in[old_table] -= employee_id in present
+                if new_table is not None:
+                    assigned[new_table] += 1
+                    checked_in[new_table] += employee_id in present
+            for table_number in assigned.keys() | checked_in.keys():
+                if assigned[table_number] or checked_in[table_number]:
+                    _add_to_table(cursor, table_number, assigned=assigned[table_number],
+                                  checked_in=checked_in[table_number])
+            cursor.executemany(
+                "INSERT INTO removed_rows (row_version, kind, row_key, table_number) VALUES (?, 'table_member', ?, ?)",
+                [(version, employee_id, old_table) for old_table, new_table, employee_id in moves
+                 if old_table is not None and new_table is not None]
             )
-            imported += 1
-        except sqlite3.Error as e:
-            errors.append(f"User {i+1}: {str(e)}")
+        if deleted:
+            # Deltas only describe added and changed users
+            reset_row_changes(cursor)
     
-    conn.commit()
-    conn.close()
-    return imported, errors
+    return counts
+
+def _user_search(search: str) -> tuple:
+    """WHERE condition and parameters matching users (u) against a search on any field"""
+    search_pattern = f"%{search}%"
+    return f"""(u.first_name {backend.like} ?
+            OR u.last_name {backend.like} ?
+            OR u.employee_id {backend.like} ?
+            OR CAST(u.table_number AS TEXT) {backend.like} ?)""", [search_pattern] * 4
+
+def _query_users(cursor, search: str, since: Optional[int] = None,
+                 offset: int = 0, limit: Optional[int] = None):
+    event_id = _active_event_id(cursor)
+    conditions = []
+    params = [event_id]
+    if since is not None:
+        conditions.append("u.row_version > ?")
+        params.append(since)
+    if search.strip():
+        condition, search_params = _user_search(search)
+        conditions.append(condition)
+        params += search_params
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Walking idx_users_name with a per-user lookup lets a page stop after `limit` users
+    # instead of grouping every check-in of the event first. Deltas are applied by key and
+    # skip the ordering, so they are found through idx_users_row_version instead.
+    order = "ORDER BY u.first_name, u.last_name, u.id" if since is None else ""
+    if limit is not None:
+        order += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    
+    last_checkin = backend.epoch_text(
+        "(SELECT MAX(c.checkin_at) FROM checkins c WHERE c.event_id = ? AND c.employee_id = u.employee_id)"
+    )
+    cursor.execute(f"""
+        SELECT u.id, u.employee_id, u.first_name, u.last_name, u.table_number,
+               {last_checkin} as last_checkin
+        FROM users u
+        {where}
+        {order}
+    """, tuple(params))
+    return cursor.fetchall()
+
+def _count_users(cursor, search: str) -> int:
+    condition, params = _user_search(search) if search.strip() else ("1 = 1", [])
+    cursor.execute(f"SELECT COUNT(*) FROM users u WHERE {condition}", tuple(params))
+    return cursor.fetchone()[0]
 
 def get_all_users() -> List[User]:
+    return search_users("")
+
+def _user_dicts(rows) -> List[dict]:
+    return [
+        {"id": user_id, "employee_id": employee_id, "first_name": first_name, "last_name": last_name,
+         "table_number": table_number, "last_checkin": last_checkin, "is_checked_in": last_checkin is not None}
+        for user_id, employee_id, first_name, last_name, table_number, last_checkin in rows
+    ]
+
+def get_user_rows(search: str = "") -> List[dict]:
+    """Same users as search_users as plain dicts, for the JSON fast path"""
+    with read_snapshot(long_read=True) as conn:
+        rows = _query_users(conn.cursor(), search)
+    
+    return _user_dicts(rows)
+
+def get_user_page(search: str, offset: int, limit: int) -> dict:
+    """One page of get_user_rows plus the number of matching users"""
+    with read_snapshot() as conn:
+        cursor = conn.cursor()
+        total = _count_users(cursor, search)
+        rows = _query_users(cursor, search, offset=offset, limit=limit)
+    
+    return {"total": total, "offset": offset, "rows": _user_dicts(rows)}
+
+def get_user_changes(since: int, search: str = "") -> dict:
+    """Users added or changed (including their check-in state) since a row version.
+
+    Deleting users (all at once, or those missing from an import) resets deltas, so
+    removed only lists changed users that no longer match the search."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT u.*, 
-               MAX(c.checkin_time) as last_checkin,
-               CASE WHEN MAX(c.checkin_time) IS NOT NULL THEN 1 ELSE 0 END as is_checked_in
-        FROM users u
-        LEFT JOIN checkins c ON u.employee_id = c.employee_id
-        GROUP BY u.id, u.employee_id, u.first_name, u.last_name, u.table_number
-        ORDER BY u.first_name, u.last_name
-    """)
-    rows = cursor.fetchall()
+    delta = _start_delta(cursor, since)
+    if not delta["reset"] and delta["version"] > since:
+        delta["changed"] = _user_dicts(_query_users(cursor, search, since))
+        if search.strip():
+            matched = {row["employee_id"] for row in delta["changed"]}
+            cursor.execute("SELECT employee_id FROM users WHERE row_version > ?", (since,))
+            delta["removed"] = [row[0] for row in cursor.fetchall() if row[0] not in matched]
     conn.close()
-    
-    return [
-        User(
-            id=row["id"],
-            employee_id=row["employee_id"],
-            first_name=row["first_name"],
-            last_name=row["last_name"],
-            table_number=row["table_number"],
-            last_checkin=row["last_checkin"],
-            is_checked_in=bool(row["is_checked_in"])
-        )
-        for row in rows
-    ]
+    return delta
 
-def delete_all_users() -> int:
+# Columns of each kiosk roster row, in order
+ROSTER_FIELDS = ["employee_id", "first_name", "last_name", "table_number"]
+
+def _load_roster(cursor) -> dict:
+    cursor.execute("SELECT employee_id, first_name, last_name, table_number FROM users ORDER BY employee_id")
+    return {"fields": ROSTER_FIELDS, "rows": [list(row) for row in cursor.fetchall()]}
+
+def get_roster() -> tuple:
+    """The roster kiosks resolve badges with, as (roster version, {"fields", "rows"}).
+
+    Only names and tables are included, so check-ins leave it unchanged and each worker
+    reads it once per roster change. The roster version is where deltas continue from."""
+    with read_snapshot() as conn:
+        cursor = conn.cursor()
+        # The counter and the rows come from one snapshot, so they describe the same roster
+        roster = _roster_cache.get(cursor, _load_roster)
+        return get_data_version(cursor, "roster"), roster
+
+def get_roster_changes(since: int) -> dict:
+    """Roster rows of users added or changed since a roster version.
+
+    With reset set the kiosk reloads the whole roster (users were deleted)."""
     conn = get_db_connection()
     cursor = conn.cursor()
+    version = get_data_version(cursor, "roster")
+    # Deleted users, or a version from a different database, mean starting over
+    reset = since < get_data_version(cursor, "roster_reset") or since > version
+    rows = []
+    if not reset and version > since:
+        cursor.execute(
+            "SELECT employee_id, first_name, last_name, table_number FROM users WHERE roster_version > ?", (since,)
+        )
+        rows = [list(row) for row in cursor.fetchall()]
+    conn.close()
+    return {"version": version, "reset": reset, "rows": rows}
+
+def delete_all_users() -> int:
     try:
-        # Get count before deletion
-        cursor.execute("SELECT COUNT(*) FROM users")
-        count = cursor.fetchone()[0]
-        
-        # Delete all users
-        cursor.execute("DELETE FROM users")
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            # Get count before deletion
+            cursor.execute("SELECT COUNT(*) FROM users")
+            count = cursor.fetchone()[0]
+            
+            # Delete all users
+            cursor.execute("DELETE FROM users")
+            cursor.execute("DELETE FROM table_occupancy")
+            next_roster_version(cursor, removed=True)
+            reset_row_changes(cursor)
         return count
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return 0
 
 def create_single_user(user: User) -> tuple[bool, str]:
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Check if employee_id already exists
-        cursor.execute("SELECT COUNT(*) FROM users WHERE employee_id = ?", (user.employee_id,))
-        if cursor.fetchone()[0] > 0:
-            conn.close()
-            return False, "Employee ID already exists"
-        
-        cursor.execute(
-            "INSERT INTO users (first_name, last_name, employee_id, table_number) VALUES (?, ?, ?, ?)",
-            (user.first_name, user.last_name, user.employee_id, user.table_number)
-        )
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            # Check if employee_id already exists
+            cursor.execute("SELECT COUNT(*) FROM users WHERE employee_id = ?", (user.employee_id,))
+            if cursor.fetchone()[0] > 0:
+                return False, "Employee ID already exists"
+            
+            version = next_row_version(cursor)
+            cursor.execute(
+                "INSERT INTO users (first_name, last_name, employee_id, table_number, row_version, roster_version) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user.first_name, user.last_name, user.employee_id, user.table_number, version,
+                 next_roster_version(cursor))
+            )
+            _assign_table(cursor, user.employee_id, None, user.table_number, version)
         return True, "User created successfully"
-    except sqlite3.Error as e:
-        conn.close()
+    except DatabaseError as e:
         return False, str(e)
 
 def search_users(query: str) -> List[User]:
-    if not query.strip():
-        return get_all_users()
-    
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Search across all fields
-    search_pattern = f"%{query}%"
-    cursor.execute("""
-        SELECT u.*, 
-               MAX(c.checkin_time) as last_checkin,
-               CASE WHEN MAX(c.checkin_time) IS NOT NULL THEN 1 ELSE 0 END as is_checked_in
-        FROM users u
-        LEFT JOIN checkins c ON u.employee_id = c.employee_id
-        WHERE u.first_name LIKE ? COLLATE NOCASE
-        OR u.last_name LIKE ? COLLATE NOCASE
-        OR u.employee_id LIKE ? COLLATE NOCASE
-        OR CAST(u.table_number AS TEXT) LIKE ?
-        GROUP BY u.id, u.employee_id, u.first_name, u.last_name, u.table_number
-        ORDER BY u.first_name, u.last_name
-    """, (search_pattern, search_pattern, search_pattern, search_pattern))
-    
-    rows = cursor.fetchall()
+    rows = _query_users(conn.cursor(), query)
     conn.close()
     
     return [
@@ -282,176 +948,532 @@ def search_users(query: str) -> List[User]:
             last_name=row["last_name"],
             table_number=row["table_number"],
             last_checkin=row["last_checkin"],
-            is_checked_in=bool(row["is_checked_in"])
+            is_checked_in=row["last_checkin"] is not None
         )
         for row in rows
     ]
 
-def get_tables_with_users(search: str = "") -> List[dict]:
+def get_table_occupancy() -> List[dict]:
+    """Assigned and checked-in counts per table for the active event"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("SELECT table_number, assigned, checked_in FROM table_occupancy ORDER BY table_number")
+    rows = cursor.fetchall()
+    conn.close()
     
+    return [
+        {"table_number": row["table_number"], "assigned": row["assigned"], "checked_in": row["checked_in"]}
+        for row in rows
+    ]
+
+def _query_tables(cursor, search: str, table_numbers: Optional[List[int]] = None) -> List[dict]:
+    event_id = _active_event_id(cursor)
+    
+    members = backend.json_group_array(backend.json_object(
+        "'employee_id', u.employee_id, 'first_name', u.first_name, 'last_name', u.last_name, "
+        "'checked_in', " + backend.json_bool(
+            "EXISTS (SELECT 1 FROM checkins c WHERE c.event_id = ? AND c.employee_id = u.employee_id)"
+        )
+    ))
+    conditions = []
+    params = [event_id]
+    if table_numbers is not None:
+        conditions.append(f"u.table_number IN ({', '.join('?' * len(table_numbers))})")
+        params += table_numbers
     if search.strip():
-        search_pattern = f"%{search}%"
-        cursor.execute("""
-            SELECT table_number, 
-                   GROUP_CONCAT(first_name || ' ' || last_name, ', ') as users,
-                   COUNT(*) as user_count
-            FROM users 
-            WHERE first_name LIKE ? COLLATE NOCASE
-            OR last_name LIKE ? COLLATE NOCASE
-            OR employee_id LIKE ? COLLATE NOCASE
-            OR CAST(table_number AS TEXT) LIKE ?
-            GROUP BY table_number 
-            ORDER BY table_number
-        """, (search_pattern, search_pattern, search_pattern, search_pattern))
-    else:
-        cursor.execute("""
-            SELECT table_number, 
-                   GROUP_CONCAT(first_name || ' ' || last_name, ', ') as users,
-                   COUNT(*) as user_count
-            FROM users 
-            GROUP BY table_number 
-            ORDER BY table_number
-        """)
+        condition, search_params = _user_search(search)
+        conditions.append(condition)
+        params += search_params
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     
-    tables = cursor.fetchall()
-    conn.close()
+    cursor.execute(f"""
+        SELECT u.table_number, {members} as users, COUNT(*) as user_count,
+               MAX(o.assigned) as assigned, MAX(o.checked_in) as checked_in
+        FROM users u
+        LEFT JOIN table_occupancy o ON o.table_number = u.table_number
+        {where}
+        GROUP BY u.table_number
+        ORDER BY u.table_number
+    """, tuple(params))
     
     return [
         {
             "table_number": table["table_number"],
-            "users": table["users"].split(', ') if table["users"] else [],
-            "user_count": table["user_count"]
+            "users": backend.load_json(table["users"]),
+            "user_count": table["user_count"],
+            "assigned": table["assigned"] or 0,
+            "checked_in": table["checked_in"] or 0
         }
-        for table in tables
+        for table in cursor.fetchall()
     ]
 
-def get_export_data() -> dict:
-    """Get comprehensive data for export including users with and without checkins"""
+def get_tables_with_users(search: str = "") -> List[dict]:
+    with read_snapshot(long_read=True) as conn:
+        return _query_tables(conn.cursor(), search)
+
+TABLE_ORDERS = {
+    "table_number": "u.table_number",
+    "user_count_asc": "COUNT(*), u.table_number",
+    "user_count_desc": "COUNT(*) DESC, u.table_number",
+}
+
+def get_table_page(search: str, offset: int, limit: int, sort: str = "table_number") -> dict:
+    """One page of tables in the given TABLE_ORDERS order plus the number of matching tables.
+    Table numbers are paged first so members are only aggregated for the tables on the page."""
+    with read_snapshot() as conn:
+        cursor = conn.cursor()
+        condition, params = _user_search(search) if search.strip() else ("1 = 1", [])
+        cursor.execute(f"SELECT COUNT(DISTINCT u.table_number) FROM users u WHERE {condition}", tuple(params))
+        total = cursor.fetchone()[0]
+        cursor.execute(f"""
+            SELECT u.table_number FROM users u
+            WHERE {condition}
+            GROUP BY u.table_number
+            ORDER BY {TABLE_ORDERS[sort]}
+            LIMIT ? OFFSET ?
+        """, (*params, limit, offset))
+        numbers = [row[0] for row in cursor.fetchall()]
+        tables = _query_tables(cursor, search, numbers) if numbers else []
+    
+    position = {number: i for i, number in enumerate(numbers)}
+    tables.sort(key=lambda table: position[table["table_number"]])
+    return {"total": total, "offset": offset, "rows": tables}
+
+def get_table_changes(since: int, search: str = "") -> dict:
+    """Current contents of every table whose members changed since a row version;
+    removed lists the table numbers that no longer have (matching) members."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    # Get users with checkins
-    cursor.execute("""
-        SELECT u.first_name, u.last_name, u.employee_id, u.table_number, c.checkin_time
-        FROM checkins c
-        JOIN users u ON c.employee_id = u.employee_id
-        ORDER BY c.checkin_time DESC
-    """)
-    users_with_checkins = cursor.fetchall()
-    
-    # Get users without checkins
-    cursor.execute("""
-        SELECT u.first_name, u.last_name, u.employee_id, u.table_number
-        FROM users u
-        LEFT JOIN checkins c ON u.employee_id = c.employee_id
-        WHERE c.employee_id IS NULL
-        ORDER BY u.first_name, u.last_name
-    """)
-    users_without_checkins = cursor.fetchall()
-    
+    delta = _start_delta(cursor, since)
+    if not delta["reset"] and delta["version"] > since:
+        cursor.execute("""
+            SELECT table_number FROM users WHERE row_version > ?
+            UNION
+            SELECT table_number FROM removed_rows WHERE row_version > ? AND kind = 'table_member'
+        """, (since, since))
+        affected = [row[0] for row in cursor.fetchall()]
+        if affected:
+            delta["changed"] = _query_tables(cursor, search, affected)
+            present = {table["table_number"] for table in delta["changed"]}
+            delta["removed"] = [number for number in affected if number not in present]
     conn.close()
+    return delta
+
+def get_export_data(start: Optional[int] = None, end: Optional[int] = None) -> dict:
+    """Get comprehensive data for export including users with and without checkins.
+    With start/end (epoch seconds) only check-ins in that range count."""
+    range_conditions, range_params = _checkin_range(start, end)
+    in_range = "".join(f" AND {condition}" for condition in range_conditions)
+    # Both sections come from one snapshot, so every user is in exactly one of them
+    with read_snapshot(long_read=True) as conn:
+        event_id = _active_event_id(conn.cursor())
+        
+        # Rows are streamed (server-side cursors on PostgreSQL) rather than fetched in one go
+        # Get users with checkins
+        with_checkins = [
+            CheckinRow._make(row)
+            for row in backend.iter_rows(conn, f"""
+                SELECT u.first_name, u.last_name, u.employee_id, u.table_number,
+                       {backend.epoch_text('c.checkin_at')}
+                FROM checkins c
+                JOIN users u ON c.employee_id = u.employee_id
+                WHERE c.event_id = ?{in_range}
+                ORDER BY c.checkin_at DESC
+            """, (event_id, *range_params))
+        ]
+        
+        # Get users without checkins
+        without_checkins = [
+            UserRow._make(row)
+            for row in backend.iter_rows(conn, f"""
+                SELECT u.first_name, u.last_name, u.employee_id, u.table_number
+                FROM users u
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM checkins c WHERE c.event_id = ? AND c.employee_id = u.employee_id{in_range}
+                )
+                ORDER BY u.first_name, u.last_name
+            """, (event_id, *range_params))
+        ]
     
     return {
-        'with_checkins': [
-            CheckinRecord(
-                first_name=row["first_name"],
-                last_name=row["last_name"],
-                employee_id=row["employee_id"],
-                table_number=row["table_number"],
-                checkin_time=row["checkin_time"]
-            )
-            for row in users_with_checkins
-        ],
-        'without_checkins': [
-            User(
-                first_name=row["first_name"],
-                last_name=row["last_name"],
-                employee_id=row["employee_id"],
-                table_number=row["table_number"]
-            )
-            for row in users_without_checkins
-        ]
+        'with_checkins': with_checkins,
+        'without_checkins': without_checkins
     }
 
 def clear_checkin_history() -> int:
-    """Delete all checkin records, returns count of deleted records"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Delete the active event's checkin records, returns count of deleted records"""
     try:
-        # Get count before deletion
-        cursor.execute("SELECT COUNT(*) FROM checkins")
-        count = cursor.fetchone()[0]
-        
-        # Delete all checkin records
-        cursor.execute("DELETE FROM checkins")
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            event_id = _active_event_id(cursor)
+            
+            # Get count before deletion
+            cursor.execute("SELECT COUNT(*) FROM checkins WHERE event_id = ?", (event_id,))
+            count = cursor.fetchone()[0]
+            
+            # Delete the event's checkin records; other events are untouched
+            cursor.execute("DELETE FROM checkins WHERE event_id = ?", (event_id,))
+            cursor.execute("DELETE FROM arrival_rollups WHERE event_id = ?", (event_id,))
+            cursor.execute("UPDATE table_occupancy SET checked_in = 0")
+            reset_row_changes(cursor)
         return count
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return 0
 
 def checkout_user(employee_id: str) -> bool:
-    """Remove the most recent checkin record for a user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Remove the most recent checkin record for a user in the active event"""
     try:
-        # Delete the most recent checkin for this user
-        cursor.execute("""
-            DELETE FROM checkins 
-            WHERE employee_id = ? 
-            AND checkin_time = (
-                SELECT MAX(checkin_time) 
-                FROM checkins 
-                WHERE employee_id = ?
-            )
-        """, (employee_id, employee_id))
-        
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            # Serialises with other check-ins and check-outs before reading (see create_checkin)
+            lock_row_version(cursor)
+            event_id = _active_event_id(cursor)
+            
+            # Delete the most recent checkin for this user; ids, unlike whole-second times, are unique
+            cursor.execute("""
+                DELETE FROM checkins 
+                WHERE id = (
+                    SELECT MAX(id) 
+                    FROM checkins 
+                    WHERE event_id = ? AND employee_id = ?
+                )
+                RETURNING id
+            """, (event_id, employee_id))
+            
+            deleted_ids = [row[0] for row in cursor.fetchall()]
+            rows_affected = len(deleted_ids)
+            if rows_affected > 0:
+                version = next_row_version(cursor)
+                cursor.executemany(
+                    "INSERT INTO removed_rows (row_version, kind, row_key) VALUES (?, 'checkin', ?)",
+                    [(version, str(checkin_id)) for checkin_id in deleted_ids]
+                )
+                _touch_user(cursor, employee_id, version)
+            if rows_affected > 0 and not _is_checked_in(cursor, event_id, employee_id):
+                cursor.execute(f"SELECT {backend.now_text}")
+                _add_to_rollup(cursor, event_id, str(cursor.fetchone()[0])[:16], departures=1)
+                _add_checked_in(cursor, employee_id, -1)
         return rows_affected > 0
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return False
 
-def get_settings() -> dict:
-    """Get all settings as a dictionary"""
+def _resolve_attendees(cursor, event_id: int, employee_ids: Optional[List[str]], table_number: Optional[int]) -> list:
+    """Users named by a bulk request with whether each is checked in, in one query"""
+    if table_number is not None:
+        condition, params = "u.table_number = ?", [table_number]
+    elif not employee_ids:
+        # "IN ()" is a syntax error on PostgreSQL
+        return []
+    else:
+        condition, params = f"u.employee_id IN ({', '.join('?' * len(employee_ids))})", list(employee_ids)
+    cursor.execute(f"""
+        SELECT u.employee_id, u.first_name, u.last_name, u.table_number,
+               EXISTS (SELECT 1 FROM checkins c WHERE c.event_id = ? AND c.employee_id = u.employee_id)
+        FROM users u
+        WHERE {condition}
+        ORDER BY u.first_name, u.last_name, u.id
+    """, (event_id, *params))
+    return cursor.fetchall()
+
+def _bulk_results(rows, employee_ids: Optional[List[str]], applied: set, done: str, skipped: str) -> List[dict]:
+    results = {
+        row[0]: {
+            "employee_id": row[0], "name": f"{row[1]} {row[2]}", "table_number": row[3],
+            "success": row[0] in applied, "message": done if row[0] in applied else skipped,
+        }
+        for row in rows
+    }
+    if employee_ids is None:
+        return list(results.values())
+    # Requested order, with a result for every id, found or not
+    return [
+        results.get(employee_id) or {"employee_id": employee_id, "name": None, "table_number": None,
+                                     "success": False, "message": "User not found"}
+        for employee_id in dict.fromkeys(employee_ids)
+    ]
+
+def bulk_checkin(employee_ids: Optional[List[str]] = None, table_number: Optional[int] = None) -> List[dict]:
+    """Check in a list of users, or everyone at a table, in one transaction.
+    Users already checked in are left alone. Returns one result per user."""
+    with write_transaction() as cursor:
+        # Serialises with other check-ins before reading who is present (see create_checkin)
+        lock_row_version(cursor)
+        event_id = _active_event_id(cursor)
+        rows = _resolve_attendees(cursor, event_id, employee_ids, table_number)
+        arriving = [row for row in rows if not row[4]]
+        if arriving:
+            version = next_row_version(cursor)
+            cursor.execute(f"SELECT {backend.now_epoch}")
+            now = cursor.fetchone()[0]
+            cursor.executemany(
+                "INSERT INTO checkins (employee_id, event_id, checkin_at, row_version) VALUES (?, ?, ?, ?)",
+                [(row[0], event_id, now, version) for row in arriving]
+            )
+            cursor.executemany("UPDATE users SET row_version = ? WHERE employee_id = ?",
+                               [(version, row[0]) for row in arriving])
+            _add_to_rollup(cursor, event_id, format_epoch(now)[:16], arrivals=len(arriving), scans=len(arriving))
+            bump_data_version(cursor, "bulk_changes")
+            _add_checked_in_by_table(cursor, Counter(row[3] for row in arriving))
+    
+    return _bulk_results(rows, employee_ids, {row[0] for row in arriving}, "Checked in", "Already checked in")
+
+def bulk_checkout(employee_ids: Optional[List[str]] = None, table_number: Optional[int] = None) -> List[dict]:
+    """Remove the most recent check-in of a list of users, or of everyone at a table,
+    in one transaction. Returns one result per user."""
+    with write_transaction() as cursor:
+        # Serialises with other check-ins before reading who is present (see create_checkin)
+        lock_row_version(cursor)
+        event_id = _active_event_id(cursor)
+        rows = _resolve_attendees(cursor, event_id, employee_ids, table_number)
+        present = [row[0] for row in rows if row[4]]
+        removed = []
+        if present:
+            placeholders = ", ".join("?" * len(present))
+            # The latest check-in of each user by id: several can share a whole-second time
+            cursor.execute(f"""
+                DELETE FROM checkins WHERE id IN (
+                    SELECT MAX(id) FROM checkins
+                    WHERE event_id = ? AND employee_id IN ({placeholders})
+                    GROUP BY employee_id
+                )
+                RETURNING id, employee_id
+            """, (event_id, *present))
+            removed = cursor.fetchall()
+        if removed:
+            version = next_row_version(cursor)
+            bump_data_version(cursor, "bulk_changes")
+            cursor.executemany(
+                "INSERT INTO removed_rows (row_version, kind, row_key) VALUES (?, 'checkin', ?)",
+                [(version, str(row[0])) for row in removed]
+            )
+            cursor.executemany("UPDATE users SET row_version = ? WHERE employee_id = ?",
+                               [(version, employee_id) for employee_id in present])
+            # Users with an earlier check-in left in the event are still present
+            cursor.execute(
+                f"SELECT DISTINCT employee_id FROM checkins WHERE event_id = ? AND employee_id IN ({placeholders})",
+                (event_id, *present)
+            )
+            remaining = {row[0] for row in cursor.fetchall()}
+            departed = [row for row in rows if row[4] and row[0] not in remaining]
+            if departed:
+                cursor.execute(f"SELECT {backend.now_text}")
+                _add_to_rollup(cursor, event_id, str(cursor.fetchone()[0])[:16], departures=len(departed))
+                per_table = Counter(row[3] for row in departed)
+                _add_checked_in_by_table(cursor, {number: -count for number, count in per_table.items()})
+    
+    return _bulk_results(rows, employee_ids, {row[1] for row in removed}, "Checked out",
+                         "No checkin record found to remove")
+
+def _rebuild_arrival_rollups(cursor):
+    minute = f"SUBSTR({backend.epoch_text('checkin_at')}, 1, 16)"
+    first_minute = f"SUBSTR({backend.epoch_text('first_at')}, 1, 16)"
+    cursor.execute("DELETE FROM arrival_rollups")
+    cursor.execute(f"""
+        INSERT INTO arrival_rollups (event_id, minute, arrivals, departures, scans)
+        SELECT event_id, {minute}, 0, 0, COUNT(*)
+        FROM checkins
+        GROUP BY event_id, {minute}
+    """)
+    # An attendee arrives at their first checkin of the event
+    cursor.execute(f"""
+        INSERT INTO arrival_rollups (event_id, minute, arrivals, departures, scans)
+        SELECT event_id, {first_minute}, COUNT(*), 0, 0
+        FROM (
+            SELECT event_id, MIN(checkin_at) AS first_at FROM checkins GROUP BY event_id, employee_id
+        ) firsts
+        WHERE true
+        GROUP BY event_id, {first_minute}
+        ON CONFLICT(event_id, minute) DO UPDATE SET arrivals = excluded.arrivals
+    """)
+
+def rebuild_arrival_rollups():
+    """Recompute the arrival rollups from the checkins table (after bulk loads)"""
+    with write_transaction() as cursor:
+        _rebuild_arrival_rollups(cursor)
+
+def get_arrival_stats(bucket_minutes: int = 5, event_id: Optional[int] = None) -> dict:
+    """Arrival curve of an event in buckets of bucket_minutes, read from the per-minute rollups.
+
+    Each bucket has arrivals (first checkins), departures (checkouts that left
+    nobody checked in), scans (all checkins) and the attendance at its end.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
+    if event_id is None:
+        event_id = _active_event_id(cursor)
+    cursor.execute(
+        "SELECT minute, arrivals, departures, scans FROM arrival_rollups WHERE event_id = ? ORDER BY minute",
+        (event_id,)
+    )
+    rows = cursor.fetchall()
+    cursor.execute(f"SELECT {backend.now_text}")
+    now = datetime.fromisoformat(str(cursor.fetchone()[0])[:16])
+    conn.close()
+    
+    bucket = timedelta(minutes=bucket_minutes)
+    epoch = datetime(2000, 1, 1)
+    totals = {}
+    for row in rows:
+        minute = datetime.fromisoformat(row["minute"])
+        start = epoch + (minute - epoch) // bucket * bucket
+        counts = totals.setdefault(start, [0, 0, 0])
+        counts[0] += row["arrivals"]
+        counts[1] += row["departures"]
+        counts[2] += row["scans"]
     
+    # Fill empty buckets so the curve has an even time axis
+    buckets = []
+    attendance = total_arrivals = 0
+    if totals:
+        start, last = min(totals), max(totals)
+        while start <= last:
+            arrivals, departures, scans = totals.get(start, (0, 0, 0))
+            attendance += arrivals - departures
+            total_arrivals += arrivals
+            buckets.append({
+                "start": start.strftime("%Y-%m-%d %H:%M"),
+                "arrivals": arrivals,
+                "departures": departures,
+                "scans": scans,
+                "attendance": attendance
+            })
+            start += bucket
+    
+    # Arrivals per minute over the last bucket_minutes (the current minute included)
+    window_start = now - bucket + timedelta(minutes=1)
+    recent = sum(row["arrivals"] for row in rows if row["minute"] >= window_start.strftime("%Y-%m-%d %H:%M"))
+    
+    return {
+        "event_id": event_id,
+        "bucket_minutes": bucket_minutes,
+        "buckets": buckets,
+        "total_arrivals": total_arrivals,
+        "attendance": attendance,
+        "current_rate": round(recent / bucket_minutes, 2)
+    }
+
+def get_recent_scan_rate(minutes: int = 5) -> float:
+    """Badge scans per minute at the active event over the last few minutes (the current minute included)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    event_id = _active_event_id(cursor)
+    cursor.execute(f"SELECT {backend.now_text}")
+    now = datetime.fromisoformat(str(cursor.fetchone()[0])[:16])
+    window_start = (now - timedelta(minutes=minutes - 1)).strftime("%Y-%m-%d %H:%M")
+    cursor.execute(
+        "SELECT COALESCE(SUM(scans), 0) FROM arrival_rollups WHERE event_id = ? AND minute >= ?",
+        (event_id, window_start)
+    )
+    scans = cursor.fetchone()[0]
+    conn.close()
+    return scans / minutes
+
+def _load_settings(cursor) -> dict:
     cursor.execute("SELECT key, value FROM settings")
-    rows = cursor.fetchall()
+    return {row["key"]: row["value"] for row in cursor.fetchall()}
+
+def get_settings() -> dict:
+    """Get all settings as a dictionary (cached per worker until settings change)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    settings = _settings_cache.get(cursor, _load_settings)
     conn.close()
     
-    return {row["key"]: row["value"] for row in rows}
+    return dict(settings)
 
 def update_settings(settings: dict) -> bool:
     """Update multiple settings"""
+    try:
+        with write_transaction() as cursor:
+            for key, value in settings.items():
+                cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+            bump_data_version(cursor, "settings")
+        return True
+    except DatabaseError:
+        return False
+
+# Event functions
+
+def get_events() -> List[dict]:
+    """Get all events with their checkin counts, newest first"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    active_id = _active_event_id(cursor)
+    cursor.execute("""
+        SELECT e.id, e.name, e.created_at,
+               (SELECT COUNT(*) FROM checkins c WHERE c.event_id = e.id) as checkin_count
+        FROM events e
+        ORDER BY e.id DESC
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "created_at": row["created_at"],
+            "checkin_count": row["checkin_count"],
+            "is_active": row["id"] == active_id
+        }
+        for row in rows
+    ]
+
+def get_active_event() -> Optional[dict]:
+    """Get the event new checkins are recorded against"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute("SELECT id, name, created_at FROM events WHERE id = ?", (_active_event_id(cursor),))
+    row = cursor.fetchone()
+    conn.close()
     
+    if row:
+        return {"id": row["id"], "name": row["name"], "created_at": row["created_at"], "is_active": True}
+    return None
+
+def create_event(name: str, activate: bool = True) -> Optional[int]:
+    """Create an event, optionally making it the active one. Returns the new id"""
     try:
-        for key, value in settings.items():
-            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            cursor.execute("INSERT INTO events (name) VALUES (?) RETURNING id", (name,))
+            event_id = cursor.fetchone()[0]
+            if activate:
+                _set_active_event(cursor, event_id)
+        return event_id
+    except DatabaseError:
+        return None
+
+def set_active_event(event_id: int) -> bool:
+    """Switch the active event; returns False if it doesn't exist"""
+    try:
+        with write_transaction() as cursor:
+            cursor.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+            if not cursor.fetchone():
+                return False
+            _set_active_event(cursor, event_id)
         return True
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return False
 
+def _set_active_event(cursor, event_id: int):
+    cursor.execute(
+        "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        ("active_event_id", str(event_id))
+    )
+    bump_data_version(cursor, "settings")
+    _rebuild_table_occupancy(cursor, event_id)
+    reset_row_changes(cursor)
+
 # Authentication functions
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
+    # Imported on first use to keep it off the startup path
+    import bcrypt
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     """Verify a password against its hash"""
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def has_admin_user() -> bool:
@@ -470,27 +1492,33 @@ def create_initial_admin_if_needed():
     
     admin_username = os.getenv("ADMIN_USERNAME", "admin")
     admin_password = os.getenv("ADMIN_PASSWORD", "admin")
+    password_hash = hash_password(admin_password)
     
-    return create_auth_user(admin_username, admin_password, is_admin=True)
+    # Check and insert in one statement so concurrently starting workers create one admin
+    try:
+        with write_transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO auth_users (username, password_hash, is_admin)
+                SELECT ?, ?, 1
+                WHERE NOT EXISTS (SELECT 1 FROM auth_users WHERE is_admin = 1)
+            """, (admin_username.lower(), password_hash))
+            return cursor.rowcount > 0
+    except DatabaseError:
+        return False
 
 def create_auth_user(username: str, password: str, is_admin: bool = False) -> bool:
     """Create a new auth user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    password_hash = hash_password(password)
     try:
-        password_hash = hash_password(password)
-        cursor.execute(
-            "INSERT INTO auth_users (username, password_hash, is_admin) VALUES (?, ?, ?)",
-            (username.lower(), password_hash, is_admin)
-        )
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO auth_users (username, password_hash, is_admin) VALUES (?, ?, ?)",
+                (username.lower(), password_hash, int(is_admin))
+            )
         return True
-    except sqlite3.IntegrityError:
-        conn.close()
+    except IntegrityError:
         return False
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return False
 
 def authenticate_user(username: str, password: str) -> Optional[dict]:
@@ -503,14 +1531,11 @@ def authenticate_user(username: str, password: str) -> Optional[dict]:
     
     if row and verify_password(password, row["password_hash"]):
         # Update last login
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE auth_users SET last_login = CURRENT_TIMESTAMP WHERE username = ?",
-            (username.lower(),)
-        )
-        conn.commit()
-        conn.close()
+        with write_transaction() as cursor:
+            cursor.execute(
+                "UPDATE auth_users SET last_login = CURRENT_TIMESTAMP WHERE username = ?",
+                (username.lower(),)
+            )
         
         return {
             "id": row["id"],
@@ -560,49 +1585,39 @@ def get_all_auth_users() -> List[dict]:
 
 def delete_auth_user(username: str) -> bool:
     """Delete an auth user (except if it's the last admin)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Check if this is an admin
-        cursor.execute("SELECT is_admin FROM auth_users WHERE username = ?", (username.lower(),))
-        user = cursor.fetchone()
-        
-        if user and user["is_admin"]:
-            # Count total admins
-            cursor.execute("SELECT COUNT(*) FROM auth_users WHERE is_admin = 1")
-            admin_count = cursor.fetchone()[0]
+        with write_transaction() as cursor:
+            # Check if this is an admin
+            cursor.execute("SELECT is_admin FROM auth_users WHERE username = ?", (username.lower(),))
+            user = cursor.fetchone()
             
-            if admin_count <= 1:
-                conn.close()
-                return False  # Can't delete the last admin
-        
-        cursor.execute("DELETE FROM auth_users WHERE username = ?", (username.lower(),))
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            if user and user["is_admin"]:
+                # Count total admins
+                cursor.execute("SELECT COUNT(*) FROM auth_users WHERE is_admin = 1")
+                admin_count = cursor.fetchone()[0]
+                
+                if admin_count <= 1:
+                    return False  # Can't delete the last admin
+            
+            cursor.execute("DELETE FROM auth_users WHERE username = ?", (username.lower(),))
+            success = cursor.rowcount > 0
         return success
-    except sqlite3.Error:
-        conn.close()
+    except DatabaseError:
         return False
 
 def create_session(username: str) -> str:
     """Create a new session for the user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Generate session ID
     session_id = secrets.token_urlsafe(32)
     
     # Set expiration to 30 days from now
     expires_at = datetime.now() + timedelta(days=30)
     
-    cursor.execute(
-        "INSERT INTO sessions (id, username, expires_at) VALUES (?, ?, ?)",
-        (session_id, username.lower(), expires_at)
-    )
-    conn.commit()
-    conn.close()
+    with write_transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO sessions (id, username, expires_at) VALUES (?, ?, ?)",
+            (session_id, username.lower(), expires_at)
+        )
     
     return session_id
 
@@ -632,21 +1647,13 @@ def get_session_user(session_id: str) -> Optional[dict]:
 
 def delete_session(session_id: str) -> bool:
     """Delete a session (logout)"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-    success = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    with write_transaction() as cursor:
+        cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        success = cursor.rowcount > 0
     return success
 
 def cleanup_expired_sessions():
     """Clean up expired sessions"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Delete expired sessions
-    cursor.execute("DELETE FROM sessions WHERE expires_at < CURRENT_TIMESTAMP")
-    
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    # Delete expired sessions; idempotent, so every worker can run it at startup
+    with write_transaction() as cursor:
+        cursor.execute("DELETE FROM sessions WHERE expires_at < CURRENT_TIMESTAMP")
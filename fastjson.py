@@ -0,0 +1,40 @@
+"""JSON fast path for large list endpoints.
+
+FastAPI's default response handling validates every returned object against
+the response model, runs it through jsonable_encoder and then json.dumps. For
+a roster of tens of thousands of rows that costs far more than the query.
+Bulk endpoints instead fetch plain dicts (database.get_user_rows and friends)
+and return a FastJSONResponse, which FastAPI sends as-is: the rows are
+encoded once, straight to bytes, with orjson when it is installed. The
+endpoints keep their response_model so the OpenAPI docs stay accurate.
+"""
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is slower but equivalent
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain Python data (dicts, lists, str, int, bool, None) to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """Decode JSON text or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for already-plain data; skips response-model validation"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
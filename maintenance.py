@@ -0,0 +1,184 @@
+"""Background upkeep of the SQLite check-in database.
+
+Each pass does whichever of these jobs are due:
+
+- Planner statistics. After a bulk change (roster import, bulk check-in,
+  clearing history, deleting all users, switching events, archiving) ANALYZE
+  refreshes them, reading a sample of each index (PRAGMA analysis_limit) so
+  it finishes in milliseconds. Other passes run PRAGMA optimize, which only
+  re-analyzes tables whose statistics went stale.
+- WAL checkpoint. When the write-ahead log grows past MAINTENANCE_WAL_BYTES,
+  usually because long reports kept the automatic checkpoint from finishing,
+  a PASSIVE checkpoint copies it back into the database. It never waits for
+  readers or writers, so it runs whatever the traffic.
+- Free space. In idle periods up to MAINTENANCE_VACUUM_PAGES free pages are
+  returned to the file system with PRAGMA incremental_vacuum. New databases
+  are created with auto_vacuum=INCREMENTAL; an older file is converted once,
+  with a full VACUUM, the first idle time it has that many free pages.
+
+Traffic is the badge-scan rate of the last few minutes from the arrival
+rollups, so every worker sees the same figure. Above MAINTENANCE_BUSY_SCANS
+scans a minute only the checkpoint runs; vacuuming waits until the rate drops
+to MAINTENANCE_IDLE_SCANS. The server runs a pass every MAINTENANCE_INTERVAL
+seconds (0 disables it). PostgreSQL maintains itself with autovacuum.
+
+Usage:
+    python maintenance.py            one pass, as the server would run it
+    python maintenance.py --force    one pass with every job, whatever the traffic
+"""
+import argparse
+import fcntl
+import os
+import sqlite3
+
+import database
+import storage
+
+MAINTENANCE_INTERVAL = int(os.getenv("MAINTENANCE_INTERVAL", "300"))
+# Scans per minute above which statistics and vacuum jobs wait, and at or below which vacuuming may run
+MAINTENANCE_BUSY_SCANS = float(os.getenv("MAINTENANCE_BUSY_SCANS", "20"))
+MAINTENANCE_IDLE_SCANS = float(os.getenv("MAINTENANCE_IDLE_SCANS", "1"))
+MAINTENANCE_WAL_BYTES = int(os.getenv("MAINTENANCE_WAL_BYTES", str(16 * 1024 * 1024)))
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "2000"))
+
+# Minutes of scans the traffic rate is averaged over
+TRAFFIC_MINUTES = 5
+# Index entries ANALYZE samples per index
+ANALYSIS_LIMIT = 1000
+# data_versions counter holding the bulk_changes value the statistics were last refreshed at
+ANALYZED_VERSION = "bulk_changes_analyzed"
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class MaintenanceError(RuntimeError):
+    pass
+
+
+def _database_path() -> str:
+    if (not isinstance(database.backend, storage.SQLiteBackend) or database.backend.path == ":memory:"
+            or database.backend.in_memory):
+        raise MaintenanceError("Maintenance only applies to a SQLite database file")
+    return database.backend.path
+
+
+def is_supported() -> bool:
+    """Whether the configured database is maintained by this module"""
+    try:
+        _database_path()
+        return True
+    except MaintenanceError:
+        return False
+
+
+def _checkpoint(conn, path: str, threshold: int) -> int:
+    """PASSIVE checkpoint when the WAL is larger than threshold; returns the pages copied"""
+    try:
+        wal_bytes = os.path.getsize(path + "-wal")
+    except OSError:
+        return 0
+    if wal_bytes <= threshold:
+        return 0
+    copied = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()[2]
+    return max(copied, 0)
+
+
+def _refresh_statistics(conn) -> bool:
+    """ANALYZE after bulk changes, PRAGMA optimize otherwise; returns whether ANALYZE ran"""
+    cursor = conn.cursor()
+    changes = database.get_data_version(cursor, "bulk_changes")
+    if changes == database.get_data_version(cursor, ANALYZED_VERSION):
+        conn.execute("PRAGMA optimize")
+        return False
+    conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    with database.write_transaction() as cursor:
+        cursor.execute("""
+            INSERT INTO data_versions (name, version) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET version = excluded.version
+        """, (ANALYZED_VERSION, changes))
+    return True
+
+
+def _vacuum(conn, pages: int) -> tuple:
+    """Release up to pages free pages; returns (pages released, whether the file was converted)"""
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if not free:
+        return 0, False
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        return free - conn.execute("PRAGMA freelist_count").fetchone()[0], False
+    if free < pages:
+        return 0, False
+    # Switching auto_vacuum on an existing file needs one full rewrite
+    conn.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+    conn.execute("VACUUM")
+    return free - conn.execute("PRAGMA freelist_count").fetchone()[0], True
+
+
+def run_maintenance(force: bool = False) -> dict:
+    """One maintenance pass; returns what it did. force runs every job whatever the traffic.
+    Raises MaintenanceError if another process is running a pass."""
+    path = _database_path()
+    with open(path + ".maintenance-lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise MaintenanceError("Another maintenance pass is running")
+
+        rate = database.get_recent_scan_rate(TRAFFIC_MINUTES)
+        result = {
+            "scan_rate": round(rate, 1),
+            "checkpointed_pages": 0,
+            "analyzed": False,
+            "optimized": False,
+            "vacuumed_pages": 0,
+            "converted": False,
+        }
+        conn = sqlite3.connect(path, timeout=database.BUSY_TIMEOUT)
+        conn.isolation_level = None
+        try:
+            result["checkpointed_pages"] = _checkpoint(conn, path, 0 if force else MAINTENANCE_WAL_BYTES)
+            if force or rate <= MAINTENANCE_BUSY_SCANS:
+                result["analyzed"] = _refresh_statistics(conn)
+                result["optimized"] = not result["analyzed"]
+            if force or rate <= MAINTENANCE_IDLE_SCANS:
+                result["vacuumed_pages"], result["converted"] = _vacuum(conn, MAINTENANCE_VACUUM_PAGES)
+        finally:
+            conn.close()
+        return result
+
+
+def describe(result: dict) -> str:
+    """One-line summary of the notable work a pass did, or "" if there was none"""
+    done = []
+    if result["checkpointed_pages"]:
+        done.append(f"checkpointed {result['checkpointed_pages']} WAL pages")
+    if result["analyzed"]:
+        done.append("analyzed after bulk changes")
+    if result["converted"]:
+        done.append(f"converted to incremental vacuum, released {result['vacuumed_pages']} pages")
+    elif result["vacuumed_pages"]:
+        done.append(f"released {result['vacuumed_pages']} free pages")
+    if not done:
+        return ""
+    return f"Maintenance ({result['scan_rate']} scans/min): " + ", ".join(done)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--force", action="store_true", help="run every job whatever the traffic")
+    return parser.parse_args(argv)
+
+
+def main(args):
+    database.init_db()
+    result = run_maintenance(force=args.force)
+    print(describe(result) or f"Maintenance ({result['scan_rate']} scans/min): nothing to do")
+
+
+if __name__ == "__main__":
+    try:
+        main(parse_args())
+    except MaintenanceError as e:
+        raise SystemExit(str(e))
@@ -0,0 +1,345 @@
+"""Uploaded backgrounds and sounds.
+
+Starlette reads a whole multipart body before the handler runs, so the size
+caps are enforced by UploadSizeLimit, which answers 413 from Content-Length
+before anything is read (or as soon as a body without one passes the cap).
+The handlers then copy uploads to disk in chunks with aiofiles.
+Backgrounds are re-encoded with Pillow at a few display widths: the largest
+becomes the background setting and the smaller ones sit next to it as
+<name>.w<width>.<ext>, so each kiosk can pick the smallest image that
+still covers its screen. Sounds are normalised to a short mono MP3 when
+ffmpeg is installed. Without Pillow or ffmpeg the file
+is kept as uploaded.
+
+Files are named after the SHA-256 of the uploaded bytes, so uploading the
+same file again reuses what is already stored and a URL always refers to
+the same content. The settings table holds the only references to uploads;
+files no setting points at are deleted when released and by a periodic
+sweep.
+"""
+import asyncio
+import hashlib
+import mimetypes
+import os
+import shutil
+import time
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional; backgrounds are then stored as uploaded
+    Image = None
+
+UPLOADS_DIR = "static/uploads"
+UPLOADS_URL = "/static/uploads"
+
+MAX_BACKGROUND_BYTES = int(os.getenv("MAX_BACKGROUND_BYTES", str(20 * 1024 * 1024)))
+MAX_SOUND_BYTES = int(os.getenv("MAX_SOUND_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+# Room for the multipart boundaries and the other form fields around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Display widths a background is rendered at; the largest is the main file
+BACKGROUND_WIDTHS = (1280, 1920, 2560)
+JPEG_QUALITY = 82
+
+FFMPEG_TIMEOUT = 30
+
+# Settings whose values may point at uploaded files
+MEDIA_SETTINGS = ("background_image", "success_sound", "error_sound")
+# Files younger than this are never swept, so an upload is not removed before its setting is saved
+SWEEP_GRACE_SECONDS = 600
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UploadSizeLimit:
+    """ASGI middleware refusing request bodies above a per-path cap with 413.
+
+    limits maps a path to the largest file it accepts. A declared Content-Length over
+    the cap is refused before the body is read; a body sent without one is cut off
+    as soon as it passes the cap."""
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        allowed = max_bytes + MULTIPART_OVERHEAD
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > allowed:
+            await self._refuse(max_bytes, scope, receive, send)
+            return
+
+        received = 0
+        refused = False
+
+        async def limited_receive():
+            nonlocal received, refused
+            if refused:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > allowed:
+                # Answer now and make the app see a client that went away; FastAPI would turn
+                # an exception raised while it parses the form into a 400
+                refused = True
+                await self._refuse(max_bytes, scope, receive, send)
+                return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not refused:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    @staticmethod
+    async def _refuse(max_bytes: int, scope, receive, send):
+        response = JSONResponse({"success": False, "message": f"File is larger than {max_bytes // (1024 * 1024)} MB"},
+                                status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: int) -> Tuple[int, str]:
+    """Stream an upload to path, removing it again if it exceeds max_bytes (a request
+    UploadSizeLimit let through may still hold a file slightly over the cap).
+    Returns the size and SHA-256 hex digest of the upload."""
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return size, digest.hexdigest()
+
+
+def _temp_path() -> str:
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    return os.path.join(UPLOADS_DIR, f".upload_{uuid.uuid4().hex}")
+
+
+def _extension(filename: str, default: str) -> str:
+    ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    return ext if ext.isalnum() and len(ext) <= 5 else default
+
+
+def variant_path(path: str, width: int) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.w{width}{ext}"
+
+
+def _stored(stem: str) -> Optional[str]:
+    """Name of the main file already stored for a content-addressed stem"""
+    if not os.path.isdir(UPLOADS_DIR):
+        return None
+    for name in os.listdir(UPLOADS_DIR):
+        if name.startswith(stem + ".") and name.count(".") == 1:
+            return name
+    return None
+
+
+def _publish(temp: str, name: str):
+    # Rename into place so a concurrent identical upload never sees a half-written file
+    os.replace(temp, os.path.join(UPLOADS_DIR, name))
+
+
+def _render_background(source: str, stem: str) -> str:
+    """Write display-sized re-encodings of source; returns the main file's name"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        ext, options = (".png", {"optimize": True}) if has_alpha else \
+            (".jpg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True})
+
+        widths = [w for w in BACKGROUND_WIDTHS if w < image.width] + [min(image.width, BACKGROUND_WIDTHS[-1])]
+        main = f"{stem}{ext}"
+        # Variants first: the main file appearing marks the set as complete
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            name = main if width == widths[-1] else variant_path(main, width)
+            temp = _temp_path()
+            resized.save(temp, format="PNG" if has_alpha else "JPEG", **options)
+            _publish(temp, name)
+    return main
+
+
+async def store_background(file: UploadFile) -> str:
+    """Save an uploaded background and its variants; returns the web path"""
+    temp = _temp_path()
+    _, digest = await save_upload(file, temp, MAX_BACKGROUND_BYTES)
+    stem = f"background_{digest}"
+    try:
+        existing = _stored(stem)
+        if existing:
+            _touch(existing)
+            return f"{UPLOADS_URL}/{existing}"
+        if Image is not None:
+            try:
+                name = await run_in_threadpool(_render_background, temp, stem)
+                return f"{UPLOADS_URL}/{name}"
+            except Image.DecompressionBombError:
+                raise ValueError("Image dimensions are too large")
+            except OSError:
+                # Formats Pillow cannot decode are kept as uploaded
+                pass
+        name = f"{stem}.{_extension(file.filename, 'jpg')}"
+        _publish(temp, name)
+        return f"{UPLOADS_URL}/{name}"
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+async def _normalize_sound(source: str, target: str) -> bool:
+    """Transcode to loudness-normalised mono MP3 with ffmpeg, if available"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-y", "-loglevel", "error", "-i", source,
+        "-vn", "-ac", "1", "-ar", "44100", "-af", "loudnorm=I=-16:TP=-1.5",
+        "-codec:a", "libmp3lame", "-b:a", "96k", "-f", "mp3", target,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await asyncio.wait_for(process.wait(), FFMPEG_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    if process.returncode == 0 and os.path.exists(target):
+        return True
+    if os.path.exists(target):
+        os.remove(target)
+    return False
+
+
+async def store_sound(file: UploadFile) -> str:
+    """Save an uploaded sound, normalised when possible; returns the web path"""
+    temp = _temp_path()
+    _, digest = await save_upload(file, temp, MAX_SOUND_BYTES)
+    # Success and error sounds share the store, the same clip is kept once
+    stem = f"sound_{digest}"
+    try:
+        existing = _stored(stem)
+        if existing:
+            _touch(existing)
+            return f"{UPLOADS_URL}/{existing}"
+        name = f"{stem}.mp3"
+        normalized = _temp_path()
+        if await _normalize_sound(temp, normalized):
+            _publish(normalized, name)
+        else:
+            name = f"{stem}.{_extension(file.filename, 'mp3')}"
+            _publish(temp, name)
+        return f"{UPLOADS_URL}/{name}"
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def _file_path(web_path: str) -> str:
+    return os.path.join(UPLOADS_DIR, os.path.basename(web_path))
+
+
+def sound_type(web_path: str) -> Optional[str]:
+    """MIME type of a stored sound from its extension: MP3 when ffmpeg normalised it,
+    the uploaded format otherwise. None when the extension is not a known audio type."""
+    media_type = mimetypes.guess_type(web_path or "")[0]
+    if not media_type or not media_type.startswith("audio/"):
+        return None
+    # Browsers know WAV as audio/wav; mimetypes reports the older audio/x-wav
+    return "audio/wav" if media_type == "audio/x-wav" else media_type
+
+
+def variant_widths(web_path: str) -> List[int]:
+    """Widths of the smaller variants stored next to a background"""
+    if not web_path or not web_path.startswith(UPLOADS_URL + "/"):
+        return []
+    path = _file_path(web_path)
+    return [w for w in BACKGROUND_WIDTHS if os.path.exists(variant_path(path, w))]
+
+
+def _touch(name: str):
+    # A reused file counts as fresh, so the sweep leaves it alone until its setting is saved
+    path = os.path.join(UPLOADS_DIR, name)
+    for candidate in [path] + [variant_path(path, w) for w in BACKGROUND_WIDTHS]:
+        if os.path.exists(candidate):
+            os.utime(candidate)
+
+
+def _main_name(name: str) -> str:
+    """background_x.w1280.jpg -> background_x.jpg"""
+    stem, ext = os.path.splitext(name)
+    base, dot, width = stem.rpartition(".w")
+    return f"{base}{ext}" if dot and width.isdigit() else name
+
+
+def referenced_files(settings: dict) -> set:
+    """Upload file names the settings point at"""
+    return {
+        os.path.basename(settings[key]) for key in MEDIA_SETTINGS
+        if settings.get(key, "").startswith(UPLOADS_URL + "/")
+    }
+
+
+def release_media(web_path: str, settings: dict):
+    """Delete an upload and its variants unless a setting still points at it.
+    Raises OSError if a file cannot be removed."""
+    if not web_path or not web_path.startswith(UPLOADS_URL + "/"):
+        return
+    if os.path.basename(web_path) in referenced_files(settings):
+        return
+    path = _file_path(web_path)
+    for candidate in [path] + [variant_path(path, w) for w in BACKGROUND_WIDTHS]:
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
+
+
+def sweep_orphans(referenced: Iterable[str], grace_seconds: float = SWEEP_GRACE_SECONDS) -> int:
+    """Delete uploads (and stale partial uploads) nothing refers to; returns the count"""
+    if not os.path.isdir(UPLOADS_DIR):
+        return 0
+    referenced = set(referenced)
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for entry in os.scandir(UPLOADS_DIR):
+        if not entry.is_file() or _main_name(entry.name) in referenced:
+            continue
+        try:
+            if entry.stat().st_mtime > cutoff:
+                continue
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            # Another worker swept it first
+            pass
+    return removed
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, NamedTuple, Optional
 from datetime import datetime
 
 class User(BaseModel):
@@ -23,12 +23,108 @@ class Checkin(BaseModel):
     checkin_time: Optional[datetime] = None
 
 class CheckinRecord(BaseModel):
+    id: Optional[int] = None
+    first_name: str
+    last_name: str
+    employee_id: str
+    table_number: int
+    checkin_time: str
+
+class TableMember(BaseModel):
+    employee_id: str
+    first_name: str
+    last_name: str
+    checked_in: bool = False
+
+class TableGroup(BaseModel):
+    table_number: int
+    users: list[TableMember] = []
+    user_count: int = 0
+    assigned: int = 0
+    checked_in: int = 0
+
+class UserChanges(BaseModel):
+    version: int
+    reset: bool = False
+    changed: list[User] = []
+    removed: list[str] = Field([], description="Employee IDs to drop from the list")
+
+class CheckinChanges(BaseModel):
+    version: int
+    reset: bool = False
+    changed: list[CheckinRecord] = []
+    removed: list[int] = Field([], description="Checkin IDs to drop from the list")
+
+class TableChanges(BaseModel):
+    version: int
+    reset: bool = False
+    changed: list[TableGroup] = []
+    removed: list[int] = Field([], description="Table numbers to drop from the list")
+
+class UserPage(BaseModel):
+    version: int
+    total: int = Field(description="Users matching the search across all pages")
+    offset: int
+    rows: list[User]
+
+class CheckinPage(BaseModel):
+    version: int
+    total: int = Field(description="Check-ins matching the search across all pages")
+    offset: int
+    rows: list[CheckinRecord]
+
+class TablePage(BaseModel):
+    version: int
+    total: int = Field(description="Tables matching the search across all pages")
+    offset: int
+    rows: list[TableGroup]
+
+# Tuple-backed rows for bulk paths (export, import, history, archive). They carry no
+# validation; pydantic models above are for single objects crossing the API.
+class UserRow(NamedTuple):
+    first_name: str
+    last_name: str
+    employee_id: str
+    table_number: int
+
+class CheckinRow(NamedTuple):
     first_name: str
     last_name: str
     employee_id: str
     table_number: int
     checkin_time: str
 
+class ArchivedCheckinRow(NamedTuple):
+    first_name: str
+    last_name: str
+    employee_id: str
+    table_number: int
+    checkin_time: str
+    event_id: Optional[int]
+    event_name: str
+
+class ArchiveRequest(BaseModel):
+    before: Optional[str] = Field(None, description="Archive checkins older than 'YYYY-MM-DD HH:MM:SS'")
+    event_id: Optional[int] = None
+    closed_events: bool = False
+
+class BulkCheckinRequest(BaseModel):
+    action: Literal["checkin", "checkout"] = "checkin"
+    employee_ids: Optional[list[str]] = Field(None, max_length=1000)
+    table_number: Optional[int] = Field(None, description="Everyone assigned to this table, instead of employee_ids")
+
+class BulkCheckinResult(BaseModel):
+    employee_id: str
+    name: Optional[str] = None
+    table_number: Optional[int] = None
+    success: bool
+    message: str
+
+class BulkCheckinResponse(BaseModel):
+    success: bool
+    message: str
+    results: list[BulkCheckinResult] = []
+
 class CheckinResponse(BaseModel):
     success: bool
     name: Optional[str] = None
@@ -39,6 +135,10 @@ class CheckinResponse(BaseModel):
 class ImportResponse(BaseModel):
     success: bool
     imported: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
     errors: list[str] = []
     message: Optional[str] = None
 
@@ -52,6 +152,17 @@ class CreateUserResponse(BaseModel):
     message: str
     user: Optional[User] = None
 
+class Event(BaseModel):
+    id: int
+    name: str
+    created_at: Optional[str] = None
+    checkin_count: int = 0
+    is_active: bool = False
+
+class EventCreate(BaseModel):
+    name: str = Field(..., min_length=1, description="Event name")
+    activate: bool = True
+
 class Settings(BaseModel):
     welcome_banner: str
     secondary_banner: str
@@ -45,34 +45,308 @@ function refreshActiveTab() {
     }
 }
 
+// Rows fetched per request as a list scrolls, and extra rows rendered above and below the view
+const PAGE_SIZE = 200;
+const OVERSCAN = 10;
+
+// A list that only keeps the rows in view in the DOM. Rows are fetched from the server one page
+// at a time as they scroll into view and remembered by key, so a delta (since=) replaces single
+// rows in place; only rows that appear, disappear or move make it refetch the pages in view.
+class VirtualList {
+    constructor(options) {
+        this.url = options.url;
+        this.key = options.key;
+        this.scroller = document.getElementById(options.scroller);
+        this.container = document.getElementById(options.container);
+        this.buildItem = options.buildItem;
+        this.buildPlaceholder = options.buildPlaceholder;
+        // Elements standing in for the rows above and below the window; without one, padding is used
+        this.buildSpacer = options.buildSpacer || null;
+        this.buildEmpty = options.buildEmpty || null;
+        // Extra query parameters that decide the order, e.g. the table sort
+        this.params = options.params || (() => ({}));
+        // Whether a changed row may have moved to another position
+        this.moved = options.moved || (() => false);
+        this.rowHeight = options.rowHeight;
+        this.measured = false;
+        
+        this.query = null;
+        this.version = null;
+        this.total = 0;
+        this.pages = new Map();
+        this.pending = new Map();
+        this.elements = new Map();
+        this.generation = 0;
+        this.frame = null;
+        
+        this.scroller.addEventListener('scroll', () => this.scheduleRender());
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+    
+    // Bring the list up to date for a search; call render() once it is visible
+    async load(search) {
+        const params = new URLSearchParams(this.params());
+        if (search) {
+            params.set('search', search);
+        }
+        const query = params.toString();
+        
+        if (query !== this.query) {
+            this.query = query;
+            this.discard();
+            this.scroller.scrollTop = 0;
+            await this.fetchPage(0);
+            return;
+        }
+        if (this.version !== null && !(await this.sync(search))) {
+            return;
+        }
+        // Rows appeared, disappeared or moved: reload what is in view, keeping the scroll position
+        this.discard();
+        await this.fetchVisible();
+    }
+    
+    // Apply the changes since the loaded version. Returns true when the pages in view must be refetched.
+    async sync(search) {
+        const params = new URLSearchParams({ since: this.version });
+        if (search) {
+            params.set('search', search);
+        }
+        const generation = this.generation;
+        const response = await fetch(`${this.url}?${params}`);
+        const delta = await response.json();
+        if (generation !== this.generation) {
+            return false;
+        }
+        if (delta.reset || delta.removed.length > 0) {
+            return true;
+        }
+        
+        const updates = [];
+        for (const row of delta.changed) {
+            const position = this.find(row[this.key]);
+            // A row not loaded yet may be a new one, which shifts everything after it
+            if (!position || this.moved(position.rows[position.index], row)) {
+                return true;
+            }
+            updates.push([position, row]);
+        }
+        updates.forEach(([position, row]) => {
+            position.rows[position.index] = row;
+            this.elements.delete(row[this.key]);
+        });
+        this.version = delta.version;
+        return false;
+    }
+    
+    find(key) {
+        for (const rows of this.pages.values()) {
+            const index = rows.findIndex(row => row[this.key] === key);
+            if (index !== -1) {
+                return { rows, index };
+            }
+        }
+        return null;
+    }
+    
+    // Keys of the rows loaded so far, in list order
+    loadedKeys() {
+        return Array.from(this.pages.keys()).sort((a, b) => a - b)
+            .flatMap(page => this.pages.get(page).map(row => row[this.key]));
+    }
+    
+    discard() {
+        this.generation++;
+        this.version = null;
+        this.pages = new Map();
+        this.pending = new Map();
+        this.elements = new Map();
+    }
+    
+    fetchPage(page) {
+        if (this.pages.has(page)) {
+            return Promise.resolve();
+        }
+        if (!this.pending.has(page)) {
+            const generation = this.generation;
+            const params = new URLSearchParams(this.query);
+            params.set('offset', page * PAGE_SIZE);
+            params.set('limit', PAGE_SIZE);
+            const request = fetch(`${this.url}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (generation !== this.generation) {
+                        return;
+                    }
+                    // Later pages may be newer; replaying a delta from the oldest version is harmless
+                    if (this.version === null || data.version < this.version) {
+                        this.version = data.version;
+                    }
+                    this.total = data.total;
+                    this.pages.set(page, data.rows);
+                })
+                .finally(() => {
+                    if (this.pending.get(page) === request) {
+                        this.pending.delete(page);
+                    }
+                });
+            this.pending.set(page, request);
+        }
+        return this.pending.get(page);
+    }
+    
+    columns() {
+        const template = getComputedStyle(this.container).gridTemplateColumns;
+        return template && template !== 'none' ? template.split(' ').length : 1;
+    }
+    
+    // Index range of the items in view, plus overscan
+    visibleRange() {
+        const columns = this.columns();
+        const rowCount = Math.ceil(this.total / columns);
+        const start = this.container.getBoundingClientRect().top - this.scroller.getBoundingClientRect().top
+            + this.scroller.scrollTop;
+        const top = Math.max(0, this.scroller.scrollTop - start);
+        const firstRow = Math.max(0, Math.floor(top / this.rowHeight) - OVERSCAN);
+        const lastRow = Math.min(rowCount - 1, Math.ceil((top + this.scroller.clientHeight) / this.rowHeight) + OVERSCAN);
+        return {
+            columns, rowCount, firstRow, lastRow,
+            first: firstRow * columns,
+            last: Math.min(this.total - 1, (lastRow + 1) * columns - 1)
+        };
+    }
+    
+    fetchVisible() {
+        const { first, last } = this.visibleRange();
+        const fetches = [];
+        for (let page = Math.floor(first / PAGE_SIZE); page <= Math.floor(last / PAGE_SIZE); page++) {
+            fetches.push(this.fetchPage(page));
+        }
+        return Promise.all(fetches);
+    }
+    
+    scheduleRender() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+    
+    // Show the items in view, reusing the elements of rows that did not change
+    render() {
+        if (this.total === 0) {
+            this.elements = new Map();
+            this.setSpacing(0, 0);
+            this.container.replaceChildren(...(this.buildEmpty ? [this.buildEmpty()] : []));
+            return;
+        }
+        
+        const { columns, rowCount, firstRow, lastRow, first, last } = this.visibleRange();
+        const elements = new Map();
+        const items = [];
+        let missing = false;
+        for (let i = first; i <= last; i++) {
+            const rows = this.pages.get(Math.floor(i / PAGE_SIZE));
+            const row = rows && rows[i % PAGE_SIZE];
+            if (!row) {
+                missing = true;
+                items.push(this.buildPlaceholder(this.rowHeight));
+                continue;
+            }
+            const key = row[this.key];
+            const element = this.elements.get(key) || this.buildItem(row);
+            elements.set(key, element);
+            items.push(element);
+        }
+        this.elements = elements;
+        
+        const spacers = this.setSpacing(firstRow * this.rowHeight, (rowCount - lastRow - 1) * this.rowHeight);
+        this.container.replaceChildren(...spacers[0], ...items, ...spacers[1]);
+        
+        if (missing) {
+            this.fetchVisible().then(() => this.scheduleRender());
+        }
+        // Row height is measured from the first real render; the estimate only places the first window
+        const sample = elements.values().next().value;
+        if (!this.measured && sample && sample.offsetHeight > 0) {
+            this.measured = true;
+            const gap = parseFloat(getComputedStyle(this.container).rowGap) || 0;
+            const height = sample.offsetHeight + gap;
+            if (height !== this.rowHeight) {
+                this.rowHeight = height;
+                this.scheduleRender();
+            }
+        }
+    }
+    
+    setSpacing(above, below) {
+        if (!this.buildSpacer) {
+            this.container.style.paddingTop = `${above}px`;
+            this.container.style.paddingBottom = `${below}px`;
+            return [[], []];
+        }
+        return [above > 0 ? [this.buildSpacer(above)] : [], below > 0 ? [this.buildSpacer(below)] : []];
+    }
+}
+
+function buildRowSpacer(columns) {
+    return height => {
+        const row = document.createElement('tr');
+        row.className = 'virtual-spacer';
+        row.style.height = `${height}px`;
+        row.innerHTML = `<td colspan="${columns}"></td>`;
+        return row;
+    };
+}
+
+function buildRowPlaceholder(columns) {
+    return height => {
+        const row = document.createElement('tr');
+        row.style.height = `${height}px`;
+        row.innerHTML = `<td colspan="${columns}" class="virtual-placeholder">Loading...</td>`;
+        return row;
+    };
+}
+
+function buildHistoryRow(record) {
+    const row = document.createElement('tr');
+    row.innerHTML = `
+        <td>${record.first_name} ${record.last_name}</td>
+        <td>${record.employee_id}</td>
+        <td>${record.table_number}</td>
+        <td>${new Date(record.checkin_time).toLocaleString()}</td>
+    `;
+    return row;
+}
+
+const historyList = new VirtualList({
+    url: '/admin/history',
+    key: 'id',
+    scroller: 'history-scroll',
+    container: 'history-body',
+    rowHeight: 45,
+    buildItem: buildHistoryRow,
+    buildSpacer: buildRowSpacer(4),
+    buildPlaceholder: buildRowPlaceholder(4)
+});
+
 async function loadHistory(searchQuery = '') {
     const loading = document.getElementById('history-loading');
     const table = document.getElementById('history-table');
-    const tbody = document.getElementById('history-body');
     
-    loading.style.display = 'block';
-    table.style.display = 'none';
+    if (historyList.query === null) {
+        loading.style.display = 'block';
+        table.style.display = 'none';
+    }
     
     try {
-        const url = searchQuery ? `/admin/history?search=${encodeURIComponent(searchQuery)}` : '/admin/history';
-        const response = await fetch(url);
-        const history = await response.json();
-        
-        tbody.innerHTML = '';
-        
-        history.forEach(record => {
-            const row = document.createElement('tr');
-            row.innerHTML = `
-                <td>${record.first_name} ${record.last_name}</td>
-                <td>${record.employee_id}</td>
-                <td>${record.table_number}</td>
-                <td>${new Date(record.checkin_time).toLocaleString()}</td>
-            `;
-            tbody.appendChild(row);
-        });
+        await historyList.load(searchQuery);
         
         loading.style.display = 'none';
         table.style.display = 'table';
+        historyList.render();
         
     } catch (error) {
         loading.innerHTML = 'Error loading history';
@@ -80,49 +354,62 @@ async function loadHistory(searchQuery = '') {
     }
 }
 
+function buildUserRow(user) {
+    const row = document.createElement('tr');
+    const statusClass = user.is_checked_in ? 'checked-in' : 'not-checked-in';
+    const statusText = user.is_checked_in ? 'Checked In' : 'Not Checked In';
+    const lastCheckin = user.last_checkin ? new Date(user.last_checkin).toLocaleString() : 'Never';
+    
+    const buttonText = user.is_checked_in ? 'Check Out' : 'Check In';
+    const buttonClass = user.is_checked_in ? 'checkout-button' : 'checkin-button';
+    const buttonAction = user.is_checked_in ? 'manualCheckout' : 'manualCheckin';
+    
+    const checked = selectedUsers.has(user.employee_id) ? 'checked' : '';
+    
+    row.innerHTML = `
+        <td><input type="checkbox" ${checked} onclick="toggleUserSelection(event, '${user.employee_id}')"></td>
+        <td>
+            <button onclick="${buttonAction}('${user.employee_id}', this)" 
+                    class="${buttonClass}">
+                ${buttonText}
+            </button>
+        </td>
+        <td>${user.first_name} ${user.last_name}</td>
+        <td>${user.employee_id}</td>
+        <td>${user.table_number}</td>
+        <td><span class="status ${statusClass}">${statusText}</span></td>
+        <td>${lastCheckin}</td>
+    `;
+    return row;
+}
+
+const usersList = new VirtualList({
+    url: '/admin/users',
+    key: 'employee_id',
+    scroller: 'users-scroll',
+    container: 'users-body',
+    rowHeight: 60,
+    buildItem: buildUserRow,
+    buildSpacer: buildRowSpacer(7),
+    buildPlaceholder: buildRowPlaceholder(7),
+    moved: (old, row) => old.first_name !== row.first_name || old.last_name !== row.last_name
+});
+
 async function loadUsers(searchQuery = '') {
     const loading = document.getElementById('users-loading');
     const table = document.getElementById('users-table');
-    const tbody = document.getElementById('users-body');
     
-    loading.style.display = 'block';
-    table.style.display = 'none';
+    if (usersList.query === null) {
+        loading.style.display = 'block';
+        table.style.display = 'none';
+    }
     
     try {
-        const url = searchQuery ? `/admin/users?search=${encodeURIComponent(searchQuery)}` : '/admin/users';
-        const response = await fetch(url);
-        const users = await response.json();
-        
-        tbody.innerHTML = '';
-        
-        users.forEach(user => {
-            const row = document.createElement('tr');
-            const statusClass = user.is_checked_in ? 'checked-in' : 'not-checked-in';
-            const statusText = user.is_checked_in ? 'Checked In' : 'Not Checked In';
-            const lastCheckin = user.last_checkin ? new Date(user.last_checkin).toLocaleString() : 'Never';
-            
-            const buttonText = user.is_checked_in ? 'Check Out' : 'Check In';
-            const buttonClass = user.is_checked_in ? 'checkout-button' : 'checkin-button';
-            const buttonAction = user.is_checked_in ? 'manualCheckout' : 'manualCheckin';
-            
-            row.innerHTML = `
-                <td>
-                    <button onclick="${buttonAction}('${user.employee_id}', this)" 
-                            class="${buttonClass}">
-                        ${buttonText}
-                    </button>
-                </td>
-                <td>${user.first_name} ${user.last_name}</td>
-                <td>${user.employee_id}</td>
-                <td>${user.table_number}</td>
-                <td><span class="status ${statusClass}">${statusText}</span></td>
-                <td>${lastCheckin}</td>
-            `;
-            tbody.appendChild(row);
-        });
+        await usersList.load(searchQuery);
         
         loading.style.display = 'none';
         table.style.display = 'table';
+        usersList.render();
         
     } catch (error) {
         loading.innerHTML = 'Error loading users';
@@ -130,54 +417,178 @@ async function loadUsers(searchQuery = '') {
     }
 }
 
+// Employee IDs ticked in the guests list, kept across searches and scrolling
+const selectedUsers = new Set();
+let lastToggledUser = null;
+
+function toggleUserSelection(event, employeeId) {
+    const select = event.target.checked;
+    let keys = [employeeId];
+    // Shift-click ticks or clears everything loaded between the last click and this one
+    if (event.shiftKey && lastToggledUser !== null) {
+        const loaded = usersList.loadedKeys();
+        const from = loaded.indexOf(lastToggledUser);
+        const to = loaded.indexOf(employeeId);
+        if (from !== -1 && to !== -1) {
+            keys = loaded.slice(Math.min(from, to), Math.max(from, to) + 1);
+        }
+    }
+    keys.forEach(key => {
+        if (select) {
+            selectedUsers.add(key);
+        } else {
+            selectedUsers.delete(key);
+        }
+        // Rows out of view pick the selection up when they are rebuilt
+        const row = usersList.elements.get(key);
+        if (row) {
+            row.querySelector('input[type="checkbox"]').checked = select;
+        }
+    });
+    lastToggledUser = employeeId;
+    updateSelectionCount();
+}
+
+function clearSelection() {
+    selectedUsers.clear();
+    lastToggledUser = null;
+    usersList.elements.forEach(row => {
+        row.querySelector('input[type="checkbox"]').checked = false;
+    });
+    updateSelectionCount();
+}
+
+function updateSelectionCount() {
+    document.getElementById('selection-count').textContent = `${selectedUsers.size} selected`;
+    document.querySelectorAll('.bulk-selection-button').forEach(button => {
+        button.disabled = selectedUsers.size === 0;
+    });
+}
+
+// action is 'checkin' or 'checkout'; target is { employee_ids: [...] } or { table_number: n }
+async function bulkCheckin(action, target) {
+    try {
+        const response = await fetch('/admin/checkin/bulk', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ action, ...target })
+        });
+        const result = await response.json();
+        
+        const failed = (result.results || []).filter(item => !item.success);
+        const details = failed.slice(0, 5).map(item => `${item.name || item.employee_id}: ${item.message}`);
+        if (failed.length > details.length) {
+            details.push(`${failed.length - details.length} more`);
+        }
+        showBulkMessage([result.message, ...details].join('. '), result.success ? 'success' : 'error');
+        
+        if (result.success) {
+            refreshActiveTab();
+        }
+        return result;
+    } catch (error) {
+        showBulkMessage(`Error during bulk ${action}`, 'error');
+        console.error('Error:', error);
+        return null;
+    }
+}
+
+async function bulkCheckinSelected(action) {
+    const result = await bulkCheckin(action, { employee_ids: Array.from(selectedUsers) });
+    if (result && result.success) {
+        clearSelection();
+    }
+}
+
+async function bulkCheckinTable(action, tableNumber, buttonElement) {
+    const verb = action === 'checkin' ? 'Check in' : 'Check out';
+    if (!confirm(`${verb} everyone at table ${tableNumber}?`)) {
+        return;
+    }
+    buttonElement.disabled = true;
+    await bulkCheckin(action, { table_number: tableNumber });
+    buttonElement.disabled = false;
+}
+
+function showBulkMessage(text, type) {
+    const message = document.getElementById('bulk-message');
+    message.textContent = text;
+    message.className = `message ${type}`;
+    message.style.display = 'block';
+    
+    setTimeout(() => {
+        message.style.display = 'none';
+    }, 5000);
+}
+
+function buildTableCard(table) {
+    const tableCard = document.createElement('div');
+    tableCard.className = 'table-card';
+    
+    const usersList = table.users.map(user => 
+        `<li class="${user.checked_in ? 'member-checked-in' : ''}">${user.first_name} ${user.last_name}</li>`
+    ).join('');
+    
+    tableCard.innerHTML = `
+        <div class="table-header">
+            <div class="table-number">Table ${table.table_number}</div>
+            <div class="user-count">${table.checked_in}/${table.assigned} checked in</div>
+        </div>
+        <div class="table-actions">
+            <button class="checkin-button" onclick="bulkCheckinTable('checkin', ${table.table_number}, this)">Check In All</button>
+            <button class="checkout-button" onclick="bulkCheckinTable('checkout', ${table.table_number}, this)">Check Out All</button>
+        </div>
+        <ul class="table-users">
+            ${usersList}
+        </ul>
+    `;
+    return tableCard;
+}
+
+function tableSort() {
+    const sortSelect = document.getElementById('table-sort');
+    return sortSelect ? sortSelect.value : 'table_number';
+}
+
+const tablesList = new VirtualList({
+    url: '/admin/tables',
+    key: 'table_number',
+    scroller: 'tables-container',
+    container: 'tables-grid',
+    rowHeight: 300,
+    buildItem: buildTableCard,
+    buildPlaceholder: () => {
+        const card = document.createElement('div');
+        card.className = 'table-card virtual-placeholder';
+        card.textContent = 'Loading...';
+        return card;
+    },
+    buildEmpty: () => {
+        const search = new URLSearchParams(tablesList.query).get('search');
+        const empty = document.createElement('div');
+        empty.className = 'empty-tables';
+        empty.textContent = search ? `No tables found matching "${search}"` : 'No tables with users found';
+        return empty;
+    },
+    params: () => ({ sort: tableSort() }),
+    moved: (old, row) => tableSort() !== 'table_number' && old.user_count !== row.user_count
+});
+
 async function loadTables(searchQuery = '') {
     const loading = document.getElementById('tables-loading');
     const container = document.getElementById('tables-container');
-    const grid = document.getElementById('tables-grid');
     
-    loading.style.display = 'block';
-    container.style.display = 'none';
+    if (tablesList.query === null) {
+        loading.style.display = 'block';
+        container.style.display = 'none';
+    }
     
     try {
-        const url = searchQuery ? `/admin/tables?search=${encodeURIComponent(searchQuery)}` : '/admin/tables';
-        const response = await fetch(url);
-        let tables = await response.json();
-        
-        // Apply sorting based on selected option
-        const sortSelect = document.getElementById('table-sort');
-        if (sortSelect) {
-            const sortBy = sortSelect.value;
-            tables = sortTables(tables, sortBy);
-        }
-        
-        grid.innerHTML = '';
-        
-        if (tables.length === 0) {
-            const emptyMsg = searchQuery ? `No tables found matching "${searchQuery}"` : 'No tables with users found';
-            grid.innerHTML = `<div class="empty-tables">${emptyMsg}</div>`;
-        } else {
-            tables.forEach(table => {
-                const tableCard = document.createElement('div');
-                tableCard.className = 'table-card';
-                
-                const usersList = table.users.map(user => `<li>${user}</li>`).join('');
-                
-                tableCard.innerHTML = `
-                    <div class="table-header">
-                        <div class="table-number">Table ${table.table_number}</div>
-                        <div class="user-count">${table.user_count} user${table.user_count === 1 ? '' : 's'}</div>
-                    </div>
-                    <ul class="table-users">
-                        ${usersList}
-                    </ul>
-                `;
-                
-                grid.appendChild(tableCard);
-            });
-        }
+        await tablesList.load(searchQuery);
         
         loading.style.display = 'none';
         container.style.display = 'block';
+        tablesList.render();
         
     } catch (error) {
         loading.innerHTML = 'Error loading tables';
@@ -185,27 +596,92 @@ async function loadTables(searchQuery = '') {
     }
 }
 
-function sortTables(tables, sortBy) {
-    switch (sortBy) {
-        case 'user_count_asc':
-            return tables.sort((a, b) => a.user_count - b.user_count);
-        case 'user_count_desc':
-            return tables.sort((a, b) => b.user_count - a.user_count);
-        case 'table_number':
-        default:
-            return tables.sort((a, b) => a.table_number - b.table_number);
+function applySortAndReload() {
+    // The server orders the tables, so a new sort starts again from the first page
+    const globalSearchInput = document.getElementById('global-search-input');
+    loadTables(globalSearchInput ? globalSearchInput.value.trim() : '');
+}
+
+async function loadEvents() {
+    const select = document.getElementById('event-select');
+    
+    try {
+        const response = await fetch('/admin/events');
+        const events = await response.json();
+        
+        select.innerHTML = '';
+        events.forEach(event => {
+            const option = document.createElement('option');
+            option.value = event.id;
+            option.textContent = `${event.name} (${event.checkin_count} checkins)`;
+            option.selected = event.is_active;
+            select.appendChild(option);
+        });
+        
+    } catch (error) {
+        console.error('Error loading events:', error);
     }
 }
 
-function applySortAndReload() {
-    const globalSearchInput = document.getElementById('global-search-input');
-    const searchQuery = globalSearchInput ? globalSearchInput.value.trim() : '';
-    loadTables(searchQuery);
+async function activateEvent(eventId) {
+    try {
+        const response = await fetch(`/admin/events/${eventId}/activate`, {
+            method: 'PUT'
+        });
+        
+        const result = await response.json();
+        
+        if (!result.success) {
+            alert(result.message || 'Failed to switch event');
+        }
+        loadEvents();
+        refreshActiveTab();
+        
+    } catch (error) {
+        alert('Error switching event');
+        console.error('Error:', error);
+    }
+}
+
+async function createEvent() {
+    const name = prompt('Name of the new event (it becomes the active event):');
+    if (!name || !name.trim()) return;
+    
+    try {
+        const response = await fetch('/admin/events', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                name: name.trim(),
+                activate: true
+            })
+        });
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            loadEvents();
+            refreshActiveTab();
+        } else {
+            alert(result.message || 'Failed to create event');
+        }
+        
+    } catch (error) {
+        alert('Error creating event');
+        console.error('Error:', error);
+    }
 }
 
 async function exportExcel() {
     try {
         const response = await fetch('/admin/export');
+        if (!response.ok) {
+            const result = await response.json();
+            alert(result.message || 'Export failed');
+            return;
+        }
         const blob = await response.blob();
         
         const url = window.URL.createObjectURL(blob);
@@ -223,6 +699,75 @@ async function exportExcel() {
     }
 }
 
+async function exportArchive() {
+    try {
+        const response = await fetch('/admin/export/archive');
+        if (!response.ok) {
+            const result = await response.json();
+            alert(result.message || 'Export failed');
+            return;
+        }
+        const blob = await response.blob();
+        
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.style.display = 'none';
+        a.href = url;
+        a.download = 'checkin_archive.xlsx';
+        document.body.appendChild(a);
+        a.click();
+        window.URL.revokeObjectURL(url);
+        
+    } catch (error) {
+        alert('Error exporting archive');
+        console.error('Error:', error);
+    }
+}
+
+async function archivePastEvents() {
+    if (!confirm('Move the checkin history of every event except the active one to the archive? It stays available through Export Archive.')) {
+        return;
+    }
+    
+    try {
+        const response = await fetch('/admin/archive', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                closed_events: true
+            })
+        });
+        
+        const result = await response.json();
+        alert(result.message);
+        loadEvents();
+        
+    } catch (error) {
+        alert('Error archiving checkin history');
+        console.error('Error:', error);
+    }
+}
+
+async function backupNow(buttonElement) {
+    const originalText = buttonElement.textContent;
+    buttonElement.textContent = 'Backing up...';
+    buttonElement.disabled = true;
+    
+    try {
+        const response = await fetch('/admin/backups', { method: 'POST' });
+        const result = await response.json();
+        alert(result.message);
+    } catch (error) {
+        alert('Error creating backup');
+        console.error('Error:', error);
+    } finally {
+        buttonElement.textContent = originalText;
+        buttonElement.disabled = false;
+    }
+}
+
 function handleFileSelection() {
     const fileInput = document.getElementById('excel-file');
     const importButton = document.getElementById('import-users-btn');
@@ -255,8 +800,14 @@ async function importFile() {
         return;
     }
     
+    const deleteMissing = document.getElementById('import-delete-missing').checked;
+    if (deleteMissing && !confirm('Remove every user who is not in this file?')) {
+        return;
+    }
+    
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('delete_missing', deleteMissing);
     
     try {
         const response = await fetch('/admin/import', {
@@ -267,7 +818,10 @@ async function importFile() {
         const result = await response.json();
         
         if (result.success) {
-            let msg = `Successfully imported ${result.imported} users`;
+            let msg = `Imported ${result.imported} users: ${result.inserted} added, ${result.updated} updated, ${result.unchanged} unchanged`;
+            if (result.deleted > 0) {
+                msg += `, ${result.deleted} removed`;
+            }
             if (result.errors.length > 0) {
                 msg += `\n\nErrors:\n${result.errors.join('\n')}`;
             }
@@ -370,6 +924,7 @@ async function confirmClearHistory() {
         if (result.success) {
             // Successfully cleared checkin records
             closeClearHistoryModal();
+            loadEvents();
             // Refresh history tab if it's active
             if (currentTab === 'history') {
                 loadHistory();
@@ -504,7 +1059,8 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 300); // Debounce search
     });
     
-    // Load the default tab (users)
+    // Load the event selector and the default tab (users)
+    loadEvents();
     loadUsers();
 });
 
@@ -906,8 +1462,8 @@ async function manualCheckin(employeeId, buttonElement) {
         const result = await response.json();
         
         if (result.success) {
-            // Refresh users list to show updated status
-            loadUsers();
+            // Fetch just the changed rows to show the updated status
+            refreshActiveTab();
         } else {
             alert(result.message || 'Failed to check in user');
             buttonElement.textContent = originalText;
@@ -935,8 +1491,8 @@ async function manualCheckout(employeeId, buttonElement) {
         const result = await response.json();
         
         if (result.success) {
-            // Refresh users list to show updated status
-            loadUsers();
+            // Fetch just the changed rows to show the updated status
+            refreshActiveTab();
         } else {
             alert(result.message || 'Failed to check out user');
             buttonElement.textContent = originalText;
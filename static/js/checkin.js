@@ -44,8 +44,11 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
-    async function processCheckin(badgeId) {
-        try {
+    // A busy server answers 503 before recording anything, so the scan is safe to send again
+    const BUSY_RETRIES = 3;
+    
+    async function postCheckin(badgeId) {
+        for (let attempt = 0; ; attempt++) {
             const formData = new FormData();
             formData.append('badge_id', badgeId);
             
@@ -53,76 +56,105 @@ document.addEventListener('DOMContentLoaded', function() {
                 method: 'POST',
                 body: formData
             });
-            
-            const data = await response.json();
-            
-            // Hide secondary banner and show result
-            const secondaryBanner = document.getElementById('secondary-banner');
-            if (secondaryBanner) {
-                secondaryBanner.style.display = 'none';
+            if (response.status !== 503 || attempt === BUSY_RETRIES) {
+                return response;
             }
-            result.style.display = 'block';
-            
-            if (data.success) {
-                result.className = 'success';
-                result.innerHTML = `
-                    <div class="user-info">Welcome, ${data.name}!</div>
-                    <div class="table-info">Table ${data.table_number}</div>
-                `;
-                // Play success sound
-                playSound('success-sound');
-            } else {
-                result.className = 'error';
-                result.innerHTML = `<div class="error-message">${data.message || 'Checkin failed'}</div>`;
-                // Play error sound
-                playSound('error-sound');
+            const retryAfter = parseFloat(response.headers.get('Retry-After')) || 1;
+            await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        }
+    }
+    
+    // Local copy of the roster: badge -> [employee_id, first_name, last_name, table_number]
+    const ROSTER_REFRESH_MS = 60000;
+    const roster = { version: null, users: new Map() };
+    
+    async function loadRoster() {
+        try {
+            const url = roster.version === null ? '/checkin/roster' : `/checkin/roster?since=${roster.version}`;
+            const response = await fetch(url);
+            if (!response.ok) {
+                return;
             }
-            
-            // Clear any existing timeout
-            if (hideTimeout) {
-                clearTimeout(hideTimeout);
+            const data = await response.json();
+            if (roster.version === null) {
+                roster.users = new Map(data.rows.map(row => [row[0], row]));
+                roster.version = parseInt(response.headers.get('X-Data-Version'), 10);
+            } else if (data.reset) {
+                // Users were deleted; start again from the full roster
+                roster.version = null;
+                await loadRoster();
+            } else {
+                data.rows.forEach(row => roster.users.set(row[0], row));
+                roster.version = data.version;
             }
-            
-            // Set a new timeout
-            hideTimeout = setTimeout(() => {
-                result.classList.remove('success', 'error');
-                result.style.display = 'none';
-                // Show secondary banner again
-                const secondaryBanner = document.getElementById('secondary-banner');
-                if (secondaryBanner) {
-                    secondaryBanner.style.display = 'block';
-                }
-                hideTimeout = null; // Clear the reference
-            }, 5000);
-            
         } catch (error) {
-            // Hide secondary banner and show result
+            // Scans still work through the server while the roster cannot be fetched
+            console.log('Error loading roster:', error);
+        }
+    }
+    
+    loadRoster();
+    setInterval(loadRoster, ROSTER_REFRESH_MS);
+    
+    function showResult(data) {
+        // Hide secondary banner and show result
+        const secondaryBanner = document.getElementById('secondary-banner');
+        if (secondaryBanner) {
+            secondaryBanner.style.display = 'none';
+        }
+        result.style.display = 'block';
+        
+        if (data.success) {
+            result.className = 'success';
+            result.innerHTML = `
+                <div class="user-info">Welcome, ${data.name}!</div>
+                <div class="table-info">Table ${data.table_number}</div>
+            `;
+            // Play success sound
+            playSound('success-sound');
+        } else {
+            result.className = 'error';
+            result.innerHTML = `<div class="error-message">${data.message || 'Checkin failed'}</div>`;
+            // Play error sound
+            playSound('error-sound');
+        }
+        
+        // Clear any existing timeout
+        if (hideTimeout) {
+            clearTimeout(hideTimeout);
+        }
+        
+        // Set a new timeout
+        hideTimeout = setTimeout(() => {
+            result.classList.remove('success', 'error');
+            result.style.display = 'none';
+            // Show secondary banner again
             const secondaryBanner = document.getElementById('secondary-banner');
             if (secondaryBanner) {
-                secondaryBanner.style.display = 'none';
+                secondaryBanner.style.display = 'block';
             }
-            result.style.display = 'block';
-            result.className = 'error';
-            result.innerHTML = '<div class="error-message">Error processing checkin</div>';
-            // Play error sound for network/processing errors
-            playSound('error-sound');
+            hideTimeout = null; // Clear the reference
+        }, 5000);
+    }
+    
+    async function processCheckin(badgeId) {
+        const known = roster.users.get(badgeId);
+        if (known) {
+            // Show the attendee at once; the server records the check-in meanwhile
+            showResult({ success: true, name: `${known[1]} ${known[2]}`, table_number: known[3] });
+        }
+        try {
+            const response = await postCheckin(badgeId);
             
-            // Clear any existing timeout
-            if (hideTimeout) {
-                clearTimeout(hideTimeout);
-            }
+            const data = await response.json();
             
-            // Set a new timeout for error case too
-            hideTimeout = setTimeout(() => {
-                result.classList.remove('success', 'error');
-                result.style.display = 'none';
-                // Show secondary banner again
-                const secondaryBanner = document.getElementById('secondary-banner');
-                if (secondaryBanner) {
-                    secondaryBanner.style.display = 'block';
-                }
-                hideTimeout = null; // Clear the reference
-            }, 5000);
+            // Only a different answer from the server replaces what the roster showed
+            if (!known || !data.success || data.table_number !== known[3]) {
+                showResult(data);
+            }
+        } catch (error) {
+            // Network/processing errors, also after a local result: the check-in was not recorded
+            showResult({ success: false, message: 'Error processing checkin' });
         }
     }
 });
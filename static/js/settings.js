@@ -31,11 +31,23 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     if (backgroundImage && backgroundImage.trim() !== '') {
-        const bgUrl = `url("${backgroundImage}")`;
+        const bgUrl = `url("${backgroundForScreen(backgroundImage, body.dataset.backgroundWidths)}")`;
         root.style.setProperty('--background-image', bgUrl);
         console.log('Background image set to:', bgUrl);
     } else {
         root.style.setProperty('--background-image', 'none');
         console.log('Background image set to: none');
     }
-});
\ No newline at end of file
+});
+
+// Pick the smallest stored variant (name.w1280.jpg, ...) that still covers the screen
+function backgroundForScreen(backgroundImage, widths) {
+    if (!widths) return backgroundImage;
+    
+    const screenWidth = Math.max(window.screen.width, window.screen.height) * (window.devicePixelRatio || 1);
+    const width = widths.split(',').map(Number).find(w => w >= screenWidth);
+    if (!width) return backgroundImage;
+    
+    const dot = backgroundImage.lastIndexOf('.');
+    return `${backgroundImage.slice(0, dot)}.w${width}${backgroundImage.slice(dot)}`;
+}
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Shared fixtures: every test runs against SQLite and, when TEST_DATABASE_URL
+points at a throwaway PostgreSQL database, against PostgreSQL as well.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+    TEST_DATABASE_URL=postgresql://localhost/checkin_test python -m pytest -q
+"""
+import os
+import sys
+
+# Background jobs stay off; tests drive the database directly
+os.environ.setdefault("BACKUP_INTERVAL", "0")
+os.environ.setdefault("MAINTENANCE_INTERVAL", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+import admission  # noqa: E402
+import database  # noqa: E402
+
+ADMIN_USERNAME = "admin"
+
+
+def _reset_postgres():
+    conn = database.get_db_connection()
+    conn.execute("DROP SCHEMA public CASCADE")
+    conn.execute("CREATE SCHEMA public")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def empty_db(request, tmp_path):
+    """A configured database without a schema, on each backend"""
+    if request.param == "postgresql":
+        url = os.getenv("TEST_DATABASE_URL", "")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL is not set")
+        database.configure(url, durability="full")
+        _reset_postgres()
+    else:
+        database.configure(f"sqlite:///{tmp_path / 'checkin.db'}", durability="full")
+    yield database
+    database.close_db()
+
+
+@pytest.fixture
+def db(empty_db):
+    """An empty, initialised database on each backend"""
+    empty_db.init_db()
+    return empty_db
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """TestClient signed in as an admin. The lifespan is not run, so no background jobs start."""
+    from fastapi.testclient import TestClient
+    import app
+
+    # Limiters belong to the event loop that created them; each test gets fresh ones
+    for gate in admission.GATES:
+        monkeypatch.setattr(gate, "_limiter", None)
+    db.create_auth_user(ADMIN_USERNAME, "password123", is_admin=True)
+    test_client = TestClient(app.app)
+    test_client.cookies.set("session_id", db.create_session(ADMIN_USERNAME))
+    return test_client
@@ -0,0 +1,281 @@
+"""Check-in, roster import and delta endpoints on every backend"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from openpyxl import Workbook
+
+import admission
+import media
+
+HEADERS = ["First Name", "Last Name", "Employee ID", "Table Number"]
+
+
+def workbook(rows) -> bytes:
+    book = Workbook()
+    sheet = book.active
+    sheet.append(HEADERS)
+    for row in rows:
+        sheet.append(list(row))
+    output = io.BytesIO()
+    book.save(output)
+    return output.getvalue()
+
+
+def import_roster(client, rows, delete_missing=False):
+    files = {"file": ("roster.xlsx", workbook(rows),
+                      "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    response = client.post("/admin/import", files=files, data={"delete_missing": str(delete_missing).lower()})
+    assert response.status_code == 200
+    return response.json()
+
+
+def add_user(client, employee_id, table_number=1, first_name="Ann", last_name="Lee"):
+    response = client.post("/admin/users", json={"employee_id": employee_id, "first_name": first_name,
+                                                 "last_name": last_name, "table_number": table_number})
+    assert response.json()["success"]
+
+
+def test_checkin_known_badge(client):
+    add_user(client, "E1", table_number=4)
+
+    result = client.post("/checkin", data={"badge_id": "E1"}).json()
+
+    assert result["success"]
+    assert result["name"] == "Ann Lee"
+    assert result["table_number"] == 4
+    history = client.get("/admin/history").json()
+    assert [(row["employee_id"], row["checkin_time"]) for row in history] == [("E1", result["time"])]
+    assert client.get("/admin/tables/occupancy").json()[0]["checked_in"] == 1
+
+
+def test_checkin_unknown_badge(client):
+    result = client.post("/checkin", data={"badge_id": "nobody"}).json()
+
+    assert not result["success"]
+    assert "not found" in result["message"]
+    assert client.get("/admin/history").json() == []
+
+
+def test_duplicate_scan_counts_one_arrival(client):
+    add_user(client, "E1")
+
+    client.post("/checkin", data={"badge_id": "E1"})
+    client.post("/checkin", data={"badge_id": "E1"})
+
+    assert len(client.get("/admin/history").json()) == 2
+    assert client.get("/admin/tables/occupancy").json()[0]["checked_in"] == 1
+
+
+def test_concurrent_scans_count_one_arrival(client, db):
+    add_user(client, "E1")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        times = list(pool.map(db.create_checkin, ["E1"] * 16))
+
+    assert all(times)
+    assert client.get("/admin/tables/occupancy").json()[0]["checked_in"] == 1
+
+
+@pytest.mark.parametrize("action", ["checkin", "checkout"])
+def test_bulk_with_no_employee_ids(client, action):
+    result = client.post("/admin/checkin/bulk", json={"action": action, "employee_ids": []}).json()
+
+    assert result["results"] == []
+    assert result["message"].endswith("0 of 0")
+
+
+def test_checkout_removes_one_of_same_second_checkins(client, db):
+    add_user(client, "E1")
+    db.create_checkin("E1")
+    db.create_checkin("E1")
+    conn = db.get_db_connection()
+    conn.execute("UPDATE checkins SET checkin_at = 1700000000")
+    conn.commit()
+    conn.close()
+
+    assert client.delete("/admin/checkout/E1").json()["success"]
+
+    assert len(client.get("/admin/history").json()) == 1
+    assert client.get("/admin/tables/occupancy").json()[0]["checked_in"] == 1
+
+
+@pytest.mark.parametrize("action", ["checkin", "checkout"])
+def test_bulk_that_changes_nothing_keeps_the_version(client, action):
+    add_user(client, "E1")
+    if action == "checkin":
+        client.post("/checkin", data={"badge_id": "E1"})
+    version = client.get("/admin/users").headers["X-Data-Version"]
+
+    result = client.post("/admin/checkin/bulk", json={"action": action, "employee_ids": ["E1"]}).json()
+
+    assert not result["results"][0]["success"]
+    assert client.get("/admin/users").headers["X-Data-Version"] == version
+
+
+def test_import_applies_only_differences(client):
+    rows = [("Ann", "Lee", "E1", 1), ("Bob", "Kay", "E2", 2)]
+    first = import_roster(client, rows)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (2, 0, 0)
+
+    again = import_roster(client, rows)
+    assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 2)
+
+    moved = import_roster(client, [("Ann", "Lee", "E1", 3)])
+    assert (moved["updated"], moved["unchanged"], moved["deleted"]) == (1, 0, 0)
+    users = {user["employee_id"]: user["table_number"] for user in client.get("/admin/users").json()}
+    assert users == {"E1": 3, "E2": 2}
+
+
+def test_import_delete_missing(client):
+    import_roster(client, [("Ann", "Lee", "E1", 1), ("Bob", "Kay", "E2", 2)])
+
+    result = import_roster(client, [("Ann", "Lee", "E1", 1)], delete_missing=True)
+
+    assert result["deleted"] == 1
+    assert [user["employee_id"] for user in client.get("/admin/users").json()] == ["E1"]
+
+
+def test_import_delete_missing_keeps_rows_with_errors(client):
+    import_roster(client, [("Ann", "Lee", "E1", 1), ("Bob", "Kay", "E2", 2), ("Cy", "Orr", "E3", 3)])
+
+    # E2 lost its table number: the row is rejected, but Bob is still on the roster
+    result = import_roster(client, [("Ann", "Lee", "E1", 1), ("Bob", "Kay", "E2", None)], delete_missing=True)
+
+    assert result["success"]
+    assert result["deleted"] == 1
+    assert any("Row 3" in error for error in result["errors"])
+    users = {user["employee_id"]: user["table_number"] for user in client.get("/admin/users").json()}
+    assert users == {"E1": 1, "E2": 2}
+
+
+def test_import_delete_missing_refused_for_rows_without_id(client):
+    import_roster(client, [("Ann", "Lee", "E1", 1), ("Bob", "Kay", "E2", 2)])
+
+    result = import_roster(client, [("Ann", "Lee", "E1", 1), ("Bob", "Kay", None, 2)], delete_missing=True)
+
+    assert not result["success"]
+    assert len(client.get("/admin/users").json()) == 2
+
+
+def test_history_delta(client):
+    add_user(client, "E1")
+    full = client.get("/admin/history")
+    version = int(full.headers["X-Data-Version"])
+    assert client.get("/admin/history", headers={"If-None-Match": full.headers["ETag"]}).status_code == 304
+
+    client.post("/checkin", data={"badge_id": "E1"})
+    delta = client.get("/admin/history", params={"since": version}).json()
+
+    assert not delta["reset"]
+    assert [row["employee_id"] for row in delta["changed"]] == ["E1"]
+    assert delta["version"] > version
+
+
+def test_history_date_range_covers_whole_days(client):
+    add_user(client, "E1")
+    client.post("/checkin", data={"badge_id": "E1"})
+    today = datetime.now(timezone.utc).date()
+    tomorrow = today + timedelta(days=1)
+
+    def history(start, end):
+        response = client.get("/admin/history", params={"from": str(start), "to": str(end)})
+        assert response.status_code == 200
+        return [row["employee_id"] for row in response.json()]
+
+    assert history(today, today) == ["E1"]
+    assert history(tomorrow, tomorrow) == []
+    assert history(f"{today}T00:00:00", tomorrow) == ["E1"]
+    assert client.get("/admin/export", params={"from": str(today), "to": str(today)}).status_code == 200
+
+
+def test_user_delta_and_reset(client):
+    add_user(client, "E1")
+    add_user(client, "E2", table_number=2)
+    version = int(client.get("/admin/users").headers["X-Data-Version"])
+
+    client.post("/checkin", data={"badge_id": "E2"})
+    delta = client.get("/admin/users", params={"since": version}).json()
+    assert [(row["employee_id"], row["is_checked_in"]) for row in delta["changed"]] == [("E2", True)]
+
+    client.delete("/admin/users")
+    assert client.get("/admin/users", params={"since": delta["version"]}).json()["reset"]
+
+
+def test_roster_snapshot_and_delta(client):
+    add_user(client, "E1", table_number=4)
+    response = client.get("/checkin/roster")
+    assert response.json()["rows"] == [["E1", "Ann", "Lee", 4]]
+    version = int(response.headers["X-Data-Version"])
+
+    add_user(client, "E2", table_number=5, first_name="Bo", last_name="Xu")
+    delta = client.get("/checkin/roster", params={"since": version}).json()
+
+    assert delta["rows"] == [["E2", "Bo", "Xu", 5]]
+
+
+def test_roster_delta_ignores_checkins_and_history(client):
+    add_user(client, "E1")
+    version = int(client.get("/checkin/roster").headers["X-Data-Version"])
+
+    client.post("/checkin", data={"badge_id": "E1"})
+    assert client.delete("/admin/clear-history").json()["success"]
+    delta = client.get("/checkin/roster", params={"since": version}).json()
+
+    assert delta == {"version": version, "reset": False, "rows": []}
+
+
+def test_roster_delta_resets_when_users_are_deleted(client):
+    add_user(client, "E1")
+    version = int(client.get("/checkin/roster").headers["X-Data-Version"])
+
+    import_roster(client, [("Bo", "Xu", "E2", 5)], delete_missing=True)
+
+    assert client.get("/checkin/roster", params={"since": version}).json()["reset"]
+
+
+def test_roster_needs_session(client):
+    client.cookies.clear()
+    assert client.get("/checkin/roster").status_code == 401
+
+
+def test_checkin_page_sound_types_follow_stored_files(client, db):
+    db.update_settings({"success_sound": "/static/uploads/sound_a.wav", "error_sound": "/static/uploads/sound_b.mp3"})
+
+    page = client.get("/").text
+
+    assert '<source src="/static/uploads/sound_a.wav" type="audio/wav">' in page
+    assert '<source src="/static/uploads/sound_b.mp3" type="audio/mpeg">' in page
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/admin/archive", {"before": "2000-01-01 00:00:00"}),
+    ("/admin/backups", None),
+    ("/admin/checkin/bulk", {"action": "checkin", "employee_ids": ["E1"]}),
+])
+def test_long_admin_jobs_go_through_the_admin_gate(client, monkeypatch, path, body):
+    async def refuse(func, *args):
+        raise admission.Overloaded(admission.admin, "The server is busy, please retry shortly")
+    monkeypatch.setattr(admission.admin, "run", refuse)
+
+    response = client.post(path, json=body)
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_oversized_upload_is_refused_before_it_is_saved(client, chunked):
+    data = b"\0" * (media.MAX_SOUND_BYTES + media.MULTIPART_OVERHEAD + 1)
+    if chunked:
+        boundary = "upload-boundary"
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="big.mp3"\r\n'
+                f"Content-Type: audio/mpeg\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        response = client.post("/admin/upload-sound", content=iter([body]),
+                               headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    else:
+        response = client.post("/admin/upload-sound", data={"sound_type": "success"}, files={"file": ("big.mp3", data, "audio/mpeg")})
+
+    assert response.status_code == 413
+    assert response.json()["success"] is False
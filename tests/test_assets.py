@@ -0,0 +1,21 @@
+"""Fingerprinted static assets"""
+import threading
+
+import app
+
+
+def test_first_request_compresses_off_the_event_loop(client, monkeypatch):
+    url = app.static_files.url("js/checkin.js")
+    asset = app.static_files.assets[url.removeprefix("/static/")]
+    monkeypatch.setattr(asset, "compressed", False)
+    monkeypatch.setattr(asset, "variants", {"identity": asset.variants["identity"]})
+    threads = []
+    compress = asset._compress
+    monkeypatch.setattr(asset, "_compress", lambda: threads.append(threading.current_thread().name) or compress())
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == asset.variants["identity"]
+    # TestClient runs the event loop in its own thread; compress() must not run there
+    assert threads and threads[0].startswith("AnyIO worker thread")
@@ -0,0 +1,19 @@
+"""VersionedCache keeps the newest load"""
+import database
+
+
+def test_older_load_never_replaces_newer(monkeypatch):
+    cache = database.VersionedCache("settings")
+    versions = iter([2, 1, 2])
+    monkeypatch.setattr(database, "get_data_version", lambda cursor, name: next(versions))
+    loads = []
+
+    def loader(cursor):
+        loads.append(cursor)
+        return cursor
+
+    assert cache.get("new", loader) == "new"
+    # A reader on an older snapshot gets its own load but leaves the cached entry alone
+    assert cache.get("old", loader) == "old"
+    assert cache.get("unused", loader) == "new"
+    assert loads == ["new", "old"]
@@ -0,0 +1,126 @@
+"""SQLite durability profiles and the snapshots of memory mode"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from conftest import ROOT
+from storage import DURABILITY_PROFILES, SQLiteBackend
+
+SYNCHRONOUS = {"OFF": 0, "NORMAL": 1, "FULL": 2}
+
+
+def open_backend(path, durability):
+    backend = SQLiteBackend(str(path), durability=durability)
+    backend.prepare()
+    return backend
+
+
+def badges(path):
+    backend = open_backend(path, "full")
+    conn = backend.connect()
+    try:
+        return [row[0] for row in conn.execute("SELECT badge FROM scans ORDER BY badge")]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("durability", list(DURABILITY_PROFILES))
+def test_profile_pragmas(tmp_path, durability):
+    journal_mode, synchronous = DURABILITY_PROFILES[durability]
+    backend = open_backend(tmp_path / "checkin.db", durability)
+    conn = backend.connect()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == journal_mode.lower()
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == SYNCHRONOUS[synchronous]
+    finally:
+        conn.close()
+        backend.close()
+
+
+def test_memory_snapshot_on_close_and_reload(tmp_path):
+    path = tmp_path / "checkin.db"
+    backend = open_backend(path, "memory")
+    conn = backend.connect()
+    conn.execute("CREATE TABLE scans (badge TEXT)")
+    conn.execute("INSERT INTO scans VALUES ('E1')")
+    conn.commit()
+    conn.close()
+    # Nothing reaches the file before a snapshot
+    assert not path.exists()
+
+    backend.close()
+    assert badges(path) == ["E1"]
+
+    reloaded = open_backend(path, "memory")
+    conn = reloaded.connect()
+    conn.execute("INSERT INTO scans VALUES ('E2')")
+    conn.commit()
+    assert [row[0] for row in conn.execute("SELECT badge FROM scans ORDER BY badge")] == ["E1", "E2"]
+    conn.close()
+    reloaded.close()
+    assert badges(path) == ["E1", "E2"]
+
+
+def test_memory_loses_changes_after_last_snapshot_when_killed(tmp_path):
+    path = tmp_path / "checkin.db"
+    script = textwrap.dedent(f"""
+        import os
+        from storage import SQLiteBackend
+
+        backend = SQLiteBackend({str(path)!r}, durability="memory")
+        backend.prepare()
+        conn = backend.connect()
+        conn.execute("CREATE TABLE scans (badge TEXT)")
+        conn.execute("INSERT INTO scans VALUES ('E1')")
+        conn.commit()
+        assert backend.save_snapshot()
+        conn.execute("INSERT INTO scans VALUES ('E2')")
+        conn.commit()
+        os._exit(0)
+    """)
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True,
+                   env={**os.environ, "PYTHONPATH": ROOT})
+
+    assert badges(path) == ["E1"]
+    # The lock died with the process, so the file can be held in memory again
+    backend = open_backend(path, "memory")
+    backend.close()
+
+
+def test_memory_long_read_is_a_fixed_copy(tmp_path):
+    backend = open_backend(tmp_path / "checkin.db", "memory")
+    conn = backend.connect()
+    conn.execute("CREATE TABLE scans (badge TEXT)")
+    conn.execute("INSERT INTO scans VALUES ('E1')")
+    conn.commit()
+
+    snapshot = backend.connect_snapshot(long_read=True)
+    conn.execute("INSERT INTO scans VALUES ('E2')")
+    conn.commit()
+
+    assert [row[0] for row in snapshot.execute("SELECT badge FROM scans")] == ["E1"]
+    snapshot.close()
+    conn.close()
+    backend.close()
+
+
+def test_memory_short_read_uses_the_database_in_place(tmp_path):
+    backend = open_backend(tmp_path / "checkin.db", "memory")
+    conn = backend.connect()
+    conn.execute("CREATE TABLE scans (badge TEXT)")
+    conn.execute("INSERT INTO scans VALUES ('E1')")
+    conn.commit()
+
+    snapshot = backend.connect_snapshot()
+    # No private copy: the read runs on the shared in-memory database
+    assert snapshot.execute("PRAGMA database_list").fetchone()[2] == conn.execute("PRAGMA database_list").fetchone()[2] != ""
+    assert [row[0] for row in snapshot.execute("SELECT badge FROM scans")] == ["E1"]
+    snapshot.close()
+
+    conn.execute("INSERT INTO scans VALUES ('E2')")
+    conn.commit()
+    conn.close()
+    backend.close()
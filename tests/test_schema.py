@@ -0,0 +1,17 @@
+"""Schema setup when several workers or nodes start against one database"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_concurrent_starters_create_the_schema_once(empty_db):
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda _: empty_db.init_db(), range(6)))
+
+    conn = empty_db.get_db_connection()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+        events = [row[0] for row in conn.execute("SELECT id FROM events").fetchall()]
+    finally:
+        conn.close()
+    # One default event, and it is the active one
+    assert len(events) == 1
+    assert empty_db.get_settings()["active_event_id"] == str(events[0])
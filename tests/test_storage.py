@@ -0,0 +1,23 @@
+"""SQLite write transactions waiting on a busy database"""
+import pytest
+
+import database
+
+
+def test_busy_writes_are_counted(tmp_path):
+    database.configure(f"sqlite:///{tmp_path / 'checkin.db'}", durability="full")
+    database.init_db()
+    database.backend.busy_timeout, database.backend.write_retries, database.backend.write_backoff = 0.01, 2, 0.001
+    blocker = database.backend.connect()
+    blocker.isolation_level = None
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(database.backend.Error):
+            with database.write_transaction():
+                pass
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+    assert database.busy_stats() == {"busy_retries": 2, "busy_failures": 1}
+    database.close_db()